@@ -0,0 +1,77 @@
+# corpus.py
+
+""" Genera un corpus sintético reproducible (palabras con su significado y frases) y lo carga en una BD temporal,
+para correr los benchmarks sin depender de la BD real ni de la red. """
+
+from pathlib import Path
+from typing import List, Tuple
+import contextlib
+import io
+import random
+
+from sachagrilla.db.connection import manager
+from sachagrilla.db.db_manager import DBManager
+
+# sílabas frecuentes en castellano, con algunas acentuadas y con ñ para que la normalización tenga trabajo
+SYLLABLES = ['a', 'e', 'i', 'o', 'u', 'ca', 'co', 'cu', 'da', 'de', 'do', 'di', 'la', 'le', 'lo', 'li', 'ma', 'me',
+             'mo', 'mi', 'na', 'ne', 'no', 'ni', 'pa', 'pe', 'po', 'ra', 're', 'ro', 'ri', 'sa', 'se', 'so', 'si',
+             'ta', 'te', 'to', 'ti', 'ba', 'be', 'bo', 'ga', 'go', 'va', 've', 'za', 'fa', 'fe', 'ja', 'jo', 'ha',
+             'che', 'cha', 'lla', 'llo', 'gue', 'qui', 'tra', 'tre', 'pro', 'bra', 'cla', 'ble', 'cri', 'gra',
+             'ción', 'más', 'tás', 'rí', 'lí', 'ñá', 'ño', 'ña', 'güe', 'an', 'en', 'es', 'al', 'el', 'or', 'ar',
+             'er', 'ir', 'os', 'as', 'in', 'un', 'con', 'des', 'tan', 'mor', 'sol', 'par', 'per', 'ter', 'por']
+
+AUTHORS = ['Anónimo', 'Borges', 'Cortázar', 'Storni', 'Sábato', 'Quino', 'Pizarnik', 'Arlt', 'Ocampo', 'Walsh']
+
+
+def generate_words(size: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """Devuelve size pares (palabra, significado) distintos, de 3 a 10 letras, armados con SYLLABLES."""
+    rng = random.Random(seed)
+    words = {}
+    while len(words) < size:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if 3 <= len(word) <= 10 and word not in words:
+            words[word] = f'Significado {len(words) + 1} de la palabra {word}'
+    return list(words.items())
+
+
+def generate_quotes(size: int, words: List[Tuple[str, str]], seed: int = 0) -> List[Tuple[str, str]]:
+    """Devuelve size pares (frase, autor) distintos, de 4 a 7 palabras del corpus, con puntuación y mayúsculas."""
+    rng = random.Random(seed + 1)
+    pool = [word for word, _ in words]
+    quotes = {}
+    while len(quotes) < size:
+        text = ' '.join(rng.choice(pool) for _ in range(rng.randint(4, 7)))
+        text = text[0].upper() + text[1:] + rng.choice(['.', '...', '!', ', dijo.'])
+        quotes.setdefault(text, rng.choice(AUTHORS))
+    return list(quotes.items())
+
+
+def build_database(path: Path, size: int, quotes: int, seed: int = 0) -> Tuple[List[Tuple[str, str]],
+                                                                               List[Tuple[str, str]]]:
+    """Crea la BD en path, apunta la conexión del proceso a ella y carga el corpus sintético, con la factibilidad
+    de las frases ya calculada. Devuelve las palabras y frases generadas."""
+    from sachagrilla.grid import Grid
+
+    words = generate_words(size, seed)
+    quote_rows = generate_quotes(quotes, words, seed)
+    use_database(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        dbm = DBManager()
+        dbm.save_words(words)
+        dbm.save_quotes(quote_rows)
+        Grid.update_feasibility()
+    return words, quote_rows
+
+
+def use_database(path: Path):
+    """Apunta la conexión del proceso a la BD de path (la crea vacía si no existe)."""
+    manager.close()
+    manager.path = path
+    manager.configure()
+
+
+if __name__ == '__main__':
+    for word, clue in generate_words(10):
+        print(word, '|', clue)
+    for quote, author in generate_quotes(3, generate_words(100)):
+        print(quote, '|', author)
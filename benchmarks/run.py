@@ -0,0 +1,413 @@
+# run.py
+
+""" Corre los benchmarks de sachagrilla sobre un corpus sintético en una BD temporal, sin red, y guarda los
+resultados en un .json. Si se indica un resultado anterior con --comparar, marca como regresión cada medición cuya
+mediana empeoró más que el umbral.
+
+    python -m benchmarks.run --palabras 5000 --frases 500
+    python -m benchmarks.run --comparar benchmarks/results/base.json --umbral 0.2
+"""
+
+from datetime import datetime
+from pathlib import Path
+from statistics import mean, median
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import build_database, use_database
+from sachagrilla.db.connection import manager
+
+FIXTURES_PATH = Path(__file__).parent / 'fixtures'
+RESULTS_PATH = Path(__file__).parent / 'results'
+
+Result = Dict[str, float]
+
+# límites que no dependen del resultado anterior: {medición: (medición de referencia, máximo por encima de ella)}.
+# La cli tiene que arrancar casi tan rápido como el intérprete solo: importar de entrada peewee, fpdf, bs4 y requests
+# suma unos 100 ms
+LIMITS: Dict[str, Tuple[str, float]] = {'cli.import': ('cli.python', 0.05), 'cli.help': ('cli.python', 0.05)}
+# caída de la tasa de éxito (0.1 = 10 puntos) a partir de la cual se marca una regresión
+SUCCESS_TOLERANCE = 0.1
+
+BENCHMARKS: Dict[str, Callable[['Context'], Dict[str, Result]]] = {}
+
+
+def benchmark(name: str):
+    """Registra una función como benchmark. Recibe el Context y devuelve {nombre de la medición: resultado}."""
+    def register(func: Callable[['Context'], Dict[str, Result]]):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+class Context:
+    """Estado compartido por los benchmarks: argumentos, carpeta temporal, BD y corpus sintético."""
+
+    def __init__(self, args: argparse.Namespace, tmp_path: Path):
+        self.args = args
+        self.rounds = args.rondas
+        self.tmp_path = tmp_path
+        self.db_path = tmp_path / 'bench.db'
+        self.random = random.Random(args.semilla)
+        with quiet():
+            self.words, self.quotes = build_database(self.db_path, args.palabras, args.frases, args.semilla)
+        self.grid_ids: List[int] = []
+
+    def built_grids(self, quantity: int) -> List[int]:
+        """Devuelve ids de grillas guardadas en la BD del benchmark, generando las que falten."""
+        from sachagrilla.grid import Grid, NoFeasibleQuoteError
+
+        grid = Grid()
+        with quiet():
+            for _ in range(quantity * 3):
+                if len(self.grid_ids) >= quantity:
+                    break
+                try:
+                    grid_id = grid.build()
+                except NoFeasibleQuoteError:
+                    break
+                if grid_id:
+                    self.grid_ids.append(grid_id)
+        return self.grid_ids[:quantity]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Descarta lo que se imprime mientras se mide (los mensajes de progreso de la app)."""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def summarize(times: List[float], **extra) -> Result:
+    """Resume los tiempos (en segundos) de una medición."""
+    return dict(median=median(times), min=min(times), mean=mean(times), rounds=len(times), **extra)
+
+
+def measure(func: Callable, rounds: int, setup: Optional[Callable] = None, **extra) -> Result:
+    """Ejecuta func rounds veces y devuelve el resumen de los tiempos. Si se indica setup, se ejecuta antes de cada
+    ronda, fuera de la medición, y lo que devuelve se le pasa a func."""
+    times = []
+    for _ in range(rounds):
+        state = setup() if setup is not None else None
+        with quiet():
+            start = time.perf_counter()
+            func(state) if setup is not None else func()
+            times.append(time.perf_counter() - start)
+    return summarize(times, **extra)
+
+
+def row_queries(ctx: Context, quantity: int) -> List[Tuple[int, int, str, Optional[str]]]:
+    """Arma consultas (posición1, posición2, letra1, letra2) con filas reales de frases del corpus."""
+    from sachagrilla.grid import POSITIONS, GridSolver
+    from sachagrilla.utils import utils
+
+    queries = []
+    while len(queries) < quantity:
+        half1, half2 = utils.cut_in_half(ctx.random.choice(ctx.quotes)[0])
+        position1, position2 = ctx.random.choice(POSITIONS)
+        letter1, letter2, _ = ctx.random.choice(GridSolver.rows(half1, half2, position2))
+        queries.append((position1, position2, letter1, letter2))
+    return queries
+
+
+@benchmark('grid')
+def bench_grid(ctx: Context) -> Dict[str, Result]:
+    """Carga del índice y Grid.build con cada par de posiciones, con su tasa de éxito."""
+    from sachagrilla.grid import POSITIONS, Grid, NoFeasibleQuoteError
+
+    results = {}
+    grid = Grid()
+    with quiet():
+        start = time.perf_counter()
+        grid.get_index()
+    results['grid.index_load'] = summarize([time.perf_counter() - start])
+    for position1, position2 in POSITIONS:
+        times, built = [], 0
+        for _ in range(ctx.args.grillas):
+            with quiet():
+                start = time.perf_counter()
+                try:
+                    grid_id = grid.build(position1, position2)
+                except NoFeasibleQuoteError:
+                    grid_id = 0
+                times.append(time.perf_counter() - start)
+            if grid_id:
+                built += 1
+                ctx.grid_ids.append(grid_id)
+        results[f'grid.build[{position1},{position2}]'] = summarize(times, success_rate=built / len(times))
+    times = [result['median'] for result in results.values() if 'success_rate' in result]
+    rates = [result['success_rate'] for result in results.values() if 'success_rate' in result]
+    results['grid.build'] = summarize(times, success_rate=mean(rates))
+    return results
+
+
+@benchmark('random_word')
+def bench_random_word(ctx: Context) -> Dict[str, Result]:
+    """utils.get_random_word (recorre todas las palabras) contra WordIndex.get_random_word, con las mismas filas."""
+    from sachagrilla.db.db_manager import DBManager
+    from sachagrilla.utils import utils
+    from sachagrilla.utils.word_index import WordIndex
+
+    queries = row_queries(ctx, 20)
+    words = {position2: DBManager.get_words(position2 + 1) for _, position2, _, _ in queries}
+    index = WordIndex(DBManager.get_words(1), DBManager.get_normalized_words(1))
+
+    def legacy():
+        for position1, position2, letter1, letter2 in queries:
+            utils.get_random_word(words[position2], position1, position2, letter1, letter2)
+
+    def indexed():
+        for query in queries:
+            index.get_random_word(*query)
+
+    return {'utils.get_random_word': measure(legacy, ctx.rounds, calls=len(queries)),
+            'word_index.get_random_word': measure(indexed, ctx.rounds, calls=len(queries))}
+
+
+@benchmark('silabizer')
+def bench_silabizer(ctx: Context) -> Dict[str, Result]:
+    """silabizer sobre todo el corpus, con el cache vacío y con el cache caliente."""
+    from sachagrilla.utils.separasilabas import silabizer, syllabify
+
+    words = [word for word, _ in ctx.words]
+
+    def split_all(_=None):
+        syllabator = silabizer()
+        for word in words:
+            syllabator(word)
+
+    return {'silabizer.cold': measure(split_all, ctx.rounds, setup=syllabify.cache_clear, items=len(words)),
+            'silabizer.warm': measure(split_all, ctx.rounds, items=len(words))}
+
+
+@benchmark('clean_text')
+def bench_clean_text(ctx: Context) -> Dict[str, Result]:
+    """clean_text sobre todas las palabras y frases del corpus."""
+    from sachagrilla.utils.utils import clean_text
+
+    texts = [word for word, _ in ctx.words] + [quote for quote, _ in ctx.quotes]
+
+    def clean_all():
+        for text in texts:
+            clean_text(text)
+
+    return {'utils.clean_text': measure(clean_all, ctx.rounds, items=len(texts))}
+
+
+@benchmark('normalize')
+def bench_normalize(ctx: Context) -> Dict[str, Result]:
+    """normalize de a un texto y normalize_many de una vez, contra la implementación anterior de clean_text con seis
+    re.sub sin compilar, sobre todas las palabras y frases del corpus."""
+    import re
+
+    from sachagrilla.utils.normalize import normalize, normalize_many
+
+    texts = [word for word, _ in ctx.words] + [quote for quote, _ in ctx.quotes]
+
+    def clean_text_regex(text: str) -> str:
+        patterns = ['[àáâãäå]', '[èéêë]', '[ìíîï]', '[òóôõö]', '[ùúûü]', '[,.:;]']
+        vowels = ['a', 'e', 'i', 'o', 'u', '']
+        for idx, pattern in enumerate(patterns):
+            text = re.sub(pattern, vowels[idx], text)
+        return text.lower()
+
+    def regex_all():
+        for text in texts:
+            clean_text_regex(text)
+
+    def normalize_all():
+        for text in texts:
+            normalize(text)
+
+    return {'normalize.regex': measure(regex_all, ctx.rounds, items=len(texts)),
+            'normalize.normalize': measure(normalize_all, ctx.rounds, items=len(texts)),
+            'normalize.normalize_many': measure(lambda: normalize_many(texts), ctx.rounds, items=len(texts))}
+
+
+@benchmark('load_words')
+def bench_load_words(ctx: Context) -> Dict[str, Result]:
+    """DataLoader.load_words con el corpus repartido en .csv de 24 palabras (una grilla), en una BD vacía cada
+    ronda."""
+    from sachagrilla.data_loader import DataLoader
+
+    rounds = iter(range(ctx.rounds))
+
+    def setup() -> DataLoader:
+        number = next(rounds)
+        scraped_path = ctx.tmp_path / f'scraped_{number}'
+        scraped_path.mkdir()
+        for idx in range(0, len(ctx.words), 24):
+            with open(scraped_path / f'{idx // 24}_words.csv', 'w', encoding='utf8', newline='\n') as f:
+                writer = csv.writer(f)
+                writer.writerow(['WORD', 'CLUE'])
+                writer.writerows(ctx.words[idx:idx + 24])
+        use_database(ctx.tmp_path / f'load_{number}.db')
+        with quiet():
+            loader = DataLoader()
+        loader.scraped_data_path = scraped_path
+        return loader
+
+    try:
+        result = measure(lambda loader: loader.load_words(), ctx.rounds, setup=setup, items=len(ctx.words))
+    finally:
+        use_database(ctx.db_path)
+    return {'data_loader.load_words': result}
+
+
+@benchmark('scraper')
+def bench_scraper(ctx: Context) -> Dict[str, Result]:
+    """ScraperClarin.parse y extract_* sobre las páginas guardadas en fixtures."""
+    from sachagrilla.scrapers.scraper_clarin import ScraperClarin
+
+    scraper = ScraperClarin(0)
+    pages = [path.read_text(encoding='utf8') for path in sorted(FIXTURES_PATH.glob('*.html'))]
+    soups = [scraper.parse(page) for page in pages]
+    results = {'scraper.parse': measure(lambda: [scraper.parse(page) for page in pages], ctx.rounds,
+                                        pages=len(pages)),
+               'scraper.extract': measure(lambda: [scraper.extract(page) for page in pages], ctx.rounds,
+                                          pages=len(pages))}
+    for name in ('extract_clues', 'extract_words', 'extract_quote'):
+        extract = getattr(scraper, name)
+        results[f'scraper.{name}'] = measure(lambda: [extract(soup) for soup in soups], ctx.rounds,
+                                             pages=len(pages))
+    return results
+
+
+@benchmark('pdf')
+def bench_pdf(ctx: Context) -> Dict[str, Result]:
+    """Carga de las fuentes y PDFLayout.print_grid (con solución) de grillas del corpus, en una carpeta temporal."""
+    from sachagrilla.db.db_manager import DBManager
+    from sachagrilla.layouts.pdflayout import PDFLayout, get_renderer
+
+    solutions = list(DBManager.find_solutions(ctx.built_grids(5)).values())
+    if not solutions:
+        return {}
+    output_path = ctx.tmp_path / 'grids'
+    output_path.mkdir(exist_ok=True)
+    start = time.perf_counter()
+    get_renderer()
+    results = {'pdf.renderer_load': summarize([time.perf_counter() - start])}
+
+    def print_all():
+        for solution in solutions:
+            layout = PDFLayout(solution)
+            layout.output_path = output_path
+            layout.print_grid(True)
+
+    results['pdflayout.print_grid'] = measure(print_all, ctx.rounds, items=len(solutions))
+    return results
+
+
+@benchmark('cli')
+def bench_cli(ctx: Context) -> Dict[str, Result]:
+    """Arranque de la cli en un proceso nuevo: importar el módulo y mostrar la ayuda, con el arranque del intérprete
+    solo como referencia para LIMITS."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+    def run(*args: str):
+        subprocess.run([sys.executable, *args], env=env, check=True, stdout=subprocess.DEVNULL)
+
+    return {'cli.python': measure(lambda: run('-c', 'pass'), ctx.rounds),
+            'cli.import': measure(lambda: run('-c', 'import sachagrilla.cli'), ctx.rounds),
+            'cli.help': measure(lambda: run('-m', 'sachagrilla.cli', '--help'), ctx.rounds)}
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Result], threshold: float) -> List[str]:
+    """Imprime la mediana de cada medición contra la del resultado anterior y devuelve las que empeoraron más que
+    threshold (0.2 = 20 % más lenta) o cuya tasa de éxito bajó más que SUCCESS_TOLERANCE."""
+    regressions = []
+    print(f'\n{"medición":<32}{"anterior":>12}{"actual":>12}{"cambio":>10}')
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, now = baseline[name]['median'], result['median']
+        change = now / before - 1 if before else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESIÓN'
+        if result.get('success_rate', 1) < baseline[name].get('success_rate', 0) - SUCCESS_TOLERANCE:
+            flag = f'  REGRESIÓN (éxito {baseline[name]["success_rate"]:.0%} -> {result["success_rate"]:.0%})'
+        if flag:
+            regressions.append(name)
+        print(f'{name:<32}{before * 1000:>10.2f}ms{now * 1000:>10.2f}ms{change:>+10.1%}{flag}')
+    return regressions
+
+
+def check_limits(results: Dict[str, Result]) -> List[str]:
+    """Devuelve las mediciones cuya mediana supera la de su referencia en más de lo que permite LIMITS."""
+    exceeded = []
+    for name, (reference, limit) in LIMITS.items():
+        if name in results and reference in results:
+            overhead = results[name]['median'] - results[reference]['median']
+            if overhead > limit:
+                print(f'WARNING {name} tarda {overhead * 1000:.0f} ms más que {reference} (límite: '
+                      f'{limit * 1000:.0f} ms).', file=sys.stderr)
+                exceeded.append(name)
+    return exceeded
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='benchmarks', description='Benchmarks de sachagrilla.')
+    parser.add_argument('-p', '--palabras', type=int, default=5000, help='Palabras del corpus sintético')
+    parser.add_argument('-f', '--frases', type=int, default=500, help='Frases del corpus sintético')
+    parser.add_argument('-r', '--rondas', type=int, default=5, help='Repeticiones de cada medición')
+    parser.add_argument('-g', '--grillas', type=int, default=10, help='Grillas a generar por par de posiciones')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla del corpus y de las consultas')
+    parser.add_argument('--solo', nargs='+', choices=list(BENCHMARKS), help='Corre solo los benchmarks indicados')
+    parser.add_argument('-o', '--salida', type=Path, default=None,
+                        help='Archivo .json de resultados (por defecto, en benchmarks/results)')
+    parser.add_argument('--comparar', type=Path, default=None, help='Resultado anterior (.json) contra el que comparar')
+    parser.add_argument('--umbral', type=float, default=0.2,
+                        help='Empeoramiento de la mediana a partir del cual se marca una regresión (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    random.seed(args.semilla)
+    results: Dict[str, Result] = {}
+    with tempfile.TemporaryDirectory(prefix='sachagrilla-bench-') as tmp:
+        print(f'>>> Armando corpus sintético de {args.palabras} palabras y {args.frases} frases...')
+        ctx = Context(args, Path(tmp))
+        try:
+            for name in args.solo or BENCHMARKS:
+                print(f'>>> {name}')
+                for measurement, result in BENCHMARKS[name](ctx).items():
+                    results[measurement] = result
+                    extra = f' | éxito: {result["success_rate"]:.0%}' if 'success_rate' in result else ''
+                    print(f'    {measurement:<32}{result["median"] * 1000:>10.2f} ms{extra}')
+        finally:
+            manager.close()
+
+    output = args.salida or RESULTS_PATH / f'{datetime.now():%Y-%m-%d_%H%M%S}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    meta = dict(date=datetime.now().isoformat(timespec='seconds'), python=platform.python_version(),
+                platform=platform.platform(), words=args.palabras, quotes=args.frases, rounds=args.rondas,
+                grids=args.grillas, seed=args.semilla)
+    output.write_text(json.dumps(dict(meta=meta, results=results), indent=2, ensure_ascii=False), encoding='utf8')
+    print(f'>>> Resultados guardados en {output}')
+
+    failed = bool(check_limits(results))
+    if args.comparar:
+        previous = json.loads(args.comparar.read_text(encoding='utf8'))
+        if (previous['meta']['words'], previous['meta']['quotes']) != (args.palabras, args.frases):
+            print('WARNING El resultado anterior usó un corpus de otro tamaño, la comparación no es directa.',
+                  file=sys.stderr)
+        regressions = compare(results, previous['results'], args.umbral)
+        if regressions:
+            print(f'WARNING {len(regressions)} mediciones empeoraron más de {args.umbral:.0%}: '
+                  f'{", ".join(regressions)}', file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -32,6 +32,7 @@ REQUIRED = [
 # What packages are optional?
 EXTRAS = {
     # 'fancy feature': ['django'],
+    'fast': ['lxml', 'numpy'],
 }
 
 # The rest you shouldn't have to touch too much :)
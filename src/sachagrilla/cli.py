@@ -2,58 +2,189 @@
 
 """Proporciona la interfaz de línea de comandos de sachagrilla."""
 
+from argparse import Namespace
+from pathlib import Path
+from typing import List
 import argparse
-import random
 import sys
 
-from sachagrilla.grid import Grid
-from sachagrilla.data_collector import collect_data
+# los módulos de cada comando (y con ellos peewee, fpdf, bs4, requests) se importan recién al ejecutarlo
+
+
+def grid_numbers(text: str) -> List[int]:
+    """Convierte un número de grilla (10) o un rango (10-15) en la lista de números que indica."""
+    try:
+        first, _, last = text.partition('-')
+        first, last = int(first), int(last or first)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'"{text}" no es un número ni un rango de grillas (por ejemplo, 10-15)')
+    if first > last:
+        raise argparse.ArgumentTypeError(f'el rango "{text}" está invertido')
+    return list(range(first, last + 1))
+
+
+def positive_int(text: str) -> int:
+    """Convierte el texto en un entero mayor que cero."""
+    try:
+        number = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'"{text}" no es un número')
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'tiene que ser mayor que cero, no {number}')
+    return number
 
 
 def add_args(p: argparse.ArgumentParser):
-    """Agrega los subparsers de cada comando, con sus argumentos y funciones default."""
+    """Agrega las opciones globales y los subparsers de cada comando, con sus argumentos y funciones default."""
+
+    p.add_argument('--profile', action='store_true',
+                   help='Mide cuánto tarda cada etapa del comando y muestra un resumen al terminar')
+    p.add_argument('--profile-salida', type=Path, default=None, metavar='ARCHIVO',
+                   help='Como --profile, y además guarda la traza de las etapas (.json, para chrome://tracing o '
+                        'ui.perfetto.dev) o el profile de cProfile del proceso principal (.prof)')
 
     subparsers = p.add_subparsers(help='', dest='subparser')
     parser_new = subparsers.add_parser('nueva', help='Genera una grilla nueva')
     parser_new.add_argument('-s', '--solucion', action='store_true', help='Incluye la solución con la grilla')
+    parser_new.add_argument('-m', '--memoria-baja', action='store_true',
+                            help='Busca las palabras directamente en la BD, sin cargarlas en memoria')
+    parser_new.add_argument('-k', '--compacto', action='store_true',
+                            help='Guarda las palabras en una matriz compacta de NumPy (requiere numpy)')
+    parser_new.add_argument('-c', '--cantidad', type=positive_int, default=1, help='Cantidad de grillas a generar')
+    parser_new.add_argument('-w', '--workers', type=positive_int, default=None,
+                            help='Procesos para generar varias grillas en paralelo (por defecto, uno por CPU)')
+    parser_new.add_argument('-b', '--cuadernillo', action='store_true',
+                            help='Junta las grillas en un solo pdf; con -s, las soluciones van al final')
+    parser_new.set_defaults(func=new_grid)
 
     parser_solution = subparsers.add_parser('solucion', help='Muestra la solución de una grilla existente.')
-    parser_solution.add_argument('nbr', type=int, help='Número de grilla')
-    parser_solution.set_defaults(func=Grid.print_solution)
+    parser_solution.add_argument('nbr', type=grid_numbers, nargs='+',
+                                 help='Números de grilla o rangos (por ejemplo: 3 10-15)')
+    parser_solution.set_defaults(func=print_solution)
+
+    parser_snapshot = subparsers.add_parser('snapshot',
+                                            help='Guarda un snapshot del corpus para que nueva arranque más rápido.')
+    parser_snapshot.set_defaults(func=save_snapshot)
 
     parser_collect = subparsers.add_parser('recolectar',
                                               help='Recolecta palabras y su significado y frases de la web.')
     parser_collect.add_argument('-c', '--cantidad', type=int, default=5, help='Cantidad de datos a descargar')
-    parser_collect.set_defaults(func=collect_data)
+    parser_collect.add_argument('-d', '--descargas', type=int, default=8, help='Cantidad de descargas simultáneas')
+    parser_collect.add_argument('--csv', action='store_true', help='Guarda también la data descargada en archivos .csv')
+    parser_collect.set_defaults(func=collect)
+
+    parser_serve = subparsers.add_parser('servir', aliases=['serve'],
+                                         help='Atiende pedidos de grillas por HTTP, con todo cargado en memoria.')
+    parser_serve.add_argument('--host', default='127.0.0.1', help='Dirección en la que escucha el servicio')
+    parser_serve.add_argument('-p', '--puerto', type=int, default=8765, help='Puerto en el que escucha el servicio')
+    parser_serve.add_argument('--socket', type=Path, default=None, metavar='ARCHIVO',
+                              help='Escucha en un socket unix en lugar de host y puerto')
+    parser_serve.add_argument('-w', '--workers', type=int, default=None,
+                              help='Procesos para armar grillas y pdfs (por defecto, uno por CPU)')
+    parser_serve.add_argument('-k', '--compacto', action='store_true',
+                              help='Guarda las palabras en una matriz compacta de NumPy (requiere numpy)')
+    parser_serve.set_defaults(func=serve)
 
     # parser_stats = subparsers.add_parser('stats', help='Muestra estadísticas de uso de la app.')
     # parser_stats.set_defaults(func=Grid.get_solution)
 
 
+def new_grid(args: Namespace):
+    """Genera una o varias grillas nuevas con sus pdfs."""
+    from sachagrilla.grid import Grid, NoFeasibleQuoteError
+
+    g = Grid(args.memoria_baja, args.compacto)
+    try:
+        if args.cantidad > 1:
+            print(f'>>> Generando {args.cantidad} sachagrillas...')
+            if len(g.build_batch(args.cantidad, args.workers, args.solucion, args.cuadernillo)) < args.cantidad:
+                sys.exit(1)
+            return
+        print('>>> Generando sachagrilla...')
+        grid_id = g.build()
+        attempts = 1
+        # solo se reintenta si falló la frase elegida; si no hay ninguna con solución, se termina
+        while grid_id == 0 and attempts < 10:
+            attempts += 1
+            print(f'>>> ... intento {attempts} con otra frase...')
+            grid_id = g.build()
+    except NoFeasibleQuoteError as e:
+        print(f'WARNING {e}', file=sys.stderr)
+        sys.exit(1)
+    if grid_id != 0:
+        Grid.print(grid_id, args)
+    else:
+        print('WARNING Esta grilla estaba muy difícil... Intente nuevamente!', file=sys.stderr)
+
+
+def print_solution(args: Namespace):
+    """Genera el pdf con las soluciones de grillas existentes."""
+    from sachagrilla.grid import Grid
+
+    Grid.print_solution(args)
+
+
+def save_snapshot(args: Namespace):
+    """Guarda el snapshot del corpus."""
+    from sachagrilla.grid import Grid
+
+    Grid.save_snapshot(args)
+
+
+def collect(args: Namespace):
+    """Recolecta datos de la web y los carga en la BD."""
+    from sachagrilla.data_collector import collect_data
+
+    collect_data(args)
+
+
+def serve(args: Namespace):
+    """Levanta el servicio HTTP de grillas."""
+    from sachagrilla.server import serve as run_server
+
+    run_server(args)
+
+
+def run_profiled(args: Namespace):
+    """Ejecuta el comando registrando sus etapas y muestra el resumen; con --profile-salida guarda la traza en
+    .json o corre el comando con cProfile y guarda el .prof."""
+    from sachagrilla.utils import profiling
+
+    profiling.enable()
+    output = args.profile_salida
+    profiler = None
+    if output is not None and output.suffix == '.prof':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with profiling.span(f'cli.{args.subparser}'):
+            args.func(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(output)
+        profiling.print_summary()
+        if output is not None:
+            if profiler is None:
+                profiling.write_trace(output)
+            print(f'>>> Profile guardado en {output}')
+
+
 def main():
     """Crea e invoca el parser de la cli, y direcciona a la función de cada comando."""
-    positions = [(0, 2), (0, 3), (0, 4), (0, 5)
-                 , (1, 3), (1, 4), (1, 5)
-                 , (2, 4), (2, 5), (2, 6)]
     p = argparse.ArgumentParser()
     add_args(p)
     args = p.parse_args()
+    if args.profile_salida is not None and args.profile_salida.suffix not in ('.json', '.prof'):
+        p.error('--profile-salida tiene que ser un archivo .json o .prof')
+    if args.subparser == 'nueva' and args.cantidad == 1 and (args.workers is not None or args.cuadernillo):
+        p.error('-w y -b sirven para generar varias grillas: indique también -c con más de una')
     print('>>> BIENVENIDO A SACHAGRILLA!')
-    if args.subparser == 'nueva':
-        print('>>> Generando sachagrilla...')
-        g = Grid()
-        position = random.choice(positions)
-        grid_id = g.build(position[0], position[1])
-        attempts = 1
-        while grid_id == 0 and attempts < 10:
-            attempts += 1
-            print(f'>>> ... intento {attempts}...')
-            position = random.choice(positions)
-            grid_id = g.build(position[0], position[1])
-        if grid_id != 0:
-            Grid.print(grid_id, args)
-        else:
-            print('WARNING Esta grilla estaba muy difícil... Intente nuevamente!', file=sys.stderr)
+    if args.subparser is None:
+        p.print_help()
+    elif args.profile or args.profile_salida is not None:
+        run_profiled(args)
     else:
         args.func(args)
     print('>>> GRACIAS POR USAR SACHAGRILLA! QUE NUNCA TE FALTEN LAS PALABRAS ┑(^_^)┍')
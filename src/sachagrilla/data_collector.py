@@ -3,24 +3,53 @@
 """ Administra el scraping de los datos según las opciones ingresadas por cli. """
 
 from argparse import Namespace
+from queue import Queue
+import threading
 
 from sachagrilla.data_loader import DataLoader
 from sachagrilla.db.db_manager import DBManager
 from sachagrilla.scrapers.scraper_clarin import ScraperClarin
 
+# grillas extraídas que pueden esperar en la cola a ser guardadas; si se llena, el scraper espera a la BD
+QUEUE_SIZE = 200
+
 
 def collect_data(args: Namespace):
-    """ Hace los llamados necesarios para scrapear data y almacenarla en la BD. """
+    """ Hace los llamados necesarios para scrapear data y almacenarla en la BD.
+    La data extraída pasa directo del scraper a la BD por una cola; con --csv además queda una copia en .csv en la
+    carpeta scraped/streamed como registro. """
     cantidad = args.cantidad
     dbm = DBManager()
-    if not dbm.check_tables():
-        dbm.create_tables()
-
-    r = ScraperClarin(dbm.grid_last_number)
-    new_last_number = r.scrape_data(cantidad)
-    dbm.grid_last_number = new_last_number
 
     dl = DataLoader()
-    dl.load_quotes()
-    dl.load_words()
+    if dl.pending_files():
+        dl.load_quotes()
+        dl.load_words()
+
+    r = ScraperClarin(dbm.grid_last_number, args.descargas)
+    r.scraped_data_path = dl.scraped_data_path / 'streamed'
+    if args.csv:
+        r.scraped_data_path.mkdir(exist_ok=True)
+    records = Queue(maxsize=QUEUE_SIZE)
+    result = {}
+
+    def scrape():
+        try:
+            result['last_number'] = r.scrape_data(cantidad, sink=records.put, save_files=args.csv)
+        except BaseException as e:
+            # el error se relanza en el hilo principal, para que el comando falle en lugar de terminar como si nada
+            result['error'] = e
+        finally:
+            records.put(None)
+
+    scraper = threading.Thread(target=scrape, name='scraper', daemon=True)
+    scraper.start()
+    dl.load_stream(iter(records.get, None))
+    scraper.join()
+
+    if 'error' in result:
+        # lo ya descargado quedó guardado, pero el número de la última grilla no avanza
+        dbm.close()
+        raise result['error']
+    dbm.grid_last_number = result['last_number']
     dbm.close()
@@ -1,15 +1,22 @@
 # dataloader.py
 
 from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
 import csv
 
 from sachagrilla.db.db_manager import DBManager
+from sachagrilla.grid import Grid
+from sachagrilla.scrapers.scraper_clarin import GridData
+from sachagrilla.utils import profiling
 from sachagrilla import MAIN_MODULE_BASEPATH
 
 
 class DataLoader:
     """Carga palabras y frases de los .csv scrapeados y los guarda en la BD."""
 
+    BATCH_SIZE = 1000
+    STREAM_BATCH = 50
+
     def __init__(self):
         self.scraped_data_path = MAIN_MODULE_BASEPATH / 'data/scraped'
         self.dbmanager = DBManager()
@@ -21,16 +28,12 @@ class DataLoader:
         all_files_quan = len(all_files)
         print(f'>>> Se encontraron {all_files_quan} archivos de frases para procesar.')
 
-        loaded_files = 0
-        for file in all_files:
-            with open(file, encoding='utf8') as f:
-                csv_reader = csv.DictReader(f)
-                for line in csv_reader:
-                    if self.dbmanager.save_quote(line['QUOTE'], line['AUTHOR']):
-                        loaded_files += 1
-            Path(file).unlink()
+        totals = self._load(all_files, ('QUOTE', 'AUTHOR'), self.dbmanager.save_quotes)
 
-        print(f'>>> Se cargaron {loaded_files} archivos de un total de {all_files_quan}.')
+        print(f'>>> Se cargaron {totals["inserted"]} frases de {all_files_quan} archivos. '
+              f'Se ignoraron {totals["duplicated"]} frases existentes.')
+        if totals['inserted']:
+            Grid.update_feasibility()
 
     def load_words(self):
         """Lee todos los *words.csv de carpeta scraped y almacena palabra+significado en BD. Borra files procesados."""
@@ -39,16 +42,71 @@ class DataLoader:
         all_files_quan = len(all_files)
         print(f'>>> Se encontraron {all_files_quan} archivos de palabra-significado para procesar.')
 
-        loaded_files = 0
-        error = True
-        for file in all_files:
+        totals = self._load(all_files, ('WORD', 'CLUE'), self.dbmanager.save_words)
+
+        print(f'>>> Se cargaron {totals["inserted"]} palabras de {all_files_quan} archivos. '
+              f'Se ignoraron {totals["duplicated"]} palabras o significados existentes.')
+        if totals['inserted']:
+            Grid.update_feasibility(recheck=True)
+
+    def load_stream(self, records: Iterable[GridData]):
+        """Toma la data de las grillas a medida que llega del scraper y la guarda en BD en lotes, sin pasar por
+        archivos .csv. Guarda un lote cada BATCH_SIZE palabras o STREAM_BATCH grillas, lo que ocurra primero."""
+        totals = dict(words=0, duplicated_words=0, quotes=0, duplicated_quotes=0)
+        words = []
+        quotes = []
+        pending_grids = 0
+        for _, quote, word_clues in records:
+            words.extend(word_clues)
+            if quote:
+                quotes.append(quote)
+            pending_grids += 1
+            if len(words) >= self.BATCH_SIZE or pending_grids >= self.STREAM_BATCH:
+                self._save_stream_batch(words, quotes, totals)
+                words, quotes, pending_grids = [], [], 0
+        self._save_stream_batch(words, quotes, totals)
+
+        print(f'>>> Se cargaron {totals["quotes"]} frases y {totals["words"]} palabras. '
+              f'Se ignoraron {totals["duplicated_quotes"]} frases y '
+              f'{totals["duplicated_words"]} palabras o significados existentes.')
+        if totals['quotes'] or totals['words']:
+            Grid.update_feasibility(recheck=True)
+
+    def _save_stream_batch(self, words: List[Tuple[str, str]], quotes: List[Tuple[str, str]],
+                           totals: Dict[str, int]):
+        """Guarda un lote de palabras y frases recibidas por load_stream y acumula los totales."""
+        with profiling.span('db.load', words=len(words), quotes=len(quotes)):
+            if words:
+                inserted, duplicated = self.dbmanager.save_words(words)
+                totals['words'] += inserted
+                totals['duplicated_words'] += duplicated
+            if quotes:
+                inserted, duplicated = self.dbmanager.save_quotes(quotes)
+                totals['quotes'] += inserted
+                totals['duplicated_quotes'] += duplicated
+
+    def pending_files(self) -> bool:
+        """Indica si quedan archivos .csv scrapeados sin cargar en la carpeta scraped."""
+        return any(self.scraped_data_path.glob('*.csv'))
+
+    def _load(self, files: List[Path], columns: Tuple[str, str],
+              save: Callable[[List[Tuple[str, str]]], Tuple[int, int]]) -> Dict[str, int]:
+        """Lee las filas de los files y las guarda en lotes de BATCH_SIZE, una transacción por lote.
+        Cada file se borra recién cuando todas sus filas quedaron guardadas."""
+        totals = dict(inserted=0, duplicated=0)
+        rows = []
+        done_files = []
+        for file in files:
             with open(file, encoding='utf8', newline='') as f:
-                csv_reader = csv.DictReader(f)
-                for line in csv_reader:
-                    # print(f"ON DATA LOADER {line['WORD']} {line['CLUE']}")
-                    if self.dbmanager.save_word(line['WORD'], line['CLUE']):
-                        error = False
-                loaded_files += 1
-            Path(file).unlink()
-
-        print(f'>>> Se cargaron {loaded_files} archivos de un total de {all_files_quan}.')
+                rows.extend((line[columns[0]], line[columns[1]]) for line in csv.DictReader(f))
+            done_files.append(file)
+            if len(rows) >= self.BATCH_SIZE or file == files[-1]:
+                with profiling.span('db.load', rows=len(rows)):
+                    inserted, duplicated = save(rows)
+                totals['inserted'] += inserted
+                totals['duplicated'] += duplicated
+                for done_file in done_files:
+                    Path(done_file).unlink()
+                rows = []
+                done_files = []
+        return totals
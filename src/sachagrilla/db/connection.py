@@ -0,0 +1,92 @@
+# connection.py
+
+""" Proporciona la conexión a la BD, compartida por todo el proceso. """
+
+from pathlib import Path
+from typing import Optional
+import os
+import threading
+
+from peewee import DatabaseProxy, SqliteDatabase
+
+from sachagrilla import MAIN_MODULE_BASEPATH
+
+DB_PATH = MAIN_MODULE_BASEPATH / 'sachagrilla.db'
+
+# segundos que una conexión espera a que se libere un lock antes de fallar con "database is locked"
+BUSY_TIMEOUT = 30
+
+PRAGMAS = {'cache_size': -1 * 64000,  # 64MB
+           'foreign_keys': 1,
+           'ignore_check_constraints': 0}
+READ_WRITE_PRAGMAS = {'journal_mode': 'wal',
+                      'synchronous': 'normal'}
+READ_ONLY_PRAGMAS = {'query_only': 1}
+
+
+class LazyDatabaseProxy(DatabaseProxy):
+    """Proxy al que se asocian los modelos. La BD real se crea recién cuando se usa por primera vez, así importar
+    los modelos no configura nada."""
+
+    def __getattr__(self, attr):
+        if self.obj is None:
+            manager.get_db()
+        return super().__getattr__(attr)
+
+
+database = LazyDatabaseProxy()
+
+
+class ConnectionManager:
+    """Administra la única instancia de SqliteDatabase del proceso, a la que apuntan todos los modelos.
+
+    La instancia no abre la conexión al crearse: peewee conecta en la primera consulta y, con thread_safe, cada hilo
+    tiene su propia conexión. Todas esperan hasta BUSY_TIMEOUT segundos si otro proceso tiene la BD bloqueada.
+    En modo read_only la BD se abre con mode=ro y query_only, para los workers que solo leen."""
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = path
+        self.read_only = False
+        self.db: Optional[SqliteDatabase] = None
+        self.pid: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def configure(self, read_only: bool = False, thread_safe: bool = True,
+                  timeout: float = BUSY_TIMEOUT) -> SqliteDatabase:
+        """Crea la instancia de la BD con el modo indicado y la asigna a los modelos. Si ya había una, la cierra;
+        en un proceso hijo (fork) la heredada se descarta sin cerrarla, porque la conexión es del padre."""
+        with self.lock:
+            if self.db is not None and self.pid == os.getpid() and not self.db.is_closed():
+                self.db.close()
+            if read_only:
+                db = SqliteDatabase(f'file:{self.path}?mode=ro', uri=True, thread_safe=thread_safe, timeout=timeout,
+                                    pragmas={**PRAGMAS, **READ_ONLY_PRAGMAS})
+            else:
+                db = SqliteDatabase(self.path, thread_safe=thread_safe, timeout=timeout,
+                                    pragmas={**PRAGMAS, **READ_WRITE_PRAGMAS})
+            database.initialize(db)
+            self.db = db
+            self.read_only = read_only
+            self.pid = os.getpid()
+            return db
+
+    def get_db(self) -> SqliteDatabase:
+        """Devuelve la instancia de la BD del proceso, creándola en modo lectura y escritura si todavía no existe
+        o si se heredó de otro proceso."""
+        if self.db is None or self.pid != os.getpid():
+            return self.configure(self.read_only)
+        return self.db
+
+    def connect(self) -> SqliteDatabase:
+        """Abre la conexión del hilo actual, si no estaba abierta, y devuelve la instancia de la BD."""
+        db = self.get_db()
+        db.connect(reuse_if_open=True)
+        return db
+
+    def close(self):
+        """Cierra la conexión del hilo actual, si estaba abierta."""
+        if self.db is not None and self.pid == os.getpid() and not self.db.is_closed():
+            self.db.close()
+
+
+manager = ConnectionManager()
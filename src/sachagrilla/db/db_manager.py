@@ -1,48 +1,165 @@
 # dbmanager.py
 
+import os
+import random
 import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Optional, Tuple, Dict, List, NamedTuple
-from peewee import IntegrityError, fn
+from peewee import IntegrityError, chunked, fn
 
-from sachagrilla.db.models import Word, Clue, Quote, Control, Grid, GridLine, get_db
+from sachagrilla.db.connection import manager
+from sachagrilla.db.migrations import migrate_database
+from sachagrilla.db.models import Word, WordLetter, Clue, Quote, Control, Grid, GridLine
+from sachagrilla.utils import profiling
+from sachagrilla.utils.normalize import normalize_many
+from sachagrilla.utils.utils import join_syllables, normalize_word
+
+
+def _syllables_chunk(words: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """Separa en sílabas un lote de (id, palabra). Se usa en los procesos del pool de compute_syllables."""
+    return [(word_id, join_syllables(word)) for word_id, word in words]
 
 
 class DBManager:
     """Proporciona funciones específicas para interactuar con la BD."""
 
+    SAMPLE_ROUNDS = 3
+    SAMPLE_CHUNK = 500
+    INSERT_CHUNK = 100
+    PARALLEL_THRESHOLD = 20000
+    PARALLEL_CHUNK = 5000
+
     def __init__(self):
-        self.db = get_db()
-        self.db.connect()
+        with profiling.span('db.connect'):
+            self.db = manager.connect()
+            migrate_database(self)
 
     def close(self):
-        """Cierra la conexión a la BD."""
-        self.db.close()
+        """Cierra la conexión a la BD del hilo actual."""
+        manager.close()
 
-    def create_tables(self):
-        """Crea las tablas."""
-        self.db.create_tables([Word, Clue, Quote, Control, Grid, GridLine])
-        print('Tablas creadas!')
+    def backfill_words(self, renormalize: bool = False) -> int:
+        """Completa forma normalizada y letras por posición de las palabras que no las tienen.
+        Con renormalize revisa todas las palabras y actualiza las que cambian con la normalización actual."""
+        now = datetime.now()
+        query = Word.select(Word.id, Word.content, Word.normalized)
+        if not renormalize:
+            query = query.where(Word.normalized.is_null())
+        words = list(query.tuples())
+        normalized = normalize_many((content for _, content, _ in words), keep_length=True)
+        changed = [(word_id, new) for (word_id, _, old), new in zip(words, normalized) if new != old]
+        letters = [(row['word_id'], row['position'], row['letter'], str(row['created_at']))
+                   for word_id, new in changed for row in self._letter_rows(word_id, new, now)]
+        word_table, letter_table = Word._meta.table_name, WordLetter._meta.table_name
+        # con miles de filas, executemany es un orden de magnitud más rápido que los UPDATE/INSERT que arma peewee
+        with self.db.atomic():
+            cursor = self.db.cursor()
+            cursor.executemany(f'UPDATE "{word_table}" SET "normalized" = ? WHERE "id" = ?',
+                               [(new, word_id) for word_id, new in changed])
+            cursor.executemany(f'DELETE FROM "{letter_table}" WHERE "word_id" = ?',
+                               [(word_id,) for word_id, _ in changed])
+            cursor.executemany(f'INSERT INTO "{letter_table}" ("word_id", "position", "letter", "created_at") '
+                               'VALUES (?, ?, ?, ?)', letters)
+        return len(changed)
+
+    @staticmethod
+    def compute_syllables(words: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """Separa en sílabas las palabras (id, palabra) y devuelve (id, sílabas), sin tocar la BD. Si son muchas, las
+        calcula en paralelo con un pool de procesos, así que no se llama con una transacción abierta: los procesos
+        se crean con fork y heredarían la conexión en medio de la escritura."""
+        with profiling.span('syllabization', words=len(words)):
+            if len(words) > DBManager.PARALLEL_THRESHOLD:
+                chunks = list(chunked(words, DBManager.PARALLEL_CHUNK))
+                with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+                    return [row for result in pool.map(_syllables_chunk, chunks) for row in result]
+            return _syllables_chunk(words)
 
-    def check_tables(self) -> bool:
-        """Chequea si las tablas ya existen."""
-        ex_tables = self.db.get_tables()
-        all_tables = ['word', 'clue', 'quote', 'control', 'grid', 'gridline']
+    def backfill_syllables(self, rows: Optional[List[Tuple[int, str]]] = None) -> int:
+        """Guarda en una sola transacción las sílabas (id, sílabas) calculadas con compute_syllables. Si no se pasan,
+        antes calcula las de las palabras que no las tienen."""
+        if rows is None:
+            rows = self.compute_syllables(list(Word.select(Word.id, Word.content)
+                                               .where(Word.syllables.is_null()).tuples()))
+        words = [Word(id=word_id, syllables=syllables) for word_id, syllables in rows]
+        with self.db.atomic():
+            Word.bulk_update(words, fields=[Word.syllables], batch_size=DBManager.SAMPLE_CHUNK)
+        return len(words)
 
-        return any([True for table in all_tables if table in ex_tables])
+    @staticmethod
+    def _letter_rows(word_id: int, normalized: str, now: datetime) -> List[Dict]:
+        """Arma las filas de WordLetter de una palabra normalizada."""
+        return [dict(word_id=word_id, position=pos, letter=letter, created_at=now)
+                for pos, letter in enumerate(normalized)]
 
     def save_word(self, word: str, clue: str) -> Optional[Tuple[Word, Clue]]:
         """Guarda palabra+significado en la BD."""
         # print(f"BEFORE SAVE {word} {clue}")
         now = datetime.now()
+        normalized = normalize_word(word)
         try:
-            w = Word.create(content=word, length=len(word), created_at=now)
-            c = Clue.create(content=clue, word_id=w.id, created_at=now)
+            with self.db.atomic():
+                w = Word.create(content=word, normalized=normalized, syllables=join_syllables(word),
+                                length=len(word), created_at=now)
+                WordLetter.insert_many(self._letter_rows(w.id, normalized, now)).execute()
+                c = Clue.create(content=clue, word_id=w.id, created_at=now)
             # print(f"AFTER SAVE {w.id} {w.content} {c.id} {c.content}")
             return w, c
         except IntegrityError as e:
             print(f'WARNING: Palabra + Significado "{word}: {clue}" existente, no insertados!', file=sys.stderr)
 
+    def save_words(self, rows: List[Tuple[str, str]]) -> Tuple[int, int]:
+        """Guarda varias palabra+significado en una sola transacción, con inserts masivos.
+        Como en save_word, un par se ignora si la palabra o el significado ya existen (en la BD o antes en rows).
+        Devuelve la cantidad de pares insertados y de duplicados ignorados."""
+        now = datetime.now()
+        with self.db.atomic():
+            existing_words = self._existing(Word, [word for word, _ in rows])
+            existing_clues = self._existing(Clue, [clue for _, clue in rows])
+            new_rows = {}
+            for word, clue in rows:
+                if word not in existing_words and clue not in existing_clues:
+                    new_rows[word] = clue
+                    existing_words.add(word)
+                    existing_clues.add(clue)
+            normalized = dict(zip(new_rows, normalize_many(new_rows, keep_length=True)))
+            with profiling.span('syllabization', words=len(new_rows)):
+                syllables = {word: join_syllables(word) for word in new_rows}
+            for chunk in chunked(new_rows, DBManager.INSERT_CHUNK):
+                Word.insert_many([dict(content=word, normalized=normalized[word], syllables=syllables[word],
+                                       length=len(word), created_at=now) for word in chunk]).execute()
+            word_ids = {}
+            for chunk in chunked(new_rows, DBManager.SAMPLE_CHUNK):
+                word_ids.update(Word.select(Word.content, Word.id).where(Word.content.in_(chunk)).tuples())
+            letters = [row for word in new_rows for row in self._letter_rows(word_ids[word], normalized[word], now)]
+            for chunk in chunked(letters, DBManager.INSERT_CHUNK):
+                WordLetter.insert_many(chunk).execute()
+            for chunk in chunked(new_rows.items(), DBManager.INSERT_CHUNK):
+                Clue.insert_many([dict(content=clue, word_id=word_ids[word], created_at=now)
+                                  for word, clue in chunk]).execute()
+        return len(new_rows), len(rows) - len(new_rows)
+
+    def save_quotes(self, rows: List[Tuple[str, str]]) -> Tuple[int, int]:
+        """Guarda varias frase+autor en una sola transacción, ignorando las frases existentes.
+        Devuelve la cantidad de frases insertadas y de duplicadas ignoradas."""
+        now = datetime.now()
+        inserted = 0
+        with self.db.atomic():
+            for chunk in chunked(rows, DBManager.INSERT_CHUNK):
+                inserted += Quote.insert_many([dict(content=content, author=author, extra='', created_at=now)
+                                               for content, author in chunk])\
+                    .on_conflict_ignore().as_rowcount().execute()
+        return inserted, len(rows) - inserted
+
+    @staticmethod
+    def _existing(model, contents: List[str]) -> set:
+        """Devuelve cuáles de los contents ya están guardados en la tabla del model."""
+        existing = set()
+        for chunk in chunked(set(contents), DBManager.SAMPLE_CHUNK):
+            existing.update(row[0] for row in model.select(model.content).where(model.content.in_(chunk)).tuples())
+        return existing
+
     def save_quote(self, content: str, author: str, extra: str = '') -> Optional[Quote]:
         """Guarda frase en la BD."""
         now = datetime.now()
@@ -68,10 +185,66 @@ class DBManager:
         c = Control.create(last_grid_nbr=number, created_at=now)
         print(f'>>> N° de última grilla scrapeada guardado: {number}')
 
-    def get_random_quote(self):
-        """Devuelve una frase random de la BD."""
-        quote = Quote.select(Quote.id, Quote.content).order_by(fn.Random()).limit(1)
-        return quote[0]
+    def get_random_quote(self, feasible: bool = False, unused_since: Optional[datetime] = None) -> Optional[Quote]:
+        """Devuelve una frase random de la BD. Con feasible, solo entre las que tienen solución conocida.
+        Con unused_since, solo entre las que no se usaron desde esa fecha."""
+        quotes = self.sample_quotes(1, feasible, unused_since)
+        return quotes[0] if quotes else None
+
+    @staticmethod
+    def sample_quotes(quantity: int, feasible: bool = False, unused_since: Optional[datetime] = None,
+                      required_mask: int = 0) -> List[Quote]:
+        """Devuelve quantity frases distintas al azar sin ORDER BY RANDOM(): sortea ids dentro del rango de la tabla
+        y los busca por clave primaria, así el costo no depende del tamaño de la tabla. Los ids que no existen
+        (huecos de filas borradas) o no cumplen los filtros se descartan y se sortean de nuevo. Si aun así faltan,
+        busca una sola vez los ids de las frases válidas que quedan y sortea entre ellos; si hay menos frases
+        válidas que quantity, las devuelve todas.
+        Con required_mask, solo entre las frases que tienen solución para todos los pares de posiciones de la
+        máscara."""
+        min_id, max_id = Quote.select(fn.MIN(Quote.id), fn.MAX(Quote.id)).tuples().first()
+        if min_id is None or quantity < 1:
+            return []
+        query = Quote.select(Quote.id, Quote.content, Quote.feasible_mask)
+        if feasible:
+            query = query.where(Quote.feasible_mask > 0)
+        if required_mask:
+            query = query.where(Quote.feasible_mask.bin_and(required_mask) == required_mask)
+        if unused_since is not None:
+            query = query.where(Quote.last_used.is_null() | (Quote.last_used < unused_since))
+
+        quotes = {}
+        for _ in range(DBManager.SAMPLE_ROUNDS):
+            missing = quantity - len(quotes)
+            if missing <= 0:
+                break
+            ids = random.sample(range(min_id, max_id + 1), min(max_id - min_id + 1, 2 * missing))
+            found = [quote for chunk in chunked(ids, DBManager.SAMPLE_CHUNK)
+                     for quote in query.where(Quote.id.in_(chunk)) if quote.id not in quotes]
+            # las encontradas vienen ordenadas por id: se sortea entre ellas para no favorecer las primeras
+            quotes.update((quote.id, quote) for quote in random.sample(found, min(missing, len(found))))
+        missing = quantity - len(quotes)
+        if missing > 0:
+            rest = [quote_id for quote_id, in query.select(Quote.id).tuples() if quote_id not in quotes]
+            for chunk in chunked(random.sample(rest, min(missing, len(rest))), DBManager.SAMPLE_CHUNK):
+                quotes.update((quote.id, quote) for quote in query.where(Quote.id.in_(chunk)))
+        sample = list(quotes.values())
+        random.shuffle(sample)
+        return sample
+
+    @staticmethod
+    def get_quotes_to_check(full_mask: Optional[int] = None) -> List[Quote]:
+        """Devuelve las frases sin factibilidad calculada y, si se indica full_mask, también las incompletas."""
+        condition = Quote.feasible_mask.is_null()
+        if full_mask is not None:
+            # ninguna máscara supera a full_mask: con < (y no !=) SQLite puede usar el índice de feasible_mask
+            condition = condition | (Quote.feasible_mask < full_mask)
+        return list(Quote.select(Quote.id, Quote.content).where(condition))
+
+    @staticmethod
+    def save_feasibility(quotes: List[Quote]):
+        """Guarda máscara de factibilidad y cantidades de candidatos de las frases, en una sola transacción."""
+        with Quote._meta.database.atomic():
+            Quote.bulk_update(quotes, fields=[Quote.feasible_mask, Quote.min_candidates], batch_size=100)
 
     @staticmethod
     def get_words(min_length: int) -> Dict[int, str]:
@@ -82,39 +255,155 @@ class DBManager:
         return words_dict
 
     @staticmethod
-    def get_shorter_words(max_length: int) -> Dict[int, str]:
-        """Devuelve las palabras de longitud mínima min_length."""
-        words = Word.select(Word.id, Word.content).join(Clue, on=(Word.id == Clue.word_id))\
-            .where(Word.length <= max_length)
-        words_dict = {word.id: word.content for word in words}
+    def get_normalized_words(min_length: int) -> Dict[int, str]:
+        """Devuelve las formas normalizadas guardadas de las palabras de longitud mínima min_length."""
+        words = Word.select(Word.id, Word.normalized).join(Clue, on=(Word.id == Clue.word_id))\
+            .where(Word.length >= min_length)
+        words_dict = {word.id: word.normalized for word in words}
         return words_dict
 
     @staticmethod
-    def find_clue(word_id: int) -> Optional[Clue]:
-        """Devuelve clue de la palabra con id=id."""
-        return Clue.get_or_none(Clue.word_id == word_id)
+    def data_fingerprint() -> Tuple[int, ...]:
+        """Devuelve una huella barata del contenido de la BD (versión de esquema, id máximo y cantidad de filas de
+        palabras, clues y frases, y suma de las máscaras de factibilidad), para saber si un snapshot quedó viejo."""
+        fingerprint = [Word._meta.database.pragma('user_version')]
+        for model in (Word, Clue, Quote):
+            fingerprint.extend(model.select(fn.MAX(model.id), fn.COUNT(model.id)).tuples().first())
+        fingerprint.append(Quote.select(fn.SUM(Quote.feasible_mask)).scalar())
+        return tuple(value or 0 for value in fingerprint)
+
+    @staticmethod
+    def get_snapshot_words() -> List[Tuple[int, str, Optional[str], List[int]]]:
+        """Devuelve (id, palabra, forma normalizada, ids de sus clues) de las palabras con clue, ordenadas por id,
+        en una sola consulta."""
+        words = Word.select(Word.id, Word.content, Word.normalized, fn.GROUP_CONCAT(Clue.id).coerce(False))\
+            .join(Clue, on=(Word.id == Clue.word_id))\
+            .group_by(Word.id).order_by(Word.id).tuples()
+        return [(word_id, content, normalized, [int(clue_id) for clue_id in clue_ids.split(',')])
+                for word_id, content, normalized, clue_ids in words]
+
+    @staticmethod
+    def get_feasible_quotes() -> List[Tuple[int, str, int]]:
+        """Devuelve (id, frase, máscara de factibilidad) de las frases con solución conocida, ordenadas por id."""
+        return list(Quote.select(Quote.id, Quote.content, Quote.feasible_mask)
+                    .where(Quote.feasible_mask > 0).order_by(Quote.id).tuples())
+
+    @staticmethod
+    def _matching_words(pos1: int, pos2: int, letter1: str, letter2: Optional[str], max_length: Optional[int]):
+        """Arma la consulta de palabras con clue cuyas letras en las posiciones señaladas coinciden con las
+        indicadas. El filtro se resuelve con el índice de WordLetter, sin cargar las palabras en memoria."""
+        letter_1 = WordLetter.alias()
+        query = Word.select(Word.id, Word.content)\
+            .join(letter_1, on=(letter_1.word_id == Word.id))\
+            .where(letter_1.position == pos1, letter_1.letter == letter1,
+                   fn.EXISTS(Clue.select(Clue.id).where(Clue.word_id == Word.id)))
+        if letter2:
+            letter_2 = WordLetter.alias()
+            query = query.join(letter_2, on=(letter_2.word_id == Word.id))\
+                .where(letter_2.position == pos2, letter_2.letter == letter2)
+        if max_length is not None:
+            query = query.where(Word.length <= max_length)
+        return query
+
+    @staticmethod
+    def candidates(pos1: int, pos2: int, letter1: str, letter2: Optional[str],
+                   max_length: Optional[int] = None) -> List[int]:
+        """Devuelve los ids de las palabras cuyas letras en las posiciones señaladas coinciden con las indicadas."""
+        query = DBManager._matching_words(pos1, pos2, letter1, letter2, max_length)
+        return [word.id for word in query]
+
+    @staticmethod
+    def match_rows(pos1: int, pos2: int, rows: List[Tuple[str, Optional[str], Optional[int]]]) -> List[List[int]]:
+        """Devuelve los ids candidatos de cada fila (letra1, letra2, longitud máxima) de una grilla."""
+        return [DBManager.candidates(pos1, pos2, letter1, letter2, max_length)
+                for letter1, letter2, max_length in rows]
+
+    @staticmethod
+    def count(pos1: int, pos2: int, letter1: str, letter2: Optional[str], max_length: Optional[int] = None) -> int:
+        """Devuelve la cantidad de palabras candidatas para las letras y posiciones indicadas."""
+        return DBManager._matching_words(pos1, pos2, letter1, letter2, max_length).count()
+
+    @staticmethod
+    def find_clues(word_ids: List[int]) -> Dict[int, int]:
+        """Devuelve el id de una clue para cada palabra, con una consulta por cada SAMPLE_CHUNK palabras.
+        Si una palabra tiene varias clues, se elige una al azar."""
+        options = {}
+        for chunk in chunked(set(word_ids), DBManager.SAMPLE_CHUNK):
+            for clue_id, word_id in Clue.select(Clue.id, Clue.word_id).where(Clue.word_id.in_(chunk)).tuples():
+                options.setdefault(word_id, []).append(clue_id)
+        return {word_id: random.choice(clue_ids) for word_id, clue_ids in options.items()}
 
     @staticmethod
     def save_grid(solution: List[Dict], quote_id: int, position1: int, position2: int) -> int:
         """Toma una solución y la guarda en la BD."""
+        return DBManager.save_grids([(solution, quote_id, position1, position2)])[0]
+
+    @staticmethod
+    def save_grids(grids: List[Tuple[List[Dict], int, int, int]]) -> List[int]:
+        """Guarda varias grillas (solución, quote_id, position1, position2) en una sola transacción: un INSERT por
+        grilla y las líneas de todas juntas con insert_many. En la misma transacción suma los usos de palabras,
+        clues y frases. Devuelve los ids de las grillas."""
         now = datetime.now()
-        g = Grid.create(quote_id=quote_id, position1=position1, position2=position2, created_at=now)
-        for idx, line in enumerate(solution):
-            gl = GridLine.create(grid_id=g, row_nbr=idx, word_id=line['word_id'], clue_id=line['clue_id'], created_at=now)
-        print('>>> Grilla guardada en la BD para la posteridad.')
-        return g
+        grid_ids = []
+        lines = []
+        with profiling.span('db.save', grids=len(grids)), Grid._meta.database.atomic():
+            for solution, quote_id, position1, position2 in grids:
+                grid_id = Grid.insert(quote_id=quote_id, position1=position1, position2=position2,
+                                      created_at=now).execute()
+                grid_ids.append(grid_id)
+                lines.extend(dict(grid_id=grid_id, row_nbr=idx, word_id=line['word_id'], clue_id=line['clue_id'],
+                                  created_at=now) for idx, line in enumerate(solution))
+            for batch in chunked(lines, DBManager.INSERT_CHUNK):
+                GridLine.insert_many(batch).execute()
+            DBManager._record_usage(Word, Counter(line['word_id'] for line in lines), now)
+            DBManager._record_usage(Clue, Counter(line['clue_id'] for line in lines), now)
+            DBManager._record_usage(Quote, Counter(quote_id for _, quote_id, _, _ in grids), now)
+        if len(grid_ids) == 1:
+            print('>>> Grilla guardada en la BD para la posteridad.')
+        elif grid_ids:
+            print(f'>>> {len(grid_ids)} grillas guardadas en la BD para la posteridad.')
+        return grid_ids
 
     @staticmethod
-    def find_solution(grid_id: int):
+    def _record_usage(model, counts: Dict[int, int], now: datetime):
+        """Suma los usos y actualiza la fecha de último uso de las filas indicadas ({id: veces}) con un UPDATE por
+        cada cantidad distinta de usos (en general uno solo) y cada SAMPLE_CHUNK filas, no uno por fila."""
+        by_times = {}
+        for item_id, times in counts.items():
+            by_times.setdefault(times, []).append(item_id)
+        for times, item_ids in by_times.items():
+            for chunk in chunked(item_ids, DBManager.SAMPLE_CHUNK):
+                model.update(times_used=model.times_used + times, last_used=now)\
+                    .where(model.id.in_(chunk)).execute()
+
+    @staticmethod
+    def get_usage(model) -> Dict[int, int]:
+        """Devuelve {id: veces usada} de las filas del model que se usaron alguna vez (con el índice de
+        times_used, sin recorrer las que nunca se usaron)."""
+        return dict(model.select(model.id, model.times_used).where(model.times_used > 0).tuples())
+
+    @staticmethod
+    def find_solution(grid_id: int) -> List[Dict]:
         """Toma un grid_id y devuelve la solución para esa grilla."""
-        solution = Grid.select(Grid, Quote.content.alias('quote'), Quote.author,
-                               GridLine.row_nbr, Word.content.alias('word'), Clue.content.alias('clue'))\
-            .join(Quote, on=(Grid.quote_id == Quote.id))\
-            .join(GridLine, on=(GridLine.grid_id == Grid.id))\
-            .join(Word, on=(Word.id == GridLine.word_id))\
-            .join(Clue, on=(Clue.id == GridLine.clue_id))\
-            .where(Grid.id == grid_id).dicts()
-        return solution
+        return DBManager.find_solutions([grid_id]).get(grid_id, [])
+
+    @staticmethod
+    def find_solutions(grid_ids: List[int]) -> Dict[int, List[Dict]]:
+        """Devuelve la solución de cada grilla existente, con una consulta por cada SAMPLE_CHUNK grillas.
+        Las filas de cada solución quedan ordenadas por número de fila."""
+        solutions = {}
+        for chunk in chunked(grid_ids, DBManager.SAMPLE_CHUNK):
+            rows = Grid.select(Grid, Quote.content.alias('quote'), Quote.author,
+                               GridLine.row_nbr, Word.content.alias('word'), Word.syllables,
+                               Clue.content.alias('clue'))\
+                .join(Quote, on=(Grid.quote_id == Quote.id))\
+                .join(GridLine, on=(GridLine.grid_id == Grid.id))\
+                .join(Word, on=(Word.id == GridLine.word_id))\
+                .join(Clue, on=(Clue.id == GridLine.clue_id))\
+                .where(Grid.id.in_(chunk)).order_by(Grid.id, GridLine.row_nbr).dicts()
+            for row in rows:
+                solutions.setdefault(row['id'], []).append(row)
+        return solutions
 
     @staticmethod
     def get_available_grids():
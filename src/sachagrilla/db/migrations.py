@@ -0,0 +1,129 @@
+# migrations.py
+
+""" Proporciona las migraciones versionadas del esquema de la BD. La versión se guarda en PRAGMA user_version. """
+
+from typing import TYPE_CHECKING, Any, Callable, List, NamedTuple, Optional, Tuple
+
+from peewee import Model, SqliteDatabase
+from playhouse.migrate import SqliteMigrator, migrate
+
+from sachagrilla.db.models import Word, WordLetter, Clue, Quote, Control, Grid, GridLine
+
+if TYPE_CHECKING:
+    from sachagrilla.db.db_manager import DBManager
+
+MODELS = [Word, WordLetter, Clue, Quote, Control, Grid, GridLine]
+
+
+class Migration(NamedTuple):
+    """Paso de migración: la versión a la que lleva la BD, una descripción y la función que lo aplica, que recibe
+    el DBManager y puede devolver un detalle para el mensaje. Si tiene prepare, esa función corre antes de abrir la
+    transacción (para cálculos que no escriben, como los que usan un pool de procesos) y apply recibe su resultado."""
+    version: int
+    description: str
+    apply: Callable[..., Optional[str]]
+    prepare: Optional[Callable[['DBManager'], Any]] = None
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str, prepare: Optional[Callable[['DBManager'], Any]] = None):
+    """Registra una función como migración. Las versiones tienen que ser consecutivas."""
+    def register(apply: Callable[..., Optional[str]]):
+        if version != len(MIGRATIONS) + 1:
+            raise ValueError(f'La migración {version} no sigue a la {len(MIGRATIONS)}.')
+        MIGRATIONS.append(Migration(version, description, apply, prepare))
+        return apply
+    return register
+
+
+def _columns(db: SqliteDatabase, table: str) -> List[str]:
+    """Devuelve los nombres de las columnas de una tabla."""
+    return [column.name for column in db.get_columns(table)]
+
+
+def _add_index(db: SqliteDatabase, model: Model, *columns: str):
+    """Crea un índice (si no existe) con el mismo nombre que le da peewee al declararlo en el modelo."""
+    table = model._meta.table_name
+    name = '_'.join([table, *columns])
+    fields = ', '.join(f'"{column}"' for column in columns)
+    db.execute_sql(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({fields})')
+
+
+@migration(1, 'formas normalizadas y letras por posición de las palabras')
+def _normalized_words(dbm: 'DBManager') -> str:
+    if 'normalized' not in _columns(dbm.db, 'word'):
+        migrate(SqliteMigrator(dbm.db).add_column('word', 'normalized', Word.normalized))
+    dbm.db.create_tables([WordLetter])
+    return f'se normalizaron {dbm.backfill_words()} palabras'
+
+
+@migration(2, 'factibilidad de las frases')
+def _quote_feasibility(dbm: 'DBManager') -> None:
+    if 'feasible_mask' not in _columns(dbm.db, 'quote'):
+        migrator = SqliteMigrator(dbm.db)
+        migrate(migrator.add_column('quote', 'feasible_mask', Quote.feasible_mask),
+                migrator.add_column('quote', 'min_candidates', Quote.min_candidates))
+
+
+def _pending_syllables(dbm: 'DBManager') -> List[Tuple[int, str]]:
+    query = Word.select(Word.id, Word.content)
+    if 'syllables' in _columns(dbm.db, 'word'):
+        query = query.where(Word.syllables.is_null())
+    return dbm.compute_syllables(list(query.tuples()))
+
+
+@migration(3, 'sílabas de las palabras', prepare=_pending_syllables)
+def _word_syllables(dbm: 'DBManager', syllables: List[Tuple[int, str]]) -> str:
+    if 'syllables' not in _columns(dbm.db, 'word'):
+        migrate(SqliteMigrator(dbm.db).add_column('word', 'syllables', Word.syllables))
+    return f'se separaron en sílabas {dbm.backfill_syllables(syllables)} palabras'
+
+
+@migration(4, 'nueva normalización')
+def _renormalize(dbm: 'DBManager') -> str:
+    # cambió la normalización (utils.normalize): se actualizan las palabras afectadas y, como las mitades de las
+    # frases también pueden cambiar, se recalcula la factibilidad de todas
+    renormalized = dbm.backfill_words(renormalize=True)
+    Quote.update(feasible_mask=None, min_candidates=None).execute()
+    return f'se renormalizaron {renormalized} palabras'
+
+
+@migration(5, 'índices secundarios')
+def _secondary_indexes(dbm: 'DBManager') -> None:
+    # las claves foráneas ya tienen índice (peewee los crea con la tabla)
+    for model, column in ((Word, 'length'), (Word, 'last_used'), (Word, 'times_used'),
+                          (Clue, 'last_used'), (Clue, 'times_used'),
+                          (Quote, 'feasible_mask'), (Quote, 'last_used'), (Quote, 'times_used')):
+        _add_index(dbm.db, model, column)
+
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def migrate_database(dbm: 'DBManager') -> Tuple[int, int]:
+    """Lleva la BD a SCHEMA_VERSION. Si no tiene tablas, las crea directamente en la última versión; si no, aplica
+    en orden las migraciones pendientes, cada una en su transacción junto con el cambio de versión, así una
+    migración que falla no deja la BD a medias (el prepare de cada una corre antes, fuera de la transacción).
+    Devuelve la versión anterior y la nueva."""
+    db = dbm.db
+    version = db.pragma('user_version')
+    if version >= SCHEMA_VERSION:
+        return version, version
+    tables = db.get_tables()
+    if not any(model._meta.table_name in tables for model in MODELS):
+        with db.atomic():
+            db.create_tables(MODELS)
+            db.pragma('user_version', SCHEMA_VERSION)
+        print('Tablas creadas!')
+        return version, SCHEMA_VERSION
+    for step in MIGRATIONS[version:]:
+        prepared = () if step.prepare is None else (step.prepare(dbm),)
+        with db.atomic():
+            detail = step.apply(dbm, *prepared)
+            db.pragma('user_version', step.version)
+        print(f'>>> BD actualizada a la versión {step.version} ({step.description})'
+              + (f': {detail}.' if detail else '.'))
+    return version, SCHEMA_VERSION
+
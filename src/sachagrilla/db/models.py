@@ -1,46 +1,52 @@
 # models.py
 
-from peewee import SqliteDatabase, Model, CharField, DateTimeField, ForeignKeyField, IntegerField
+from peewee import Model, CharField, DateTimeField, ForeignKeyField, IntegerField
 
-from sachagrilla import MAIN_MODULE_BASEPATH
-
-
-def get_db():
-    db_path = MAIN_MODULE_BASEPATH / 'sachagrilla.db'
-    db = SqliteDatabase(db_path, pragmas={'journal_mode': 'wal',
-                                                   'cache_size': -1 * 64000,  # 64MB
-                                                   'foreign_keys': 1,
-                                                   'ignore_check_constraints': 0})
-    return db
+from sachagrilla.db.connection import database
 
 
 class BaseModel(Model):
     created_at = DateTimeField()
 
     class Meta:
-        database = get_db()
+        database = database
 
 
 class Word(BaseModel):
     content = CharField(unique=True)
-    length = IntegerField()
-    last_used = DateTimeField(null=True)
-    times_used = IntegerField(default=0)
+    normalized = CharField(null=True)
+    syllables = CharField(null=True)
+    length = IntegerField(index=True)
+    last_used = DateTimeField(null=True, index=True)
+    times_used = IntegerField(default=0, index=True)
+
+
+class WordLetter(BaseModel):
+    word_id = ForeignKeyField(Word, backref='letters')
+    position = IntegerField()
+    letter = CharField(max_length=1)
+
+    class Meta:
+        indexes = (
+            (('position', 'letter', 'word_id'), False),
+        )
 
 
 class Clue(BaseModel):
     content = CharField(unique=True)
     word_id = ForeignKeyField(Word, backref='clues')
-    last_used = DateTimeField(null=True)
-    times_used = IntegerField(default=0)
+    last_used = DateTimeField(null=True, index=True)
+    times_used = IntegerField(default=0, index=True)
 
 
 class Quote(BaseModel):
     content = CharField(unique=True)
     author = CharField()
     extra = CharField(null=True)
-    last_used = DateTimeField(null=True)
-    times_used = IntegerField(default=0)
+    feasible_mask = IntegerField(null=True, index=True)
+    min_candidates = CharField(null=True)
+    last_used = DateTimeField(null=True, index=True)
+    times_used = IntegerField(default=0, index=True)
 
 
 class Control(BaseModel):
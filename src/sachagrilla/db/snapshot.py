@@ -0,0 +1,219 @@
+# snapshot.py
+
+""" Proporciona un snapshot binario del corpus (palabras, formas normalizadas, clues y frases) que se lee con mmap.
+
+El archivo tiene un encabezado con la versión del formato y la huella de la BD con la que se generó, una tabla de
+secciones y las secciones, alineadas a 8 bytes. Cada sección es un array de enteros o un bloque de texto utf-8, así
+que cargarlo no deserializa nada: los arrays se usan directamente sobre el archivo mapeado. """
+
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import mmap
+import os
+import random
+import struct
+import sys
+
+from sachagrilla import MAIN_MODULE_BASEPATH
+from sachagrilla.db.db_manager import DBManager
+from sachagrilla.utils.normalize import encode_letters, normalize_many
+from sachagrilla.utils.word_index import WordIndex
+
+SNAPSHOT_PATH = MAIN_MODULE_BASEPATH / 'sachagrilla.snap'
+
+MAGIC = b'SGSNAP\0\0'
+FORMAT_VERSION = 2
+FINGERPRINT_SIZE = 8
+# magic, versión del formato, cantidad de secciones y huella de la BD
+HEADER = struct.Struct(f'<8sII{FINGERPRINT_SIZE}q')
+# nombre, offset y tamaño en bytes de cada sección
+SECTION = struct.Struct('<16sqq')
+
+
+class QuoteRow(NamedTuple):
+    """Frase del snapshot, con los mismos atributos que usa Grid de un Quote de la BD."""
+    id: int
+    content: str
+    feasible_mask: int
+
+
+def _int_array(values: Sequence[int]) -> bytes:
+    """Empaqueta enteros como int64 little-endian."""
+    return struct.pack(f'<{len(values)}q', *values)
+
+
+def _text_blob(texts: Sequence[str]) -> Tuple[bytes, bytes]:
+    """Une textos en un bloque utf-8 y devuelve el bloque y los offsets (uno más que la cantidad de textos)."""
+    encoded = [text.encode('utf8') for text in texts]
+    offsets = [0]
+    for text in encoded:
+        offsets.append(offsets[-1] + len(text))
+    return b''.join(encoded), _int_array(offsets)
+
+
+class Snapshot:
+    """Snapshot del corpus mapeado en memoria. Se genera con el comando snapshot y Grid lo usa en lugar de la BD
+    mientras la huella guardada coincida con la de la BD; si la BD cambió, se descarta."""
+
+    def __init__(self, path: Path):
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, sections, *fingerprint = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'{path} no es un snapshot de sachagrilla en formato {FORMAT_VERSION}.')
+        self.fingerprint = tuple(fingerprint)
+        self.sections: Dict[str, Tuple[int, int]] = {}
+        for idx in range(sections):
+            name, offset, size = SECTION.unpack_from(self.buffer, HEADER.size + idx * SECTION.size)
+            self.sections[name.rstrip(b'\0').decode()] = offset, size
+        self.word_ids = self._ints('word_ids')
+        self.clue_ids = self._ints('clue_ids')
+        self.clue_offsets = self._ints('clue_offsets')
+        self.quote_ids = self._ints('quote_ids')
+        self.quote_masks = self._ints('quote_masks')
+        self.quote_offsets = self._ints('quote_offsets')
+        self.quotes_by_mask: Dict[int, List[int]] = {}
+
+    @classmethod
+    def load(cls, path: Path = SNAPSHOT_PATH) -> Optional['Snapshot']:
+        """Devuelve el snapshot si existe y está al día con la BD, o None si hay que leer de la BD."""
+        if not path.exists():
+            return None
+        try:
+            snapshot = cls(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f'WARNING No se pudo leer el snapshot ({e}), se usa la BD.', file=sys.stderr)
+            return None
+        if snapshot.fingerprint != DBManager.data_fingerprint():
+            print('WARNING La BD cambió desde el último snapshot, se usa la BD. '
+                  'Para actualizarlo: sachagrilla snapshot', file=sys.stderr)
+            return None
+        return snapshot
+
+    @staticmethod
+    def export(path: Path = SNAPSHOT_PATH) -> Tuple[int, int]:
+        """Genera el snapshot con el contenido actual de la BD. Lo escribe en un archivo temporal y lo reemplaza al
+        final, así un proceso que esté leyendo el anterior no ve un archivo a medias. Devuelve la cantidad de
+        palabras y de frases guardadas."""
+        fingerprint = DBManager.data_fingerprint()
+        words = DBManager.get_snapshot_words()
+        quotes = DBManager.get_feasible_quotes()
+        missing = [idx for idx, (_, _, normalized, _) in enumerate(words) if not normalized]
+        normalized = [word[2] for word in words]
+        for idx, form in zip(missing, normalize_many((words[idx][1] for idx in missing), keep_length=True)):
+            normalized[idx] = form
+        codes, _, letters = encode_letters(normalized)
+        contents, offsets = _text_blob([word[1] for word in words])
+        clue_offsets = [0]
+        for word in words:
+            clue_offsets.append(clue_offsets[-1] + len(word[3]))
+        quote_texts, quote_offsets = _text_blob([quote[1] for quote in quotes])
+        sections = {
+            'alphabet': ''.join(sorted(codes, key=codes.get)).encode('utf8'),
+            'word_ids': _int_array([word[0] for word in words]),
+            'lengths': bytes(len(word[1]) for word in words),
+            'letters': letters,
+            'offsets': offsets,
+            'contents': contents,
+            'clue_ids': _int_array([clue_id for word in words for clue_id in word[3]]),
+            'clue_offsets': _int_array(clue_offsets),
+            'quote_ids': _int_array([quote[0] for quote in quotes]),
+            'quote_masks': _int_array([quote[2] for quote in quotes]),
+            'quote_offsets': quote_offsets,
+            'quote_texts': quote_texts,
+        }
+        table = []
+        offset = HEADER.size + len(sections) * SECTION.size
+        for name, data in sections.items():
+            offset += -offset % 8
+            table.append((name, offset, len(data)))
+            offset += len(data)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), *fingerprint))
+            for name, offset, size in table:
+                file.write(SECTION.pack(name.encode(), offset, size))
+            for (_, offset, _), data in zip(table, sections.values()):
+                file.write(b'\0' * (offset - file.tell()))
+                file.write(data)
+        os.replace(tmp_path, path)
+        return len(words), len(quotes)
+
+    def _bytes(self, name: str) -> memoryview:
+        """Devuelve una vista de los bytes de una sección, sin copiarlos."""
+        offset, size = self.sections[name]
+        return memoryview(self.buffer)[offset:offset + size]
+
+    def _ints(self, name: str) -> memoryview:
+        """Devuelve una vista de una sección de enteros int64."""
+        return self._bytes(name).cast('q')
+
+    def get_index(self, compact: bool = False, max_pairs: Optional[int] = None):
+        """Devuelve las palabras como WordIndex o, con compact, como WordMatrix armada sobre el archivo mapeado (que
+        guarda los índices de hasta max_pairs pares de posiciones). Si numpy no está instalado, siempre como
+        WordIndex."""
+        alphabet = bytes(self._bytes('alphabet')).decode('utf8')
+        if not compact:
+            return self._word_index(alphabet)
+        try:
+            import numpy as np
+            from sachagrilla.utils.word_matrix import WordMatrix
+        except ImportError:
+            print('WARNING numpy no está instalado (pip install sachagrilla[fast]), se usa el índice común.',
+                  file=sys.stderr)
+            return self._word_index(alphabet)
+        codes = {letter: code for code, letter in enumerate(alphabet, start=1)}
+        total = len(self.word_ids)
+        offset, size = self.sections['letters']
+        width = size // total if total else 0
+        return WordMatrix.from_arrays(codes,
+                                      np.frombuffer(self.buffer, np.int64, total, self.sections['word_ids'][0]),
+                                      np.frombuffer(self.buffer, np.uint8, total, self.sections['lengths'][0]),
+                                      np.frombuffer(self.buffer, np.uint8, size, offset).reshape(total, width),
+                                      np.frombuffer(self._bytes('contents'), np.uint8),
+                                      np.frombuffer(self.buffer, np.int64, total + 1, self.sections['offsets'][0]),
+                                      max_pairs)
+
+    def _word_index(self, alphabet: str) -> WordIndex:
+        """Arma un WordIndex decodificando las palabras y sus formas normalizadas."""
+        from_codes = {code: letter for code, letter in enumerate(alphabet, start=1)}
+        contents, offsets = bytes(self._bytes('contents')), self._ints('offsets')
+        letters, lengths = bytes(self._bytes('letters')), self._bytes('lengths')
+        width = len(letters) // len(self.word_ids) if len(self.word_ids) else 0
+        words, normalized = {}, {}
+        for idx, word_id in enumerate(self.word_ids):
+            words[word_id] = contents[offsets[idx]:offsets[idx + 1]].decode('utf8')
+            row = letters[idx * width:idx * width + lengths[idx]]
+            normalized[word_id] = row.decode('latin-1').translate(from_codes)
+        return WordIndex(words, normalized)
+
+    def get_clue_ids(self, word_ids: Sequence[int]) -> Dict[int, int]:
+        """Devuelve el id de una clue de cada palabra, buscando la palabra por búsqueda binaria en el snapshot.
+        Si una palabra tiene varias clues, se elige una al azar, como en DBManager.find_clues."""
+        clue_ids = {}
+        for word_id in word_ids:
+            idx = bisect_left(self.word_ids, word_id)
+            clue_ids[word_id] = self.clue_ids[random.randrange(self.clue_offsets[idx], self.clue_offsets[idx + 1])]
+        return clue_ids
+
+    def sample_quotes(self, quantity: int, required_mask: int = 0) -> List[QuoteRow]:
+        """Devuelve hasta quantity frases con solución al azar, sin repetir. Con required_mask, solo entre las que
+        tienen solución para todos los pares de posiciones de la máscara (se buscan una sola vez por máscara)."""
+        if not required_mask:
+            candidates = range(len(self.quote_ids))
+        else:
+            if required_mask not in self.quotes_by_mask:
+                self.quotes_by_mask[required_mask] = [idx for idx, mask in enumerate(self.quote_masks)
+                                                      if mask & required_mask == required_mask]
+            candidates = self.quotes_by_mask[required_mask]
+        texts = self._bytes('quote_texts')
+        return [QuoteRow(self.quote_ids[idx],
+                         bytes(texts[self.quote_offsets[idx]:self.quote_offsets[idx + 1]]).decode('utf8'),
+                         self.quote_masks[idx])
+                for idx in random.sample(candidates, min(quantity, len(candidates)))]
+
+
+if __name__ == '__main__':
+    DBManager()
+    print(Snapshot.export())
@@ -1,63 +1,504 @@
 # gridbuilder.py
 
 from argparse import Namespace
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Union
+import os
+import random
 import sys
+import time
 
-from sachagrilla.layouts.pdflayout import PDFLayout
+from sachagrilla.db.connection import manager
 from sachagrilla.db.db_manager import DBManager
-from sachagrilla.utils import utils
+from sachagrilla.db.models import Quote, Word
+from sachagrilla.db.snapshot import QuoteRow, Snapshot
+from sachagrilla.utils import profiling, utils
+from sachagrilla.utils.weighted import usage_weight, weighted_sample
+from sachagrilla.utils.word_index import WordIndex
+if TYPE_CHECKING:
+    from sachagrilla.utils.word_matrix import WordMatrix
+# layouts.pdflayout (y con él fpdf) se importa dentro de las funciones que generan pdfs
+
+
+POSITIONS = [(0, 2), (0, 3), (0, 4), (0, 5),
+             (1, 3), (1, 4), (1, 5),
+             (2, 4), (2, 5), (2, 6)]
+
+FULL_MASK = (1 << len(POSITIONS)) - 1
+
+WordSource = Union[WordIndex, DBManager, Type[DBManager], 'WordMatrix']
+Row = Tuple[str, Optional[str], Optional[int]]
+Draft = Tuple[int, int, int, List[int]]
+# usos de palabras que todavía no recibieron todos los workers: número de la primera grilla e ids de cada grilla
+UsageDelta = Tuple[int, List[List[int]]]
+
+
+class NoFeasibleQuoteError(Exception):
+    """No hay ninguna frase con solución (para el par de posiciones pedido, si se indicó): otro intento no sirve."""
+
+
+def positions_from_mask(mask: int) -> List[Tuple[int, int]]:
+    """Devuelve los pares de POSITIONS marcados en una máscara de factibilidad."""
+    return [position for bit, position in enumerate(POSITIONS) if mask & (1 << bit)]
+
+
+def mask_from_positions(position1: Optional[int], position2: Optional[int]) -> int:
+    """Devuelve el bit de factibilidad del par de posiciones indicado, o 0 si no se indica (sirve cualquier par)."""
+    if position1 is None or position2 is None:
+        return 0
+    return 1 << POSITIONS.index((position1, position2))
+
+
+class GridSolver:
+    """Elige las palabras de cada fila de la grilla para una frase, sin repetir palabras.
+
+    Primero descarta los pares de posiciones imposibles contando candidatos por par de letras, y después
+    resuelve con backtracking empezando por las filas más restringidas.
+
+    Si se pasan los usos de las palabras ({id: veces usada}), los candidatos de cada fila se prueban sorteándolos
+    con más chances para los menos usados: se sortea uno uniformemente y se acepta con probabilidad igual a su peso
+    (como mucho 1, el de una palabra sin usar). No hay nada que armar por grupo de candidatos, así que los usos
+    pueden cambiar entre grilla y grilla sin costo."""
+
+    MAX_STEPS = 10000
+
+    def __init__(self, index: WordSource, usage: Optional[Dict[int, int]] = None):
+        self.index = index
+        self.usage = Counter(usage or {})
+
+    @staticmethod
+    def rows(quote_half1: str, quote_half2: str, position2: int) -> List[Row]:
+        """Devuelve (letra1, letra2, longitud máxima) de cada fila. Si la frase es impar, la última fila lleva
+        solo la letra de la primera mitad y una palabra corta."""
+        rows = [(letter1, letter2, None) for letter1, letter2 in zip(quote_half1, quote_half2)]
+        if len(quote_half1) > len(quote_half2):
+            rows.append((quote_half1[-1], None, position2 + 1))
+        return rows
+
+    def is_feasible(self, rows: List[Row], position1: int, position2: int) -> bool:
+        """Chequea que cada par de letras tenga al menos tantos candidatos como filas que lo necesitan."""
+        return self._min_candidates(rows, position1, position2)[1]
+
+    def _min_candidates(self, rows: List[Row], position1: int, position2: int) -> Tuple[int, bool]:
+        """Devuelve la menor cantidad de candidatos de una fila y si alcanzan para todas las filas."""
+        demand = Counter(rows)
+        min_count = None
+        feasible = True
+        for (letter1, letter2, max_length), needed in demand.items():
+            count = self.index.count(position1, position2, letter1, letter2, max_length)
+            min_count = count if min_count is None else min(min_count, count)
+            if count < needed:
+                feasible = False
+        return min_count or 0, feasible
+
+    def feasibility(self, quote_half1: str, quote_half2: str) -> Tuple[int, List[int]]:
+        """Devuelve una máscara de bits (el bit i indica si POSITIONS[i] tiene solución) y la menor cantidad de
+        candidatos de una fila para cada par de posiciones."""
+        return self.feasibility_many([(quote_half1, quote_half2)])[0]
+
+    def feasibility_many(self, halves: List[Tuple[str, str]]) -> List[Tuple[int, List[int]]]:
+        """Devuelve la factibilidad (como feasibility) de varias frases. Recorre un par de posiciones por vez, así
+        un índice que guarda pocos pares (WordMatrix con max_pairs) arma cada uno una sola vez."""
+        masks = [0] * len(halves)
+        counts: List[List[int]] = [[] for _ in halves]
+        for bit, (position1, position2) in enumerate(POSITIONS):
+            for idx, (quote_half1, quote_half2) in enumerate(halves):
+                rows = self.rows(quote_half1, quote_half2, position2)
+                min_count, feasible = self._min_candidates(rows, position1, position2)
+                counts[idx].append(min_count)
+                if feasible:
+                    masks[idx] |= 1 << bit
+        return list(zip(masks, counts))
+
+    def feasible_positions(self, quote_half1: str, quote_half2: str) -> List[Tuple[int, int]]:
+        """Devuelve los pares de posiciones de POSITIONS con los que la frase se puede resolver."""
+        return positions_from_mask(self.feasibility(quote_half1, quote_half2)[0])
+
+    def solve(self, quote_half1: str, quote_half2: str, position1: int, position2: int) -> Optional[List[int]]:
+        """Devuelve los ids de las palabras de cada fila, en orden, o None si la frase no tiene solución."""
+        rows = self.rows(quote_half1, quote_half2, position2)
+        with profiling.span('grid.feasibility'):
+            if not self.is_feasible(rows, position1, position2):
+                return None
+        with profiling.span('grid.match_rows', rows=len(rows)):
+            candidates = self.index.match_rows(position1, position2, rows)
+        with profiling.span('grid.backtracking', rows=len(rows)):
+            return self._backtrack(candidates)
+
+    def record_usage(self, word_ids: Iterable[int]):
+        """Suma los usos de las palabras de una grilla guardada."""
+        self.usage.update(word_ids)
+
+    def _backtrack(self, candidates: List[Sequence[int]]) -> Optional[List[int]]:
+        """Elige una palabra distinta para cada fila entre sus candidatos, empezando por las filas con menos."""
+        order = sorted(range(len(candidates)), key=lambda row: len(candidates[row]))
+        chosen = [0] * len(candidates)
+        options = [None] * len(candidates)
+        used = set()
+        depth = 0
+        steps = 0
+        while 0 <= depth < len(order) and steps < self.MAX_STEPS:
+            steps += 1
+            row = order[depth]
+            if options[depth] is None:
+                options[depth] = self._random_order(candidates[row])
+            for word_id in options[depth]:
+                if word_id not in used:
+                    chosen[row] = word_id
+                    used.add(word_id)
+                    depth += 1
+                    break
+            else:
+                options[depth] = None
+                depth -= 1
+                if depth >= 0:
+                    used.discard(chosen[order[depth]])
+        if depth < len(order):
+            return None
+        return [int(word_id) for word_id in chosen]
+
+    def compose(self, quote_id: int, content: str, feasible_mask: Optional[int],
+                position1: Optional[int] = None, position2: Optional[int] = None) -> Optional[Draft]:
+        """Resuelve una frase y devuelve (quote_id, position1, position2, ids de palabras), o None si falla.
+        Si no se indican las posiciones, se elige al azar un par con el que la frase tenga solución."""
+        quote_half1, quote_half2 = utils.cut_in_half(content)
+        if position1 is None or position2 is None:
+            if feasible_mask is None:
+                feasible_mask = self.feasibility(quote_half1, quote_half2)[0]
+            feasible = positions_from_mask(feasible_mask)
+            if not feasible:
+                return None
+            position1, position2 = random.choice(feasible)
+        elif feasible_mask is not None and not feasible_mask & mask_from_positions(position1, position2):
+            return None
+        word_ids = self.solve(quote_half1, quote_half2, position1, position2)
+        if not word_ids:
+            return None
+        return quote_id, position1, position2, word_ids
+
+    def _random_order(self, candidates: Sequence[int]) -> Iterator[int]:
+        """Recorre los candidatos en orden aleatorio. Prueba primero hasta 8 al azar (por rechazo según sus usos,
+        si hay) para no copiar toda la lista."""
+        tried = set()
+        wanted = min(len(candidates), 8)
+        # con muchas palabras usadas se rechazan más sorteos: se intenta hasta 4 veces por candidato buscado
+        for _ in range(wanted * 4 if self.usage else wanted):
+            if len(tried) >= wanted:
+                break
+            idx = random.randrange(len(candidates))
+            if self.usage and random.random() >= usage_weight(self.usage.get(candidates[idx], 0)):
+                continue
+            if idx not in tried:
+                tried.add(idx)
+                yield candidates[idx]
+        rest = [word_id for idx, word_id in enumerate(candidates) if idx not in tried]
+        random.shuffle(rest)
+        yield from rest
+
+
+_worker_solver: Optional[GridSolver] = None
+# grillas del lote guardadas cuyos usos ya sumó este worker
+_worker_seen = 0
+
+
+def _init_worker(index: Optional[WordIndex], usage: Dict[int, int], profiling_enabled: bool = False):
+    """Inicializa un proceso del pool con el índice de palabras ya cargado (o la BD en modo low_memory) y los usos
+    de las palabras.
+    Los workers solo leen, así que abren su propia conexión en modo read_only; las grillas se guardan desde el
+    proceso principal."""
+    global _worker_solver, _worker_seen
+    manager.configure(read_only=True)
+    # los spans que el proceso heredó del principal ya están registrados allá
+    profiling.drain()
+    profiling.enable(profiling_enabled)
+    _worker_solver = GridSolver(index if index is not None else DBManager, usage)
+    _worker_seen = 0
+
+
+def _traced(func: Callable, *args):
+    """Ejecuta func en un proceso del pool y devuelve su resultado junto con los spans que registró."""
+    return func(*args), profiling.drain()
+
+
+def _map_traced(pool: ProcessPoolExecutor, func: Callable, *iterables: Iterable) -> Iterator:
+    """Como pool.map, pero pasa al proceso principal los spans registrados en los workers."""
+    for result, spans in pool.map(partial(_traced, func), *iterables):
+        profiling.merge(spans)
+        yield result
+
+
+def _compose_many(delta: UsageDelta, quotes: List[Tuple[int, str, Optional[int]]]) -> List[Optional[Draft]]:
+    """Suma los usos de las grillas guardadas que este worker todavía no vio y arma las grillas de un lote de
+    frases dentro de un proceso del pool. Mientras arma el lote cuenta también sus propias palabras, para no
+    repetirlas en las grillas siguientes; al terminar las descuenta, porque vuelven en el próximo delta si se
+    guardan."""
+    global _worker_seen
+    first, grids = delta
+    _worker_solver.record_usage(word_id for word_ids in grids[max(0, _worker_seen - first):] for word_id in word_ids)
+    _worker_seen = max(_worker_seen, first + len(grids))
+    drafts = []
+    pending = Counter()
+    for quote in quotes:
+        draft = _worker_solver.compose(*quote)
+        if draft is not None:
+            _worker_solver.record_usage(draft[3])
+            pending.update(draft[3])
+        drafts.append(draft)
+    _worker_solver.usage -= pending
+    return drafts
+
+
+def _print_grid(solution: List[Dict], include_solution: bool) -> Path:
+    """Genera el pdf de una grilla dentro de un proceso del pool."""
+    from sachagrilla.layouts.pdflayout import PDFLayout
+
+    return PDFLayout(solution).print_grid(include_solution)
 
 
 class Grid:
     """"Proporciona funciones para generar una nueva grilla e imprimirla."""
 
-    def __init__(self):
+    BATCH_ROUNDS = 3
+    # frases que se sortean por cada una que se necesita, para elegir entre ellas las menos usadas
+    QUOTE_CHOICES = 3
+    # pares de posiciones cuyos índices guarda la matriz compacta (cada uno ocupa 4 bytes por palabra)
+    MATRIX_PAIRS = 4
+
+    def __init__(self, low_memory: bool = False, compact: bool = False):
         self.dbm = DBManager()
+        self.low_memory = low_memory
+        self.compact = compact
         self.quote = ''
         self.words = []
         self.clues = []
         self.date = date.today()
+        self.index = None
+        self.snapshot = None
+        self.solver: Optional[GridSolver] = None
+        self.quote_usage: Counter = Counter()
+
+    def get_index(self) -> WordSource:
+        """Devuelve el índice de palabras, cargándolo solo la primera vez. Si hay un snapshot al día con la BD, se
+        arma sobre el archivo mapeado en memoria sin leer la BD.
+        En modo low_memory las palabras se buscan directamente en la BD y en modo compact se guardan en una matriz
+        de NumPy (si numpy no está instalado, se usa el índice común)."""
+        if self.index is None:
+            with profiling.span('grid.word_loading'):
+                self.index = self._load_index()
+        return self.index
+
+    def get_solver(self) -> GridSolver:
+        """Devuelve el GridSolver de la grilla, creándolo la primera vez con el índice y los usos de palabras y
+        frases guardados en la BD."""
+        if self.solver is None:
+            index = self.get_index()
+            with profiling.span('grid.usage_loading'):
+                self.solver = GridSolver(index, DBManager.get_usage(Word))
+                self.quote_usage = Counter(DBManager.get_usage(Quote))
+        return self.solver
+
+    def _load_index(self) -> WordSource:
+        """Carga el índice de palabras según el modo de la grilla."""
+        self.snapshot = None if self.low_memory else Snapshot.load()
+        if self.snapshot is not None:
+            # el snapshot se genera con la factibilidad ya calculada y la huella garantiza que no cambió
+            return self.snapshot.get_index(self.compact, self.MATRIX_PAIRS)
+        if self.low_memory:
+            index = self.dbm
+        elif self.compact:
+            index = self._load_matrix()
+        else:
+            index = WordIndex(DBManager.get_words(1), DBManager.get_normalized_words(1))
+        Grid.update_feasibility(index)
+        return index
 
-    def build(self, position1: int, position2: int) -> int:
-        """Interfaz pública. Construye grilla y la guarda en la BD. Devuelve id de grilla generada o O si falla."""
-        try_again = False
+    @classmethod
+    def _load_matrix(cls) -> WordSource:
+        """Carga las palabras en una WordMatrix, o en un WordIndex si numpy no está disponible."""
+        words, normalized = DBManager.get_words(1), DBManager.get_normalized_words(1)
+        try:
+            from sachagrilla.utils.word_matrix import WordMatrix
+        except ImportError:
+            print('WARNING numpy no está instalado (pip install sachagrilla[fast]), se usa el índice común.',
+                  file=sys.stderr)
+            return WordIndex(words, normalized)
+        return WordMatrix(words, normalized, cls.MATRIX_PAIRS)
+
+    @staticmethod
+    def update_feasibility(index: Optional[WordSource] = None, recheck: bool = False) -> int:
+        """Calcula y guarda la factibilidad de las frases que no la tienen. Con recheck también recalcula las que
+        no tienen solución para todos los pares de posiciones, porque pueden ganarla al cargar palabras nuevas.
+        Las cantidades de candidatos de las frases ya completas quedan como cota inferior."""
+        quotes = DBManager.get_quotes_to_check(FULL_MASK if recheck else None)
+        if not quotes:
+            return 0
+        if index is None:
+            index = WordIndex(DBManager.get_words(1), DBManager.get_normalized_words(1))
+        solver = GridSolver(index)
+        with profiling.span('grid.feasibility', quotes=len(quotes)):
+            feasibility = solver.feasibility_many([utils.cut_in_half(quote.content) for quote in quotes])
+            for quote, (feasible_mask, counts) in zip(quotes, feasibility):
+                quote.feasible_mask = feasible_mask
+                quote.min_candidates = ','.join(str(count) for count in counts)
+        DBManager.save_feasibility(quotes)
+        print(f'>>> Se calculó la factibilidad de {len(quotes)} frases.')
+        return len(quotes)
+
+    @staticmethod
+    def save_snapshot(args: Namespace):
+        """Interfaz pública. Calcula la factibilidad pendiente y guarda el snapshot del corpus."""
+        DBManager()
+        Grid.update_feasibility()
+        start = time.perf_counter()
+        words, quotes = Snapshot.export()
+        print(f'>>> Snapshot con {words} palabras y {quotes} frases guardado en {time.perf_counter() - start:.2f} s.')
+
+    def sample_quotes(self, quantity: int, position1: Optional[int] = None,
+                      position2: Optional[int] = None) -> List[Union[QuoteRow, Quote]]:
+        """Devuelve hasta quantity frases con solución al azar, del snapshot si se cargó o de la BD. Si se indican
+        las posiciones, solo entre las que tienen solución para ese par. Si ya se usaron frases, sortea
+        QUOTE_CHOICES veces más y se queda con quantity, con más chances para las menos usadas."""
+        required_mask = mask_from_positions(position1, position2)
+        with profiling.span('grid.quote_selection', quantity=quantity):
+            choices = quantity * self.QUOTE_CHOICES if self.quote_usage else quantity
+            if self.snapshot is not None:
+                quotes = self.snapshot.sample_quotes(choices, required_mask)
+            else:
+                quotes = self.dbm.sample_quotes(choices, feasible=True, required_mask=required_mask)
+            if not self.quote_usage:
+                return quotes
+            quotes = list({quote.id: quote for quote in quotes}.values())
+            return weighted_sample(quotes, [usage_weight(self.quote_usage[quote.id]) for quote in quotes], quantity)
+
+    def build(self, position1: Optional[int] = None, position2: Optional[int] = None) -> int:
+        """Interfaz pública. Construye grilla y la guarda en la BD. Devuelve id de grilla generada o O si no se pudo
+        resolver la frase elegida (otro intento puede elegir otra). Si no hay ninguna frase con solución, lanza
+        NoFeasibleQuoteError. Si no se indican las posiciones, se elige al azar un par con el que la frase tenga
+        solución."""
+        solver = self.get_solver()
         print('>>> Buscando una buena frase...')
-        quote = self.dbm.get_random_quote()
-        quote_half1, quote_half2 = utils.cut_in_half(quote.content)
+        quotes = self.sample_quotes(1, position1, position2)
+        if not quotes:
+            raise NoFeasibleQuoteError('No hay frases con solución para las palabras disponibles.')
+        quote = quotes[0]
         print('>>> Lista la frase perfecta!')
-        words = DBManager.get_words(position2+1)
         print('>>> Buscando las palabras adecuadas...')
-        solution = []
-        for letter_half1, letter_half2 in zip(quote_half1, quote_half2):
-            word_id, word = utils.get_random_word(words, position1, position2, letter_half1, letter_half2)
-            if not word_id:
-                try_again = True
-                break
-            clue = DBManager.find_clue(word_id)
-            solution.append(dict(word_id=word_id, word=word, clue_id=clue.id, clue=clue.content))
-        else:
-            if len(quote_half1) > len(quote_half2):
-                words = DBManager.get_shorter_words(position2+1)
-                word_id, word = utils.get_random_word(words, position1, position2, quote_half1[-1], None)
-                if not word_id:
-                    try_again = True
-                else:
-                    clue = DBManager.find_clue(word_id)
-                    solution.append(dict(word_id=word_id, word=word, clue_id=clue.id, clue=clue.content))
-            if try_again:
-                return 0
-            else:
-                print('>>> Las mejores palabras jamás leídas están seleccionadas!')
-                grid_id = DBManager.save_grid(solution, quote.id, position1, position2)
-                print(f'>>> Sachagrilla N° {grid_id} lista!')
-                return grid_id
-        if try_again:
+        draft = solver.compose(quote.id, quote.content, quote.feasible_mask, position1, position2)
+        if draft is None:
             return 0
+        print('>>> Las mejores palabras jamás leídas están seleccionadas!')
+        grid_id = self.save(draft)
+        print(f'>>> Sachagrilla N° {grid_id} lista!')
+        return grid_id
+
+    def save(self, draft: Draft) -> int:
+        """Busca las definiciones de las palabras elegidas y guarda la grilla en la BD. Devuelve su id."""
+        return self.save_many([draft])[0]
+
+    def save_many(self, drafts: List[Draft]) -> List[int]:
+        """Busca las definiciones de las palabras de todas las grillas juntas (del snapshot o con una sola consulta)
+        y las guarda en la BD en una sola transacción. Devuelve sus ids."""
+        word_ids = [word_id for draft in drafts for word_id in draft[3]]
+        with profiling.span('grid.clue_selection', words=len(word_ids)):
+            if self.snapshot is not None:
+                clue_ids = self.snapshot.get_clue_ids(word_ids)
+            else:
+                clue_ids = DBManager.find_clues(word_ids)
+        grids = [([dict(word_id=word_id, clue_id=clue_ids[word_id]) for word_id in word_ids], quote_id,
+                  position1, position2)
+                 for quote_id, position1, position2, word_ids in drafts]
+        grid_ids = DBManager.save_grids(grids)
+        if self.solver is not None:
+            self.solver.record_usage(word_ids)
+            self.quote_usage.update(draft[0] for draft in drafts)
+        return grid_ids
+
+    def build_batch(self, quantity: int, workers: Optional[int], include_solution: bool,
+                    booklet: bool = False) -> List[int]:
+        """Interfaz pública. Genera quantity grillas con sus pdfs repartiendo el trabajo en un pool de procesos.
+        El corpus y los índices se cargan una sola vez; las grillas se arman en los workers y se guardan en la BD
+        desde este proceso, en una transacción por ronda. Con booklet, en lugar de un pdf por grilla se genera un
+        cuadernillo con todas (y, con include_solution, sus soluciones al final). Devuelve los ids de las grillas
+        generadas, que pueden ser menos que quantity (se avisa por qué). Si no hay ninguna frase con solución, lanza
+        NoFeasibleQuoteError."""
+        workers = workers or os.cpu_count() or 1
+        start = time.perf_counter()
+        solver = self.get_solver()
+        # las fuentes se cargan (y fpdf cachea sus métricas en disco) antes de crear los workers, que las heredan
+        from sachagrilla.layouts.pdflayout import get_renderer
+        get_renderer()
+        loaded = time.perf_counter()
+        grid_ids = []
+        # palabras de cada grilla guardada en este lote, que los workers suman a los usos con los que arrancaron
+        usage_log: List[List[int]] = []
+        short_of_quotes = False
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(None if self.low_memory else solver.index, dict(solver.usage),
+                                           profiling.is_enabled())) as pool:
+            for _ in range(self.BATCH_ROUNDS):
+                missing = quantity - len(grid_ids)
+                if missing <= 0:
+                    break
+                quotes = [(quote.id, quote.content, quote.feasible_mask) for quote in self.sample_quotes(missing)]
+                # cada sorteo devuelve frases distintas: si hay menos frases con solución que grillas, no alcanzan
+                short_of_quotes = short_of_quotes or len(quotes) < missing
+                if not quotes:
+                    if not grid_ids:
+                        raise NoFeasibleQuoteError('No hay frases con solución para las palabras disponibles.')
+                    break
+                chunk_size = max(1, len(quotes) // (workers * 4))
+                chunks = [quotes[idx:idx + chunk_size] for idx in range(0, len(quotes), chunk_size)]
+                deltas = [(0, usage_log)] * len(chunks)
+                drafts = [draft for drafts in _map_traced(pool, _compose_many, deltas, chunks)
+                          for draft in drafts if draft is not None]
+                grid_ids.extend(self.save_many(drafts))
+                usage_log.extend(draft[3] for draft in drafts)
+            built = time.perf_counter()
+            print(f'>>> Se armaron y guardaron {len(grid_ids)} de {quantity} grillas.')
+            if grid_ids and len(grid_ids) < quantity:
+                reason = ('hay menos frases con solución que grillas pedidas' if short_of_quotes
+                          else f'algunas frases no se pudieron resolver en {self.BATCH_ROUNDS} rondas')
+                print(f'WARNING Faltaron {quantity - len(grid_ids)} grillas: {reason}.', file=sys.stderr)
+            found = DBManager.find_solutions(grid_ids)
+            solutions = [found[grid_id] for grid_id in grid_ids]
+            if booklet and solutions:
+                pdf_files = [self.print_booklet(solutions, include_solution, pool)]
+            else:
+                pdf_files = list(_map_traced(pool, _print_grid, solutions, [include_solution] * len(solutions)))
+        end = time.perf_counter()
+        for pdf_file in pdf_files:
+            print('file:///' + str(pdf_file.absolute()).replace('\\', '/'))
+        if grid_ids:
+            print(f'>>> {len(grid_ids)} grillas en {end - start:.2f} s ({len(grid_ids) / (end - start):.1f} grillas/s) '
+                  f'| carga: {loaded - start:.2f} s | armado: {built - loaded:.2f} s | pdf: {end - built:.2f} s')
+        else:
+            print('WARNING No se pudo generar ninguna grilla... Intente nuevamente!', file=sys.stderr)
+        return grid_ids
+
+    @staticmethod
+    def print_booklet(solutions: List[List[Dict]], include_solution: bool,
+                      pool: Optional[ProcessPoolExecutor] = None) -> Path:
+        """Genera un cuadernillo con las grillas indicadas y, con include_solution, sus soluciones al final.
+        Si se pasa un pool, las páginas de las grillas se arman en paralelo."""
+        from sachagrilla.layouts.pdflayout import PDFBooklet, layout_grid_page
+
+        print(f'>>> Armando un cuadernillo con {len(solutions)} grillas...')
+        booklet = PDFBooklet()
+        mapper = partial(_map_traced, pool) if pool is not None else map
+        booklet.add_pages(mapper(layout_grid_page, solutions, [False] * len(solutions)))
+        if include_solution:
+            booklet.add_solutions(solutions)
+        return booklet.print_booklet(f'{solutions[0][0]["id"]}-{solutions[-1][0]["id"]}_cuadernillo')
 
     @staticmethod
     def print(grid_id: int, args: Namespace):
         """Interfaz pública. Toma un id de grilla y genera el pdf correspondiente."""
+        from sachagrilla.layouts.pdflayout import PDFLayout
+
         solution = DBManager.find_solution(grid_id)
         print_solution = args.solucion
         pdf_file = PDFLayout(solution).print_grid(print_solution)
@@ -65,17 +506,30 @@ class Grid:
 
     @staticmethod
     def print_solution(args: Namespace):
-        """Interfaz pública. Toma un id de grilla y genera el pdf solo con la solución."""
-        grid_id = args.nbr
-        solution = DBManager.find_solution(grid_id)
-        if solution:
-            pdf_file = PDFLayout(solution).print_solution()
-            print('file:///' + str(pdf_file.absolute()).replace('\\', '/'))
-        else:
-            print(f'WARNING No existe la grilla N° {grid_id}. '
+        """Interfaz pública. Toma uno o más ids o rangos de ids de grilla y genera el pdf solo con las soluciones. Si son varias
+        grillas, las soluciones van todas juntas en un solo pdf."""
+        from sachagrilla.layouts.pdflayout import PDFBooklet, PDFLayout
+
+        DBManager()
+        grid_ids = list(dict.fromkeys(grid_id for numbers in args.nbr for grid_id in numbers))
+        solutions = DBManager.find_solutions(grid_ids)
+        missing = [grid_id for grid_id in grid_ids if grid_id not in solutions]
+        if missing:
+            print(f'WARNING No existe la grilla N° {", ".join(str(grid_id) for grid_id in missing)}. '
                   f'Genere una grilla nueva o imprima solución de alguna existente.', file=sys.stderr)
             available_grids = DBManager.get_available_grids()
             print(f'>>> Grillas disponibles: {available_grids}')
+        found = [solutions[grid_id] for grid_id in grid_ids if grid_id in solutions]
+        if len(found) == 1:
+            pdf_file = PDFLayout(found[0]).print_solution()
+        elif found:
+            print(f'>>> Generando pdf con las soluciones de {len(found)} sachagrillas ...')
+            booklet = PDFBooklet()
+            booklet.add_solutions(found)
+            pdf_file = booklet.print_booklet(f'{found[0][0]["id"]}-{found[-1][0]["id"]}_soluciones')
+        else:
+            return
+        print('file:///' + str(pdf_file.absolute()).replace('\\', '/'))
 
 
 if __name__ == '__main__':
@@ -2,23 +2,91 @@
 
 from datetime import date
 from pathlib import Path
-from typing import Dict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 from fpdf import FPDF
+from fpdf import fpdf as fpdf_module
+from fpdf.ttfonts import TTFontFile
 
 from sachagrilla import MAIN_MODULE_BASEPATH
+from sachagrilla.utils import profiling
 from sachagrilla.utils.utils import get_all_syllables
 
+FONTS = {'Ink Free': MAIN_MODULE_BASEPATH / 'fonts/Inkfree.ttf',
+         'Calibri Light': MAIN_MODULE_BASEPATH / 'fonts/calibril.ttf'}
+
+# caracteres que se incluyen siempre en las fuentes embebidas: así casi todos los pdfs usan el mismo subconjunto de
+# glifos y se puede reutilizar el ya armado
+SUBSET_CHARS = [*range(32, 127), *(ord(char) for char in 'áéíóúüñÁÉÍÓÚÜÑ¡¿«»°ºª')]
+
+
+class _CachedTTFontFile(TTFontFile):
+    """TTFontFile que guarda en memoria cada subconjunto de glifos ya armado. fpdf vuelve a parsear el ttf al
+    generar cada pdf para embeber solo los glifos usados, que es lo más caro de imprimir una grilla."""
+
+    subsets: Dict[Tuple[str, FrozenSet[int]], Tuple[bytes, Dict[int, int], int]] = {}
+
+    def makeSubset(self, file, subset):
+        key = (str(file), frozenset(subset))
+        if key not in self.subsets:
+            stream = super().makeSubset(file, subset)
+            self.subsets[key] = stream, self.codeToGlyph, self.maxUni
+        stream, code_to_glyph, self.maxUni = self.subsets[key]
+        self.codeToGlyph = dict(code_to_glyph)
+        return stream
+
+
+# fpdf 1.7 instancia TTFontFile desde su módulo al generar cada pdf, sin otra forma de cambiarla: se reemplaza una
+# sola vez, al importar este módulo. Los pdfs no cambian, solo se evita volver a armar los subconjuntos.
+fpdf_module.TTFontFile = _CachedTTFontFile
+
+
+class PDFRenderer:
+    """Carga las fuentes una sola vez por proceso y arma los FPDF de cada documento copiando sus métricas.
+
+    fpdf guarda las métricas de cada fuente en un .pkl al lado del ttf la primera vez que la usa; acá además se
+    evita volver a leerlas por cada grilla y se reutilizan los subconjuntos de glifos embebidos (_CachedTTFontFile)."""
+
+    def __init__(self):
+        template = FPDF()
+        for family, path in FONTS.items():
+            template.add_font(family, '', path, uni=True)
+        for font in template.fonts.values():
+            font['subset'].extend(SUBSET_CHARS)
+        self.fonts = template.fonts
+        self.font_files = template.font_files
+        # un documento vacío deja escritos los .cw127.pkl de fpdf y armado el subconjunto de glifos base, antes de
+        # que los workers de un pool los hereden
+        self.new_pdf().output(dest='S')
+
+    def new_pdf(self) -> FPDF:
+        """Devuelve un FPDF con márgenes y fuentes ya cargadas. Cada documento recibe su copia de los datos que fpdf
+        modifica al escribir (glifos usados, números de objeto)."""
+        pdf = FPDF()
+        pdf.set_margins(left=15, top=10)
+        pdf.set_auto_page_break(False, margin=1)
+        pdf.fonts = {key: dict(font, subset=list(font['subset'])) for key, font in self.fonts.items()}
+        pdf.font_files = {key: dict(font_file) for key, font_file in self.font_files.items()}
+        return pdf
+
+
+_renderer: Optional[PDFRenderer] = None
+
+
+def get_renderer() -> PDFRenderer:
+    """Devuelve el PDFRenderer del proceso, creándolo la primera vez."""
+    global _renderer
+    if _renderer is None:
+        with profiling.span('pdf.fonts'):
+            _renderer = PDFRenderer()
+    return _renderer
+
 
 class PDFLayout:
     """Proporciona funciones para generar los pdfs de grillas y sus soluciones."""
 
-    def __init__(self, solution: Dict):
-        self.pdf = FPDF()
-        self.pdf.set_margins(left=15, top=10)
-        self.pdf.set_auto_page_break(False, margin=1)
-        self.pdf.add_font('Ink Free', '', MAIN_MODULE_BASEPATH / 'fonts/Inkfree.ttf', uni=True)
-        self.pdf.add_font('Calibri Light', '', MAIN_MODULE_BASEPATH / 'fonts/calibril.ttf', uni=True)
+    def __init__(self, solution: Dict, renderer: Optional[PDFRenderer] = None, pdf: Optional[FPDF] = None):
+        self.pdf = pdf or (renderer or get_renderer()).new_pdf()
         self.output_path = MAIN_MODULE_BASEPATH / 'data/grids'
         self.solution = solution
         self.grid_id = solution[0]['id']
@@ -94,7 +162,8 @@ class PDFLayout:
         self.pdf.cell(0, self.pdf.font_size + 3, 'SÍLABAS', ln=2, border='LRT')
         self.pdf.set_font("Calibri light", size=9)
         words = [grid_line['word'] for grid_line in self.solution]
-        syllables = get_all_syllables(words)
+        stored_syllables = [grid_line.get('syllables') for grid_line in self.solution]
+        syllables = get_all_syllables(words, stored_syllables)
         self.pdf.multi_cell(0, self.pdf.font_size + 3, syllables, border='LRB')
 
     def draw_solution(self, with_grid: bool):
@@ -112,34 +181,110 @@ class PDFLayout:
         quote_reversed = (self.solution[0]['quote'] + ' - ' + self.solution[0]['author'] + '.')[::-1]
         self.pdf.multi_cell(0, self.pdf.font_size + 1, f'"{quote_reversed}"', border=0)
 
+    def draw_page(self, include_solution: bool):
+        """Dibuja la página de la grilla, con o sin solución."""
+        with profiling.span('pdf.layout', grid_id=self.grid_id):
+            self.pdf.add_page()
+            self.header()
+            self.draw_grid()
+            self.draw_clues()
+            self.draw_syllables()
+            if include_solution:
+                self.draw_solution(True)
+            self.footer()
+
+    def write(self, pdf_name: str) -> Path:
+        """Escribe el pdf con el nombre indicado en output_path y devuelve su ruta."""
+        with profiling.span('pdf.write', file=pdf_name):
+            self.pdf.output(self.output_path / pdf_name)
+        return self.output_path / pdf_name
+
     def print_grid(self, include_solution: bool) -> Path:
         """Interfaz pública. Llama a los métodos necesarios para imprimir la grilla, con o sin solución"""
         print('>>> Generando un pdf bonito y prolijo...')
-        self.pdf.add_page()
-        self.header()
-        self.draw_grid()
-        self.draw_clues()
-        self.draw_syllables()
-        if include_solution:
-            self.draw_solution(True)
-        self.footer()
+        self.draw_page(include_solution)
         today = str(date.today())
-        pdf_name = f'SachaGrilla-{self.grid_id}_{today}.pdf'
-        self.pdf.output(self.output_path / pdf_name)
+        pdf_file = self.write(f'SachaGrilla-{self.grid_id}_{today}.pdf')
         print('>>> PDF listo para rayar!')
-        return self.output_path / pdf_name
+        return pdf_file
+
+    def render(self, include_solution: bool) -> bytes:
+        """Dibuja la grilla, con o sin solución, y devuelve el pdf en memoria sin escribir ningún archivo."""
+        self.draw_page(include_solution)
+        with profiling.span('pdf.write', grid_id=self.grid_id):
+            # fpdf arma el documento como str con un caracter latin-1 por byte
+            return self.pdf.output(dest='S').encode('latin-1')
 
     def print_solution(self) -> Path:
         """Interfaz pública. Llama a los métodos necesarios para la solución de una grilla"""
         print('>>> Generando pdf con solución de sachagrilla ...')
-        self.pdf.add_page()
-        self.header()
-        self.draw_solution(False)
-        self.footer()
+        with profiling.span('pdf.layout', grid_id=self.grid_id):
+            self.pdf.add_page()
+            self.header()
+            self.draw_solution(False)
+            self.footer()
         today = str(date.today())
-        pdf_name = f'SachaGrilla-{self.grid_id}_solucion_{today}.pdf'
-        self.pdf.output(self.output_path / pdf_name)
+        pdf_file = self.write(f'SachaGrilla-{self.grid_id}_solucion_{today}.pdf')
         print('>>> PDF con solución listo!')
+        return pdf_file
+
+
+def layout_grid_page(solution: List[Dict], include_solution: bool) -> Tuple[str, Dict[str, List[int]]]:
+    """Dibuja la página de una grilla en un FPDF propio y devuelve su contenido y los caracteres usados de cada
+    fuente. Se usa en los workers del pool para armar las páginas de un cuadernillo en paralelo."""
+    layout = PDFLayout(solution)
+    layout.draw_page(include_solution)
+    return layout.pdf.pages[1], {key: font['subset'] for key, font in layout.pdf.fonts.items()}
+
+
+class PDFBooklet:
+    """Junta varias grillas en un solo pdf (un cuadernillo), con las soluciones al final.
+
+    Las páginas de las grillas se arman por separado (con layout_grid_page, en paralelo) y se agregan en orden:
+    como todos los FPDF salen del mismo PDFRenderer, las fuentes tienen los mismos nombres internos en todos y el
+    contenido de una página se puede pasar tal cual de un documento a otro."""
+
+    SOLUTION_SPACE = 45
+
+    def __init__(self, renderer: Optional[PDFRenderer] = None):
+        self.pdf = (renderer or get_renderer()).new_pdf()
+        self.output_path = MAIN_MODULE_BASEPATH / 'data/grids'
+
+    def add_pages(self, pages: Iterable[Tuple[str, Dict[str, List[int]]]]):
+        """Agrega las páginas ya armadas con layout_grid_page, en el orden recibido."""
+        for content, subsets in pages:
+            self.pdf.add_page()
+            self.pdf.pages[self.pdf.page] = content
+            for key, subset in subsets.items():
+                self.pdf.fonts[key]['subset'].extend(subset)
+
+    def add_solutions(self, solutions: List[List[Dict]]):
+        """Dibuja las soluciones de las grillas una debajo de la otra, en las páginas que hagan falta."""
+        with profiling.span('pdf.layout', solutions=len(solutions)):
+            layout = None
+            for solution in solutions:
+                if layout is None or self.pdf.get_y() > self.pdf.h - self.SOLUTION_SPACE:
+                    if layout is not None:
+                        layout.footer()
+                    self.pdf.add_page()
+                    self.pdf.set_y(20)
+                    self.pdf.set_font('Ink Free', size=24)
+                    self.pdf.cell(0, self.pdf.font_size + 4, txt='SOLUCIONES', border=0, ln=2, align='C')
+                    self.pdf.ln()
+                layout = PDFLayout(solution, pdf=self.pdf)
+                self.pdf.set_font('Ink Free', size=10)
+                self.pdf.cell(0, self.pdf.font_size + 2, f'SACHAGRILLA N° {layout.grid_id}', ln=2)
+                layout.draw_solution(False)
+                self.pdf.ln(4)
+            if layout is not None:
+                layout.footer()
+
+    def print_booklet(self, name: str) -> Path:
+        """Interfaz pública. Escribe el cuadernillo con el nombre indicado (sin fecha ni extensión)."""
+        pdf_name = f'SachaGrilla-{name}_{date.today()}.pdf'
+        with profiling.span('pdf.write', file=pdf_name):
+            self.pdf.output(self.output_path / pdf_name)
+        print(f'>>> Cuadernillo listo para rayar! ({self.pdf.page} pág.)')
         return self.output_path / pdf_name
 
 
@@ -1,13 +1,23 @@
 # scraper_clarin.py
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Iterable, Iterator, Dict, Union, Callable
 import csv
+import importlib.util
+import sys
 
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import requests
 
 from sachagrilla import MAIN_MODULE_BASEPATH
+from sachagrilla.utils import profiling
+
+PageData = Tuple[Optional[Tuple[str, str]], List[str], List[str]]
+GridData = Tuple[int, Optional[Tuple[str, str]], List[Tuple[str, str]]]
+
 
 class ScraperClarin:
     """Proporciona funciones para scrapear los datos de las claringrillas."""
@@ -22,15 +32,28 @@ class ScraperClarin:
         'QUOTE_CLASS': 'pull-right col-lg-9 col-md-8 col-sm-6 col-xs-12 words',
     }
 
-    def __init__(self, next_grid_to_scrape: int):
-        self.base_url = 'https://www.clarin.com/claringrilla/'
+    TIMEOUT = 30
+    # lxml es opcional (pip install sachagrilla[fast]); si no está se usa el parser de la biblioteca estándar
+    PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+    def __init__(self, next_grid_to_scrape: int, concurrency: int = 8,
+                 base_url: str = 'https://www.clarin.com/claringrilla/'):
+        self.base_url = base_url
         self.next_grid_to_scrape = next_grid_to_scrape
+        self.concurrency = max(1, concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.scraped_data_path = MAIN_MODULE_BASEPATH / 'data/scraped'
         # self.scraped_data_path = Path('../data/scraped/')
 
-    def scrape_data(self, nbr_pages: int = 20) -> int:
+    def scrape_data(self, nbr_pages: int = 20, sink: Optional[Callable[[GridData], None]] = None,
+                    save_files: bool = True) -> int:
         """Interfaz pública. Toma número de grillas a scrapear, descarga cada una, extrae data de palabra+significado
         y frase y las almacena en archivos .csv.
+        Si se indica sink, además se le pasa la data de cada grilla apenas se extrae, para cargarla sin pasar por
+        disco; con save_files=False los .csv no se escriben.
         Retorna el número de la grid siguiente a scrapear."""
 
         start = self.next_grid_to_scrape
@@ -38,53 +61,99 @@ class ScraperClarin:
         print(f'>>> Iniciando scraping de {nbr_pages} páginas...')
 
         totals = dict(words=0, clues=0, quotes=0)
-        for i in range(start, end):
-            current_url = self.base_url + str(i)
-            next_url = self.base_url + str(i + 1)
-            page = self.get_page(current_url)
-            next_page = self.get_page(next_url)
-            if page and next_page:
-                quote = self.extract_quote(page)
-                clues = self.extract_clues(page)
-                words = self.extract_words(next_page)
-                if clues and words:
-                    totals['words'] += len(words)
-                    totals['clues'] += len(clues)
-                    self.save_to_word_file(words, clues, i)
-                if quote:
-                    totals['quotes'] += 1
-                    self.save_to_quote_file(quote, i)
-                print(f'>>> Data de grid {i} extraída y guardada.')
+        # las definiciones de la grilla i se resuelven con las palabras publicadas en la grilla i+1,
+        # así que cada página se parsea una sola vez y se guarda su extracción hasta tener la siguiente
+        previous_number, previous_data = None, None
+        for number, page in self.fetch_pages(range(start, end + 1)):
+            with profiling.span('scraper.parse', url=self.base_url + str(number)):
+                data = self.extract(page) if page else None
+            if previous_data and data:
+                grid_data = self.process_data(previous_number, previous_data, data, totals, save_files)
+                if sink:
+                    sink(grid_data)
+            previous_number, previous_data = number, data
         print(f'>>> Se terminó de scrapear {abs(start-end)} grillas.')
         print(f'>>> Sacamos {totals["quotes"]} frases, {totals["words"]} palabras y {totals["clues"]} significados.')
         return end
 
+    def process_data(self, grid_number: int, data: PageData, next_data: PageData, totals: Dict[str, int],
+                     save_files: bool = True) -> GridData:
+        """Toma la data extraída de una grilla y de la siguiente, y arma frase y palabra+significado de la grilla.
+        Con save_files los guarda en .csv."""
+        quote, clues, _ = data
+        words = next_data[2]
+        word_clues = []
+        if clues and words:
+            totals['words'] += len(words)
+            totals['clues'] += len(clues)
+            word_clues = list(zip(words, clues))
+            if save_files:
+                self.save_to_word_file(words, clues, grid_number)
+        if quote:
+            totals['quotes'] += 1
+            if save_files:
+                self.save_to_quote_file(quote, grid_number)
+        print(f'>>> Data de grid {grid_number} extraída.')
+        return grid_number, quote, word_clues
+
+    def fetch_pages(self, grid_numbers: Iterable[int]) -> Iterator[Tuple[int, Optional[str]]]:
+        """Descarga las grillas en paralelo, cada una una sola vez, y las devuelve en orden.
+        Como máximo hay 2 * concurrency páginas descargadas o en vuelo a la vez."""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = deque()
+            for grid_number in grid_numbers:
+                pending.append((grid_number, pool.submit(self.get_page, self.base_url + str(grid_number))))
+                if len(pending) >= 2 * self.concurrency:
+                    grid_number, future = pending.popleft()
+                    yield grid_number, future.result()
+            while pending:
+                grid_number, future = pending.popleft()
+                yield grid_number, future.result()
+
     def get_page(self, url: str) -> Optional[str]:
         """Obtiene url, descarga contenido de la página y lo devuelve."""
-        r = requests.get(url)
+        try:
+            with profiling.span('scraper.fetch', url=url):
+                r = self.session.get(url, timeout=ScraperClarin.TIMEOUT)
+        except requests.RequestException as e:
+            print(f'WARNING: No se pudo descargar {url}: {e}', file=sys.stderr)
+            return None
         if r.status_code == 200:
             return r.text
 
-    def extract_clues(self, page: str) -> List[str]:
+    def parse(self, page: Union[str, BeautifulSoup]) -> BeautifulSoup:
+        """Toma contenido de página html y lo parsea con el backend más rápido disponible. Si ya está parseado,
+        lo devuelve tal cual."""
+        if isinstance(page, BeautifulSoup):
+            return page
+        return BeautifulSoup(page, ScraperClarin.PARSER)
+
+    def extract(self, page: Union[str, BeautifulSoup]) -> PageData:
+        """Interfaz pública. Toma contenido de página html, lo parsea una sola vez y devuelve frase, significados y
+        palabras."""
+        soup = self.parse(page)
+        return self.extract_quote(soup), self.extract_clues(soup), self.extract_words(soup)
+
+    def extract_clues(self, page: Union[str, BeautifulSoup]) -> List[str]:
         """Toma contenido de página html y devuelve una lista de significados."""
-        soup = BeautifulSoup(page, 'html.parser')
+        soup = self.parse(page)
         tag = soup.find(ScraperClarin.MARKERS['CLUE_TAG'], class_=ScraperClarin.MARKERS['CLUE_CLASS'])
         clues = tag.find_all('p', class_='definition-row')
         clues = self.clean(*[clue.string for clue in clues])
         return clues
 
-    def extract_words(self, page: str) -> List[str]:
+    def extract_words(self, page: Union[str, BeautifulSoup]) -> List[str]:
         """Toma contenido de página html y devuelve una lista de palabras."""
-        soup = BeautifulSoup(page, 'html.parser')
+        soup = self.parse(page)
         tag = soup.find(ScraperClarin.MARKERS['WORD_TAG'], class_=ScraperClarin.MARKERS['WORD_CLASS'])
         words = tag.select('div > .col2 > span')[0].string.split(',')
         words = self.clean(*words)
         return words
 
-    def extract_quote(self, page: str) -> Optional[Tuple[str, str]]:
+    def extract_quote(self, page: Union[str, BeautifulSoup]) -> Optional[Tuple[str, str]]:
         """Toma contenido de página html y devuelve frase y autor.
         Si la frase es parte de una más larga, la ignora."""
-        soup = BeautifulSoup(page, 'html.parser')
+        soup = self.parse(page)
         tag = soup.find(ScraperClarin.MARKERS['QUOTE_TAG'], class_=ScraperClarin.MARKERS['QUOTE_CLASS'])
         quote = tag.select('div > .col3 > span')[0].string.strip()
         if 'parte)' not in quote and '(Conclus' not in quote:
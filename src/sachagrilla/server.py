@@ -0,0 +1,381 @@
+# server.py
+
+""" Proporciona el modo servicio (sachagrilla serve): un servidor HTTP local que mantiene cargados el corpus, los
+índices, las fuentes y la conexión a la BD, para generar grillas y sus pdfs con latencia interactiva.
+
+    POST /grillas              genera una grilla (opcional, en el cuerpo json: position1 y position2)
+    GET  /grillas/<id>         devuelve la grilla con su solución
+    GET  /grillas/<id>/pdf     devuelve el pdf de la grilla (con ?solucion=1, true o si, incluye la solución)
+    GET  /estado               devuelve datos del servicio
+
+Las respuestas son json, salvo el pdf. """
+
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import suppress
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import signal
+import time
+import traceback
+
+from sachagrilla.db.db_manager import DBManager
+from sachagrilla.grid import POSITIONS, Draft, Grid, GridSolver, UsageDelta, WordSource
+from sachagrilla.utils import profiling
+
+# estado, encabezados y cuerpo de una respuesta
+Response = Tuple[int, Dict[str, str], bytes]
+Handler = Callable[[re.Match, Dict[str, List[str]], bytes], Awaitable[Response]]
+
+# valores de ?solucion= que piden incluir la solución en el pdf
+TRUE_VALUES = ('1', 'true', 'si', 'sí')
+
+
+class ServiceError(Exception):
+    """Error que se devuelve al cliente con el estado HTTP indicado."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+_worker_solver: Optional[GridSolver] = None
+# grillas guardadas cuyos usos ya sumó este worker
+_worker_seen = 0
+
+
+def _init_worker(index: WordSource, usage: Dict[int, int]):
+    """Inicializa un proceso del pool del servicio con el índice y los usos de las palabras, y carga las fuentes."""
+    from sachagrilla.layouts.pdflayout import get_renderer
+
+    global _worker_solver
+    _worker_solver = GridSolver(index, usage)
+    get_renderer()
+
+
+def _compose(delta: UsageDelta, quote_id: int, content: str, feasible_mask: Optional[int],
+             position1: Optional[int], position2: Optional[int]) -> Tuple[int, int, Optional[Draft]]:
+    """Suma los usos de las grillas guardadas que este worker todavía no vio y arma las palabras de una grilla
+    dentro de un proceso del pool. Devuelve el pid del worker, las grillas que ya vio y la grilla armada."""
+    global _worker_seen
+    first, grids = delta
+    _worker_solver.record_usage(word_id for word_ids in grids[max(0, _worker_seen - first):] for word_id in word_ids)
+    _worker_seen = max(_worker_seen, first + len(grids))
+    return os.getpid(), _worker_seen, _worker_solver.compose(quote_id, content, feasible_mask, position1, position2)
+
+
+def _render(solution: List[Dict], include_solution: bool) -> bytes:
+    """Genera el pdf de una grilla en memoria dentro de un proceso del pool."""
+    from sachagrilla.layouts.pdflayout import PDFLayout
+
+    return PDFLayout(solution).render(include_solution)
+
+
+def grid_json(solution: List[Dict]) -> Dict[str, Any]:
+    """Arma la respuesta json de una grilla a partir de su solución (las filas de DBManager.find_solution)."""
+    first = solution[0]
+    return dict(id=first['id'], quote=first['quote'], author=first['author'], position1=first['position1'],
+                position2=first['position2'], created_at=first['created_at'],
+                rows=[dict(row_nbr=row['row_nbr'], word=row['word'], syllables=row['syllables'], clue=row['clue'])
+                      for row in solution])
+
+
+def json_response(status: int, data: Any) -> Response:
+    """Arma una respuesta json."""
+    payload = json.dumps(data, ensure_ascii=False, default=str).encode('utf8')
+    return status, {'Content-Type': 'application/json; charset=utf-8'}, payload
+
+
+def _pool_context():
+    """Devuelve el contexto de multiprocessing para el pool. Con fork, los procesos que se crean mientras hay
+    conexiones abiertas heredan sus sockets y el cliente no recibe el cierre; forkserver (o spawn, donde no existe)
+    los crea desde un proceso limpio, y solo hay que mandarles el índice."""
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['sachagrilla.server'])
+    return context
+
+
+class GridService:
+    """Servicio de generación de grillas con todo cargado en memoria.
+
+    El loop de asyncio atiende las conexiones. La BD se usa siempre desde un mismo hilo (una sola conexión, y las
+    escrituras no compiten entre sí) y el armado de las palabras y el pdf, que usan CPU, van a un pool de procesos
+    que recibe el índice y los usos de las palabras una sola vez, al crearse. Para que la rotación por uso no quede
+    desactualizada, cada pedido de armado lleva las palabras de las grillas guardadas después que el worker más
+    atrasado todavía no vio (como mucho MAX_DELTA grillas; un worker que quedó más atrás pierde las más viejas)."""
+
+    MAX_ATTEMPTS = 10
+    MAX_DELTA = 1000
+    MAX_BODY = 64 * 1024
+    MAX_HEADERS = 100
+    # bytes de la línea del pedido más los encabezados; es también el límite de línea de los StreamReader
+    MAX_HEADER_SIZE = 16 * 1024
+
+    def __init__(self, workers: Optional[int] = None, compact: bool = False):
+        self.workers = workers or os.cpu_count() or 1
+        self.compact = compact
+        self.db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sachagrilla-db')
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.grid: Optional[Grid] = None
+        self.started = time.time()
+        self.built = 0
+        # palabras de cada grilla guardada desde la grilla usage_start, y hasta qué grilla vio cada worker (por pid)
+        self.usage_log: List[List[int]] = []
+        self.usage_start = 0
+        self.worker_seen: Dict[int, int] = {}
+        self.routes: List[Tuple[str, re.Pattern, Handler]] = [
+            ('GET', re.compile(r'/estado'), self.get_status),
+            ('POST', re.compile(r'/grillas'), self.post_grid),
+            ('GET', re.compile(r'/grillas/(\d+)'), self.get_grid),
+            ('GET', re.compile(r'/grillas/(\d+)/pdf'), self.get_pdf),
+        ]
+
+    async def in_db(self, func: Callable, *args):
+        """Ejecuta func en el hilo de la BD."""
+        return await asyncio.get_running_loop().run_in_executor(self.db_executor, func, *args)
+
+    async def in_pool(self, func: Callable, *args):
+        """Ejecuta func en un proceso del pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    def _load(self) -> Grid:
+        """Carga el índice y los usos de las palabras (en el hilo de la BD)."""
+        grid = Grid(compact=self.compact)
+        grid.get_solver()
+        return grid
+
+    async def start(self):
+        """Carga todo y levanta los workers, para que el primer pedido no pague la carga."""
+        self.grid = await self.in_db(self._load)
+        usage = await self.in_db(dict, self.grid.solver.usage)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context(),
+                                        initializer=_init_worker, initargs=(self.grid.solver.index, usage))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, os.getpid) for _ in range(self.workers)))
+
+    def usage_delta(self) -> UsageDelta:
+        """Devuelve las palabras de las grillas guardadas que algún worker todavía no vio (como mucho MAX_DELTA) y
+        descarta las que ya vieron todos."""
+        end = self.usage_start + len(self.usage_log)
+        first = min(self.worker_seen.values()) if len(self.worker_seen) >= self.workers else self.usage_start
+        first = max(first, end - self.MAX_DELTA, self.usage_start)
+        del self.usage_log[:first - self.usage_start]
+        self.usage_start = first
+        return first, list(self.usage_log)
+
+    def close(self):
+        """Detiene el pool y el hilo de la BD."""
+        if self.pool is not None:
+            self.pool.shutdown()
+        self.db_executor.shutdown()
+
+    def _save(self, draft: Draft) -> List[Dict]:
+        """Guarda una grilla armada y devuelve su solución (en el hilo de la BD)."""
+        grid_id = self.grid.save_many([draft])[0]
+        return DBManager.find_solution(grid_id)
+
+    async def build(self, position1: Optional[int] = None, position2: Optional[int] = None) -> List[Dict]:
+        """Genera una grilla, probando con otra frase si la elegida no tiene solución. Devuelve su solución."""
+        for _ in range(self.MAX_ATTEMPTS):
+            quotes = await self.in_db(self.grid.sample_quotes, 1, position1, position2)
+            if not quotes:
+                raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE,
+                                   'No hay frases con solución para las palabras disponibles.')
+            quote = quotes[0]
+            pid, seen, draft = await self.in_pool(_compose, self.usage_delta(), quote.id, quote.content,
+                                                  quote.feasible_mask, position1, position2)
+            self.worker_seen[pid] = max(self.worker_seen.get(pid, 0), seen)
+            if draft is not None:
+                solution = await self.in_db(self._save, draft)
+                self.usage_log.append(draft[3])
+                self.built += 1
+                return solution
+        raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE, 'Esta grilla estaba muy difícil... Intente nuevamente!')
+
+    async def find_solution(self, grid_id: int) -> List[Dict]:
+        """Devuelve la solución de una grilla existente."""
+        solution = await self.in_db(DBManager.find_solution, grid_id)
+        if not solution:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f'No existe la grilla N° {grid_id}.')
+        return solution
+
+    async def get_status(self, match: re.Match, query: Dict[str, List[str]], body: bytes) -> Response:
+        return json_response(HTTPStatus.OK, dict(workers=self.workers, built=self.built,
+                                                 uptime=round(time.time() - self.started, 1),
+                                                 index=type(self.grid.solver.index).__name__,
+                                                 snapshot=self.grid.snapshot is not None))
+
+    async def post_grid(self, match: re.Match, query: Dict[str, List[str]], body: bytes) -> Response:
+        try:
+            params = json.loads(body or b'{}')
+            position1, position2 = params.get('position1'), params.get('position2')
+        except (ValueError, AttributeError):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'El cuerpo tiene que ser un objeto json.')
+        if (position1, position2) != (None, None) and (position1, position2) not in POSITIONS:
+            raise ServiceError(HTTPStatus.BAD_REQUEST,
+                               f'Las posiciones tienen que ser uno de estos pares: {POSITIONS}.')
+        solution = await self.build(position1, position2)
+        return json_response(HTTPStatus.CREATED, grid_json(solution))
+
+    async def get_grid(self, match: re.Match, query: Dict[str, List[str]], body: bytes) -> Response:
+        return json_response(HTTPStatus.OK, grid_json(await self.find_solution(int(match[1]))))
+
+    async def get_pdf(self, match: re.Match, query: Dict[str, List[str]], body: bytes) -> Response:
+        grid_id = int(match[1])
+        include_solution = query.get('solucion', ['0'])[-1].lower() in TRUE_VALUES
+        pdf = await self.in_pool(_render, await self.find_solution(grid_id), include_solution)
+        return HTTPStatus.OK, {'Content-Type': 'application/pdf',
+                               'Content-Disposition': f'inline; filename="SachaGrilla-{grid_id}.pdf"'}, pdf
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Response:
+        """Busca la ruta del pedido y ejecuta su handler. Los errores se devuelven como json con su estado."""
+        url = urlsplit(target)
+        allowed = []
+        try:
+            for route_method, pattern, handler in self.routes:
+                match = pattern.fullmatch(url.path.rstrip('/') or '/')
+                if match is None:
+                    continue
+                if route_method == method:
+                    with profiling.span('serve.request', method=method, path=url.path):
+                        return await handler(match, parse_qs(url.query), body)
+                allowed.append(route_method)
+            if allowed:
+                raise ServiceError(HTTPStatus.METHOD_NOT_ALLOWED, f'Métodos permitidos: {", ".join(allowed)}.')
+            raise ServiceError(HTTPStatus.NOT_FOUND, f'No existe la ruta {url.path}.')
+        except ServiceError as e:
+            return json_response(e.status, dict(error=e.message))
+        except Exception:
+            traceback.print_exc()
+            return json_response(HTTPStatus.INTERNAL_SERVER_ERROR, dict(error='Error interno del servicio.'))
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str],
+                                                                                bytes]]:
+        """Lee un pedido HTTP/1.x y devuelve método, target, versión, encabezados y cuerpo, o None si el cliente
+        cerró la conexión. Solo acepta cuerpos con Content-Length: uno con Transfer-Encoding quedaría sin leer en
+        la conexión, así que se rechaza (y handle la cierra)."""
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # la línea supera el límite del StreamReader
+            raise ServiceError(HTTPStatus.REQUEST_URI_TOO_LONG, 'La línea del pedido es demasiado larga.')
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'Pedido mal formado.')
+        size = len(line)
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                line = None
+            if line is None or size + len(line) > self.MAX_HEADER_SIZE:
+                raise ServiceError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'Los encabezados son demasiado grandes.')
+            size += len(line)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= self.MAX_HEADERS:
+                raise ServiceError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'Demasiados encabezados.')
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers:
+            raise ServiceError(HTTPStatus.NOT_IMPLEMENTED, 'Transfer-Encoding no soportado: envíe el cuerpo con '
+                                                           'Content-Length.')
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'Content-Length inválido.')
+        if length > self.MAX_BODY:
+            raise ServiceError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'El cuerpo del pedido es demasiado grande.')
+        body = await reader.readexactly(length) if length > 0 else b''
+        return method.upper(), target, version, headers, body
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Atiende una conexión. Con HTTP/1.1 la conexión se mantiene abierta entre pedidos (keep-alive)."""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except ServiceError as e:
+                    status, headers, payload = json_response(e.status, dict(error=e.message))
+                    self.write_response(writer, status, headers, payload, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, version, request_headers, body = request
+                start = time.perf_counter()
+                status, headers, payload = await self.dispatch(method, target, body)
+                connection = request_headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+                self.write_response(writer, status, headers, payload, keep_alive)
+                await writer.drain()
+                print(f'>>> {method} {target} {status} {(time.perf_counter() - start) * 1000:.1f} ms')
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    def write_response(writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], payload: bytes,
+                       keep_alive: bool):
+        """Escribe una respuesta HTTP/1.1."""
+        lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}',
+                 *(f'{name}: {value}' for name, value in headers.items()),
+                 f'Content-Length: {len(payload)}',
+                 f'Connection: {"keep-alive" if keep_alive else "close"}']
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+
+    async def serve(self, host: str, port: int, socket_path: Optional[Path] = None):
+        """Carga todo y atiende pedidos por TCP en host:port, o por el socket unix indicado, hasta que se cancela."""
+        start = time.perf_counter()
+        await self.start()
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=str(socket_path), limit=self.MAX_HEADER_SIZE)
+            address = f'unix:{socket_path}'
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=self.MAX_HEADER_SIZE)
+            address = f'http://{host}:{server.sockets[0].getsockname()[1]}'
+        # SIGTERM detiene el servicio igual que Ctrl+C (en Windows no hay señales en el loop)
+        with suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        print(f'>>> SachaGrilla atendiendo en {address} con {self.workers} workers '
+              f'(carga: {time.perf_counter() - start:.2f} s). Ctrl+C para detener.')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+            if socket_path is not None:
+                with suppress(OSError):
+                    socket_path.unlink()
+
+
+def serve(args: Namespace):
+    """Interfaz pública. Levanta el servicio y atiende pedidos hasta que se interrumpe con Ctrl+C."""
+    service = GridService(args.workers, args.compacto)
+    try:
+        asyncio.run(service.serve(args.host, args.puerto, args.socket))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print('>>> Servicio detenido.')
+
+
+if __name__ == '__main__':
+    serve(Namespace(workers=None, compacto=False, host='127.0.0.1', puerto=8765, socket=None))
@@ -0,0 +1,80 @@
+# normalize.py
+
+""" Proporciona la normalización de texto (minúsculas, sin acentos ni puntuación) con tablas de str.translate. """
+
+from typing import Dict, Iterable, List, Tuple
+import unicodedata
+
+# la ñ es una letra aparte en castellano, no una n acentuada, así que se conserva explícitamente
+EXPLICIT = {'ñ': 'ñ', 'Ñ': 'ñ'}
+
+
+class _FoldTable(dict):
+    """Tabla para str.translate que calcula y guarda a demanda la traducción de los caracteres que no tiene:
+    descompone con unicodedata, descarta las marcas diacríticas y pasa a minúscula.
+    Con keep_length cada caracter se traduce siempre a un solo caracter y la puntuación se conserva."""
+
+    def __init__(self, keep_length: bool):
+        super().__init__()
+        self.keep_length = keep_length
+
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        if char in EXPLICIT:
+            folded = EXPLICIT[char]
+        elif unicodedata.category(char).startswith('P') and not self.keep_length:
+            folded = ''
+        else:
+            decomposed = unicodedata.normalize('NFD', char)
+            folded = ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+            if self.keep_length and len(folded) != 1:
+                folded = char.lower() if len(char.lower()) == 1 else char
+        self[codepoint] = folded
+        return folded
+
+
+def _build_table(keep_length: bool) -> _FoldTable:
+    """Arma la tabla precargando los caracteres que aparecen en frases y palabras en castellano."""
+    table = _FoldTable(keep_length)
+    for char in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ' \
+                'àáâãäåèéêëìíîïòóôõöùúûüÀÁÂÃÄÅÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜñÑçÇ' \
+                ',.:;!¡?¿"\'()-«»':
+        table[ord(char)]
+    return table
+
+
+TEXT_TABLE = _build_table(keep_length=False)
+WORD_TABLE = _build_table(keep_length=True)
+
+
+def normalize(text: str, keep_length: bool = False) -> str:
+    """Toma un texto y lo devuelve en minúscula y sin signos de puntuación ni acentuación.
+    Con keep_length conserva la longitud (y la puntuación), para comparar letras por posición."""
+    return text.translate(WORD_TABLE if keep_length else TEXT_TABLE)
+
+
+def normalize_many(texts: Iterable[str], keep_length: bool = False) -> List[str]:
+    """Normaliza muchos textos con una sola llamada a str.translate, uniéndolos con saltos de línea.
+    Si algún texto ya tiene saltos de línea, los normaliza de a uno."""
+    texts = list(texts)
+    if not texts:
+        return []
+    joined = '\n'.join(texts)
+    if joined.count('\n') != len(texts) - 1:
+        return [normalize(text, keep_length) for text in texts]
+    return normalize(joined, keep_length).split('\n')
+
+
+def encode_letters(forms: List[str]) -> Tuple[Dict[str, int], int, bytes]:
+    """Codifica formas normalizadas (keep_length) como una fila de bytes de ancho fijo por forma: cada letra se
+    reemplaza por su código (1 a 255, según el alfabeto del corpus) y se rellena con 0.
+    Devuelve el alfabeto {letra: código}, el ancho y los bytes."""
+    alphabet = sorted(set(''.join(forms)))
+    if len(alphabet) > 255:
+        raise ValueError(f'El corpus tiene {len(alphabet)} letras distintas, más de las que entran en un byte.')
+    codes = {letter: code for code, letter in enumerate(alphabet, start=1)}
+    to_codes = {ord(letter): chr(code) for letter, code in codes.items()}
+    width = max((len(form) for form in forms), default=0)
+    packed = b''.join(form.translate(to_codes).encode('latin-1').ljust(width, b'\0') for form in forms)
+    return codes, width, packed
+
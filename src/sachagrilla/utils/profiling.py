@@ -0,0 +1,108 @@
+# profiling.py
+
+""" Proporciona la medición de tiempos por etapa (spans con nombre) que se activa con la opción --profile de la cli.
+
+Mientras no se active, span devuelve siempre el mismo contexto vacío, así que dejar las etapas marcadas en el código
+no cuesta más que una llamada a función. """
+
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+import json
+import os
+import threading
+import time
+
+_NULL_SPAN = nullcontext()
+
+_enabled = False
+_spans: List['Span'] = []
+
+
+class Span(NamedTuple):
+    """Etapa medida: nombre, inicio y duración en segundos (perf_counter), proceso, hilo y datos extra."""
+    name: str
+    start: float
+    duration: float
+    pid: int
+    thread: int
+    attrs: Dict[str, Any]
+
+
+def enable(enabled: bool = True):
+    """Activa (o desactiva) el registro de spans del proceso."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    """Indica si se están registrando spans."""
+    return _enabled
+
+
+def span(name: str, **attrs):
+    """Devuelve un context manager que registra cuánto tarda el bloque, con los datos extra indicados (por ejemplo,
+    la url descargada). Si el registro no está activo, no hace nada."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _record(name, attrs)
+
+
+@contextmanager
+def _record(name: str, attrs: Dict[str, Any]) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _spans.append(Span(name, start, time.perf_counter() - start, os.getpid(), threading.get_ident(), attrs))
+
+
+def drain() -> List[Span]:
+    """Devuelve los spans registrados y los borra. Se usa en los procesos del pool para mandarlos al principal."""
+    spans = _spans[:]
+    del _spans[:len(spans)]
+    return spans
+
+
+def merge(spans: List[Span]):
+    """Agrega los spans registrados en otro proceso."""
+    _spans.extend(spans)
+
+
+def summary() -> List[Dict[str, Any]]:
+    """Agrupa los spans por nombre y devuelve cantidad, tiempo total, promedio y máximo de cada uno, ordenados por
+    tiempo total."""
+    groups: Dict[str, List[float]] = defaultdict(list)
+    for recorded in _spans:
+        groups[recorded.name].append(recorded.duration)
+    rows = [dict(name=name, count=len(durations), total=sum(durations), mean=sum(durations) / len(durations),
+                 max=max(durations))
+            for name, durations in groups.items()]
+    return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+
+def print_summary():
+    """Imprime el resumen de los spans registrados."""
+    rows = summary()
+    if not rows:
+        print('>>> Profile: no se registró ninguna etapa.')
+        return
+    print('>>> Profile por etapa (los tiempos de etapas anidadas o en paralelo se superponen):')
+    print(f'    {"etapa":<28}{"veces":>7}{"total":>11}{"promedio":>11}{"máximo":>11}')
+    for row in rows:
+        print(f'    {row["name"]:<28}{row["count"]:>7}{row["total"] * 1000:>9.1f}ms{row["mean"] * 1000:>9.2f}ms'
+              f'{row["max"] * 1000:>9.2f}ms')
+
+
+def write_trace(path: Path, origin: Optional[float] = None) -> Path:
+    """Guarda los spans en formato Trace Event (se abre con chrome://tracing o ui.perfetto.dev), con los tiempos en
+    microsegundos desde origin (por defecto, el primer span)."""
+    if origin is None:
+        origin = min((recorded.start for recorded in _spans), default=0.0)
+    events = [dict(name=recorded.name, ph='X', ts=(recorded.start - origin) * 1e6, dur=recorded.duration * 1e6,
+                   pid=recorded.pid, tid=recorded.thread, args=recorded.attrs)
+              for recorded in _spans]
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(dict(traceEvents=events, displayTimeUnit='ms'), f, ensure_ascii=False, default=str)
+    return path
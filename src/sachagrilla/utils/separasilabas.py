@@ -2,73 +2,70 @@
 # Based on Mabodo's ipython notebook (https://github.com/mabodo/sibilizador)
 # (c) Mabodo
 
-class char():
-    def __init__(self):
-        pass
+from functools import lru_cache
+from typing import List, Tuple
 
+# tipo de cada caracter: V vocal fuerte, v vocal débil, x, s y c para el resto
+CHAR_TYPES = {char: 'V' for char in 'aáeéoóíú'}
+CHAR_TYPES.update({char: 'v' for char in 'iuü'})
+CHAR_TYPES.update({'x': 'x', 's': 's'})
 
-class char_line():
-    def __init__(self, word):
-        self.word = word
-        self.char_line = [(char, self.char_type(char)) for char in word]
-        self.type_line = ''.join(chartype for char, chartype in self.char_line)
+# (patrón de tipos, desplazamiento del corte), en orden de prioridad
+RULES = (('VV', 1), ('cccc', 2), ('xcc', 1), ('ccx', 2), ('csc', 2), ('xc', 1), ('cc', 1), ('vcc', 2),
+         ('Vcc', 2), ('sc', 1), ('cs', 1), ('Vc', 1), ('vc', 1), ('Vs', 1), ('vs', 1))
 
-    def char_type(self, char):
-        if char in set(['a', 'á', 'e', 'é', 'o', 'ó', 'í', 'ú']):
-            return 'V'  # strong vowel
-        if char in set(['i', 'u', 'ü']):
-            return 'v'  # week vowel
-        if char == 'x':
-            return 'x'
-        if char == 's':
-            return 's'
-        else:
-            return 'c'
+# partes que no pueden quedar solas como sílaba
+LONE_TYPES = frozenset(['c', 's', 'x', 'cs'])
+LIQUIDS = frozenset(['l', 'r'])
 
-    def find(self, finder):
-        return self.type_line.find(finder)
+CACHE_SIZE = 65536
 
-    def split(self, pos, where):
-        return char_line(self.word[0:pos + where]), char_line(self.word[pos + where:])
 
-    def split_by(self, finder, where):
-        split_point = self.find(finder)
-        if split_point != -1:
-            chl1, chl2 = self.split(split_point, where)
-            return chl1, chl2
-        return self, False
+def type_line(word: str) -> str:
+    """Devuelve la línea de tipos de la palabra, un caracter de tipo por cada letra."""
+    return ''.join(CHAR_TYPES.get(char, 'c') for char in word)
 
-    def __str__(self):
-        return self.word
 
-    def __repr__(self):
-        return repr(self.word)
+@lru_cache(maxsize=CACHE_SIZE)
+def syllabify(word: str) -> Tuple[str, ...]:
+    """Separa la palabra en sílabas. Calcula la línea de tipos una sola vez y corta por rangos de índices, con una
+    pila en lugar de recursión; el resultado es el mismo que con el algoritmo recursivo original."""
+    types = type_line(word)
+    syllables = []
+    pending = [(0, len(word))]
+    while pending:
+        start, end = pending.pop()
+        for pattern, where in RULES:
+            split_point = types.find(pattern, start, end)
+            if split_point == -1:
+                continue
+            cut = split_point + where
+            if (cut - start <= 2 and types[start:cut] in LONE_TYPES) \
+                    or (end - cut <= 2 and types[cut:end] in LONE_TYPES):
+                continue
+            if types[cut - 1] == 'c' and word[cut] in LIQUIDS:
+                continue
+            if word[cut - 1] == 'l' and word[end - 1] == 'l':
+                continue
+            if word[cut - 1] == 'r' and word[end - 1] == 'r':
+                continue
+            if word[cut - 1] == 'c' and word[end - 1] == 'h':
+                continue
+            # primero se procesa la parte izquierda para mantener el orden de las sílabas
+            pending.append((cut, end))
+            pending.append((start, cut))
+            break
+        else:
+            syllables.append(word[start:end])
+    return tuple(syllables)
 
 
 class silabizer():
     def __init__(self):
         self.grammar = []
 
-    def split(self, chars):
-        rules = [('VV', 1), ('cccc', 2), ('xcc', 1), ('ccx', 2), ('csc', 2), ('xc', 1), ('cc', 1), ('vcc', 2),
-                 ('Vcc', 2), ('sc', 1), ('cs', 1), ('Vc', 1), ('vc', 1), ('Vs', 1), ('vs', 1)]
-        for split_rule, where in rules:
-            first, second = chars.split_by(split_rule, where)
-            if second:
-                if first.type_line in set(['c', 's', 'x', 'cs']) or second.type_line in set(['c', 's', 'x', 'cs']):
-                    # print 'skip1', first.word, second.word, split_rule, chars.type_line
-                    continue
-                if first.type_line[-1] == 'c' and second.word[0] in set(['l', 'r']):
-                    continue
-                if first.word[-1] == 'l' and second.word[-1] == 'l':
-                    continue
-                if first.word[-1] == 'r' and second.word[-1] == 'r':
-                    continue
-                if first.word[-1] == 'c' and second.word[-1] == 'h':
-                    continue
-                return self.split(first) + self.split(second)
-        return [chars]
+    def split(self, word: str) -> List[str]:
+        return list(syllabify(word))
 
     def __call__(self, word):
-        return self.split(char_line(word))
-
+        return self.split(word)
@@ -2,21 +2,25 @@
 
 """ Proporciona funciones auxiliares para procesar el texto durante la generación de la grilla. """
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import math
 import random
-import re
 
+from sachagrilla.utils import profiling
+from sachagrilla.utils.normalize import normalize
 from sachagrilla.utils.separasilabas import silabizer
 
+SYLLABLE_SEPARATOR = '-'
+
 
 def clean_text(text: str) -> str:
     """Toma un texto y lo devuelve en minúscula y sin signos de puntuación ni acentuación."""
-    patterns = [u'[àáâãäå]', u'[èéêë]', u'[ìíîï]', u'[òóôõö]', u'[ùúûü]', u'[,.:;]']
-    vowels = ['a', 'e', 'i', 'o', 'u', '']
-    for idx, pattern in enumerate(patterns):
-        text = re.sub(pattern, vowels[idx], text)
-    return text.lower()
+    return normalize(text)
+
+
+def normalize_word(word: str) -> str:
+    """Toma una palabra y la devuelve normalizada letra por letra, conservando su longitud."""
+    return normalize(word, keep_length=True)
 
 
 def cut_in_half(text: str) -> Tuple[str, str]:
@@ -41,12 +45,23 @@ def get_random_word(words, pos1, pos2, letter1, letter2):
         return None, None
 
 
-def get_all_syllables(words: List[str]) -> str:
-    """Toma lista de palabras y devuelve un str con las sílabas de todas las palabras ord. alf. y separadas por coma."""
+def join_syllables(word: str) -> str:
+    """Toma una palabra y devuelve sus sílabas separadas por SYLLABLE_SEPARATOR, como se guardan en la BD."""
+    return SYLLABLE_SEPARATOR.join(silabizer()(word))
+
+
+def get_all_syllables(words: List[str], stored_syllables: Optional[List[Optional[str]]] = None) -> str:
+    """Toma lista de palabras y devuelve un str con las sílabas de todas las palabras ord. alf. y separadas por coma.
+    Si se pasan las sílabas guardadas en la BD para cada palabra, solo se calculan las que faltan."""
     syllabator = silabizer()
     syllables = []
-    for word in words:
-        syllables.extend(syllabator(word))
+    stored_syllables = stored_syllables or [None] * len(words)
+    with profiling.span('syllabization', words=len(words)):
+        for word, stored in zip(words, stored_syllables):
+            if stored:
+                syllables.extend(stored.split(SYLLABLE_SEPARATOR))
+            else:
+                syllables.extend(syllabator(word))
     syllables = sorted([str(sil) for sil in syllables])
     syllables_str = ', '.join(syllables)
     return syllables_str
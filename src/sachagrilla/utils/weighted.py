@@ -0,0 +1,22 @@
+# weighted.py
+
+""" Proporciona muestreo ponderado para rotar palabras y frases según cuántas veces se usaron. """
+
+from typing import List, Sequence, TypeVar
+import heapq
+import random
+
+T = TypeVar('T')
+
+
+def usage_weight(times_used: int) -> float:
+    """Devuelve el peso de un item según cuántas veces se usó: uno sin usar pesa 1, uno usado n veces 1 / (n + 1)."""
+    return 1 / (1 + times_used)
+
+
+def weighted_sample(items: Sequence[T], weights: Sequence[float], quantity: int) -> List[T]:
+    """Elige hasta quantity items distintos, con probabilidad proporcional a su peso (Efraimidis-Spirakis: cada item
+    recibe la clave u ** (1 / peso) y se quedan las mayores)."""
+    keys = [(random.random() ** (1 / weight), idx) for idx, weight in enumerate(weights)]
+    return [items[idx] for _, idx in heapq.nlargest(quantity, keys)]
+
@@ -0,0 +1,88 @@
+# word_index.py
+
+""" Proporciona un índice en memoria de las palabras por posición y letra normalizada. """
+
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+import random
+
+from sachagrilla.utils.normalize import normalize_many
+
+
+class WordIndex:
+    """Indexa las palabras por (posición, letra) para elegirlas al azar sin recorrer todo el corpus.
+
+    Se construye una sola vez a partir de DBManager.get_words y se reutiliza en todas las filas y reintentos.
+    Si se pasan las formas normalizadas guardadas en la BD, no se vuelve a normalizar cada palabra."""
+
+    def __init__(self, words: Dict[int, str], normalized: Optional[Dict[int, str]] = None):
+        self.words = words
+        self.normalized: Dict[int, Tuple[str, ...]] = {}
+        # (posición, letra) -> ids ordenados por longitud, con sus longitudes en paralelo para poder acotar
+        self.letters: Dict[Tuple[int, str], List[int]] = {}
+        self.letters_lengths: Dict[Tuple[int, str], List[int]] = {}
+        # (posición1, posición2) -> (letra1, letra2) -> ids, se arma a demanda para cada par de posiciones
+        self.pairs: Dict[Tuple[int, int], Dict[Tuple[str, str], List[int]]] = {}
+        self._build(normalized or {})
+
+    def _build(self, normalized: Dict[int, str]):
+        """Normaliza cada palabra una sola vez (si no viene de la BD) y la agrega a los índices por posición."""
+        missing = [word_id for word_id in self.words if not normalized.get(word_id)]
+        normalized = dict(normalized)
+        normalized.update(zip(missing, normalize_many((self.words[word_id] for word_id in missing), keep_length=True)))
+        for word_id, word in sorted(self.words.items(), key=lambda item: len(item[1])):
+            letters = tuple(normalized[word_id])
+            self.normalized[word_id] = letters
+            for pos, letter in enumerate(letters):
+                self.letters.setdefault((pos, letter), []).append(word_id)
+                self.letters_lengths.setdefault((pos, letter), []).append(len(word))
+
+    def _get_pairs(self, pos1: int, pos2: int) -> Dict[Tuple[str, str], List[int]]:
+        """Devuelve (y cachea) el índice de pares de letras para las posiciones indicadas."""
+        key = (pos1, pos2)
+        if key not in self.pairs:
+            pairs = {}
+            for word_id, letters in self.normalized.items():
+                if len(letters) > pos2:
+                    pairs.setdefault((letters[pos1], letters[pos2]), []).append(word_id)
+            self.pairs[key] = pairs
+        return self.pairs[key]
+
+    def candidates(self, pos1: int, pos2: int, letter1: str, letter2: Optional[str],
+                   max_length: Optional[int] = None) -> Sequence[int]:
+        """Devuelve los ids de las palabras cuyas letras en las posiciones señaladas coinciden con las indicadas.
+        Si no hay letter2, solo se compara pos1 y se puede acotar la longitud de las palabras con max_length."""
+        if letter2:
+            return self._get_pairs(pos1, pos2).get((letter1, letter2), [])
+        word_ids = self.letters.get((pos1, letter1), [])
+        if max_length is None:
+            return word_ids
+        limit = bisect_right(self.letters_lengths.get((pos1, letter1), []), max_length)
+        return word_ids[:limit]
+
+    def match_rows(self, pos1: int, pos2: int, rows: List[Tuple[str, Optional[str], Optional[int]]]) -> List:
+        """Devuelve los ids candidatos de cada fila (letra1, letra2, longitud máxima) de una grilla."""
+        return [self.candidates(pos1, pos2, letter1, letter2, max_length) for letter1, letter2, max_length in rows]
+
+    def count(self, pos1: int, pos2: int, letter1: str, letter2: Optional[str],
+              max_length: Optional[int] = None) -> int:
+        """Devuelve la cantidad de palabras candidatas para las letras y posiciones indicadas."""
+        if letter2 or max_length is None:
+            return len(self.candidates(pos1, pos2, letter1, letter2))
+        return bisect_right(self.letters_lengths.get((pos1, letter1), []), max_length)
+
+    def get_random_word(self, pos1: int, pos2: int, letter1: str, letter2: Optional[str],
+                        max_length: Optional[int] = None) -> Tuple[Optional[int], Optional[str]]:
+        """Devuelve una palabra aleatoria cuyas letras en las posiciones señaladas coincidan con las indicadas."""
+        total = self.count(pos1, pos2, letter1, letter2, max_length)
+        if not total:
+            return None, None
+        if letter2:
+            word_id = self._get_pairs(pos1, pos2)[(letter1, letter2)][random.randrange(total)]
+        else:
+            word_id = self.letters[(pos1, letter1)][random.randrange(total)]
+        return word_id, self.words[word_id]
+
+    def get_contents(self, word_ids: Sequence[int]) -> Dict[int, str]:
+        """Devuelve el contenido de las palabras con los ids indicados."""
+        return {word_id: self.words[word_id] for word_id in word_ids}
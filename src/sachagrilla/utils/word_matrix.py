@@ -0,0 +1,181 @@
+# word_matrix.py
+
+""" Proporciona una representación compacta del corpus en arrays de NumPy (opcional: pip install sachagrilla[fast]). """
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import random
+
+import numpy as np
+
+from sachagrilla.utils.normalize import encode_letters, normalize_many
+
+
+def compact_dtype(maximum: int) -> np.dtype:
+    """Devuelve int32 si maximum entra, o int64."""
+    return np.dtype(np.int32) if maximum <= np.iinfo(np.int32).max else np.dtype(np.int64)
+
+
+class WordMatrix:
+    """Guarda las palabras normalizadas en una matriz uint8 de ancho fijo (una columna por posición, 0 = vacío),
+    con arrays de ids y longitudes y el texto original en un solo bloque utf-8.
+
+    Tiene la misma interfaz que WordIndex. Para cada par de posiciones arma una vez los ids ordenados por las dos
+    letras, con una tabla del inicio de cada par de letras, y para cada posición los ids ordenados por letra y
+    longitud. Así contar los candidatos de una fila es restar dos inicios y buscarlos devuelve una vista del array
+    de ids, sin copiarlo. Con max_pairs se guardan solo los índices de los max_pairs pares de posiciones usados
+    más recientemente."""
+
+    def __init__(self, words: Dict[int, str], normalized: Optional[Dict[int, str]] = None,
+                 max_pairs: Optional[int] = None):
+        normalized = normalized or {}
+        ids = sorted(words)
+        missing = [word_id for word_id in ids if not normalized.get(word_id)]
+        normalized = dict(normalized)
+        normalized.update(zip(missing, normalize_many((words[word_id] for word_id in missing), keep_length=True)))
+        codes, width, packed = encode_letters([normalized[word_id] for word_id in ids])
+        encoded = [words[word_id].encode('utf8') for word_id in ids]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum([len(content) for content in encoded], out=offsets[1:])
+        self._set_arrays(codes,
+                         np.array(ids, dtype=compact_dtype(ids[-1] if ids else 0)),
+                         np.array([len(words[word_id]) for word_id in ids], dtype=np.uint8),
+                         np.frombuffer(packed, dtype=np.uint8).reshape(len(ids), width),
+                         np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                         offsets.astype(compact_dtype(offsets[-1])),
+                         max_pairs)
+
+    @classmethod
+    def from_arrays(cls, codes: Dict[str, int], ids: np.ndarray, lengths: np.ndarray, letters: np.ndarray,
+                    contents: np.ndarray, offsets: np.ndarray, max_pairs: Optional[int] = None) -> 'WordMatrix':
+        """Arma la matriz directamente con arrays ya codificados (por ejemplo, vistas de un snapshot mapeado en
+        memoria), sin copiarlos. ids tiene que estar ordenado."""
+        matrix = cls.__new__(cls)
+        matrix._set_arrays(codes, ids, lengths, letters, contents, offsets, max_pairs)
+        return matrix
+
+    def _set_arrays(self, codes: Dict[str, int], ids: np.ndarray, lengths: np.ndarray, letters: np.ndarray,
+                    contents: np.ndarray, offsets: np.ndarray, max_pairs: Optional[int]):
+        """Guarda los arrays del corpus."""
+        self.codes = codes
+        self.ids = ids
+        self.lengths = lengths
+        self.letters = letters
+        self.width = letters.shape[1]
+        self.contents = contents
+        self.offsets = offsets
+        # los índices guardan los ids como int32 si entran, la mitad que con int64
+        self.ids_dtype = compact_dtype(ids[-1] if len(ids) else 0)
+        # clave de un par de letras: código1 * stride + código2; la clave 0 no tiene palabras y sirve de centinela
+        self.stride = len(codes) + 1
+        self.max_length = int(lengths.max()) if len(lengths) else 0
+        self.max_pairs = max_pairs
+        # (posición1, posición2) -> (inicio de cada clave, ids ordenados por clave), del menos al más usado
+        self.pairs: 'OrderedDict[Tuple[int, int], Tuple[List[int], np.ndarray]]' = OrderedDict()
+        # posición -> (inicio de cada letra y longitud, ids ordenados por letra y longitud)
+        self.singles: Dict[int, Tuple[List[int], np.ndarray]] = {}
+
+    def _key(self, letter1: str, letter2: str) -> int:
+        """Devuelve la clave de un par de letras, o 0 si alguna no aparece en el corpus."""
+        code1, code2 = self.codes.get(letter1, 0), self.codes.get(letter2, 0)
+        return code1 * self.stride + code2 if code1 and code2 else 0
+
+    @staticmethod
+    def _sorted(keys: np.ndarray, size: int) -> Tuple[List[int], np.ndarray]:
+        """Ordena claves menores que size y devuelve el inicio de cada una (y el final de la última), con el orden.
+        Los inicios son una lista para que cada búsqueda sea indexar dos enteros de Python. Con claves uint16
+        numpy ordena por radix, en tiempo lineal, y rearmar un índice descartado es barato."""
+        if size <= 1 << 16:
+            keys = keys.astype(np.uint16)
+        starts = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=size), out=starts[1:])
+        return starts.tolist(), np.argsort(keys, kind='stable')
+
+    def _get_pairs(self, pos1: int, pos2: int) -> Tuple[List[int], np.ndarray]:
+        """Devuelve (y cachea) el inicio de cada par de letras y los ids ordenados por par, para las posiciones
+        indicadas. Solo entran las palabras que tienen letra en las dos posiciones."""
+        key = (pos1, pos2)
+        pairs = self.pairs.get(key)
+        if pairs is not None:
+            if self.max_pairs is not None:
+                self.pairs.move_to_end(key)
+            return pairs
+        size = self.stride * self.stride
+        if max(pos1, pos2) < self.width:
+            column1, column2 = self.letters[:, pos1], self.letters[:, pos2]
+            rows = np.flatnonzero((column1 != 0) & (column2 != 0))
+            starts, order = self._sorted(column1[rows].astype(np.int32) * self.stride + column2[rows], size)
+            pairs = starts, self.ids[rows[order]].astype(self.ids_dtype)
+        else:
+            pairs = [0] * (size + 1), np.zeros(0, dtype=self.ids_dtype)
+        self.pairs[key] = pairs
+        if self.max_pairs is not None and len(self.pairs) > self.max_pairs:
+            self.pairs.popitem(last=False)
+        return pairs
+
+    def _get_single(self, pos: int) -> Tuple[List[int], np.ndarray]:
+        """Devuelve (y cachea) el inicio de cada (letra, longitud) y los ids ordenados por letra y longitud, para la
+        posición indicada."""
+        if pos not in self.singles:
+            size = self.stride * (self.max_length + 1)
+            if pos < self.width:
+                column = self.letters[:, pos]
+                rows = np.flatnonzero(column)
+                starts, order = self._sorted(column[rows].astype(np.int32) * (self.max_length + 1) + self.lengths[rows],
+                                             size)
+                self.singles[pos] = starts, self.ids[rows[order]].astype(self.ids_dtype)
+            else:
+                self.singles[pos] = [0] * (size + 1), np.zeros(0, dtype=self.ids_dtype)
+        return self.singles[pos]
+
+    def _single(self, pos1: int, letter1: str, max_length: Optional[int]) -> Tuple[np.ndarray, int, int]:
+        """Devuelve los ids ordenados de la posición y el rango de las palabras con letter1 en pos1 y, si se indica,
+        de longitud máxima max_length."""
+        starts, word_ids = self._get_single(pos1)
+        # el código 0 (letra que no aparece en el corpus) no tiene palabras
+        first = self.codes.get(letter1, 0) * (self.max_length + 1)
+        last = self.max_length if max_length is None else max(0, min(max_length, self.max_length))
+        return word_ids, starts[first], starts[first + last + 1]
+
+    def match_rows(self, pos1: int, pos2: int, rows: List[Tuple[str, Optional[str], Optional[int]]]) -> List:
+        """Devuelve los ids candidatos de cada fila (letra1, letra2, longitud máxima) de una grilla."""
+        results: List = []
+        for letter1, letter2, max_length in rows:
+            if letter2:
+                starts, word_ids = self._get_pairs(pos1, pos2)
+                key = self._key(letter1, letter2)
+                results.append(word_ids[starts[key]:starts[key + 1]])
+            else:
+                word_ids, start, end = self._single(pos1, letter1, max_length)
+                results.append(word_ids[start:end])
+        return results
+
+    def candidates(self, pos1: int, pos2: int, letter1: str, letter2: Optional[str],
+                   max_length: Optional[int] = None) -> np.ndarray:
+        """Devuelve los ids de las palabras cuyas letras en las posiciones señaladas coinciden con las indicadas."""
+        return self.match_rows(pos1, pos2, [(letter1, letter2, max_length)])[0]
+
+    def count(self, pos1: int, pos2: int, letter1: str, letter2: Optional[str],
+              max_length: Optional[int] = None) -> int:
+        """Devuelve la cantidad de palabras candidatas para las letras y posiciones indicadas, sin armar la lista."""
+        if letter2:
+            starts = self._get_pairs(pos1, pos2)[0]
+            key = self._key(letter1, letter2)
+            return starts[key + 1] - starts[key]
+        _, start, end = self._single(pos1, letter1, max_length)
+        return end - start
+
+    def get_random_word(self, pos1: int, pos2: int, letter1: str, letter2: Optional[str],
+                        max_length: Optional[int] = None) -> Tuple[Optional[int], Optional[str]]:
+        """Devuelve una palabra aleatoria cuyas letras en las posiciones señaladas coincidan con las indicadas."""
+        word_ids = self.candidates(pos1, pos2, letter1, letter2, max_length)
+        if not len(word_ids):
+            return None, None
+        word_id = int(word_ids[random.randrange(len(word_ids))])
+        return word_id, self.get_contents([word_id])[word_id]
+
+    def get_contents(self, word_ids: List[int]) -> Dict[int, str]:
+        """Devuelve el contenido de las palabras con los ids indicados."""
+        positions = np.searchsorted(self.ids, word_ids)
+        return {int(word_id): self.contents[self.offsets[pos]:self.offsets[pos + 1]].tobytes().decode('utf8')
+                for word_id, pos in zip(word_ids, positions)}
@@ -0,0 +1,40 @@
+# conftest.py
+
+""" Fixtures compartidas por los tests. """
+
+import contextlib
+import io
+
+import pytest
+
+from benchmarks.corpus import build_database, use_database
+from sachagrilla.db.connection import manager
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Apunta la conexión del proceso a una BD nueva (con las tablas creadas) en tmp_path, así los tests no tocan
+    la BD real, y la restaura al terminar."""
+    from sachagrilla.db.db_manager import DBManager
+
+    path = manager.path
+    manager.close()
+    manager.path = tmp_path / 'sachagrilla.db'
+    manager.configure()
+    with contextlib.redirect_stdout(io.StringIO()):
+        DBManager()
+    yield manager.db
+    manager.close()
+    manager.path = path
+    manager.configure()
+
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory):
+    """BD con un corpus sintético en el que todos los pares de posiciones tienen frases con solución. Se arma una vez
+    y cada test usa una copia."""
+    path, previous = tmp_path_factory.mktemp('corpus') / 'corpus.db', manager.path
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_database(path, 5000, 300)
+    use_database(previous)
+    return path
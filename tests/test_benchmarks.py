@@ -0,0 +1,44 @@
+# test_benchmarks.py
+
+""" Prueba que la suite de benchmarks detecte regresiones y límites superados. """
+
+import json
+
+from benchmarks import run
+
+
+def result(median: float, **extra) -> dict:
+    return dict(median=median, min=median, mean=median, rounds=1, **extra)
+
+
+def test_compare_flags_a_slowdown():
+    baseline = {'grid.build': result(0.010), 'pdflayout.print_grid': result(0.100), 'solo.anterior': result(1.0)}
+    results = {'grid.build': result(0.013), 'pdflayout.print_grid': result(0.110), 'solo.actual': result(1.0)}
+    assert run.compare(results, baseline, 0.2) == ['grid.build']
+
+
+def test_compare_flags_a_success_rate_drop():
+    baseline = {'grid.build[0,2]': result(0.010, success_rate=1.0), 'grid.build[0,3]': result(0.010, success_rate=1.0)}
+    results = {'grid.build[0,2]': result(0.010, success_rate=0.3), 'grid.build[0,3]': result(0.010, success_rate=0.9)}
+    assert run.compare(results, baseline, 0.2) == ['grid.build[0,2]']
+
+
+def test_check_limits():
+    results = {'cli.python': result(0.020), 'cli.import': result(0.030), 'cli.help': result(0.130)}
+    assert run.check_limits(results) == ['cli.help']
+    assert run.check_limits({'cli.help': result(1.0)}) == []
+
+
+def test_main_fails_on_a_regression(database, tmp_path, monkeypatch, capsys):
+    # sin límites, el resultado depende solo de la comparación y no de lo que tarde el arranque en esta máquina
+    monkeypatch.setattr(run, 'LIMITS', {})
+    args = ['--palabras', '200', '--frases', '20', '--rondas', '1', '--solo', 'cli', '-o', str(tmp_path / 'r.json')]
+    assert run.main(args) == 0
+    previous = json.loads((tmp_path / 'r.json').read_text(encoding='utf8'))
+    for name, measurement in previous['results'].items():
+        measurement['median'] *= 0.1 if name == 'cli.help' else 10
+    baseline = tmp_path / 'anterior.json'
+    baseline.write_text(json.dumps(previous), encoding='utf8')
+    capsys.readouterr()
+    assert run.main([*args, '--comparar', str(baseline)]) == 1
+    assert 'WARNING 1 mediciones empeoraron más de 20%: cli.help' in capsys.readouterr().err
@@ -0,0 +1,35 @@
+# test_cli.py
+
+""" Prueba que la ayuda de la CLI arranque sin importar las dependencias pesadas y que valide las opciones. """
+
+import subprocess
+import sys
+
+import pytest
+
+from sachagrilla import cli
+
+# se importan recién dentro de los subcomandos que las usan
+HEAVY_MODULES = {'peewee', 'fpdf', 'bs4', 'requests'}
+
+
+def test_help_does_not_import_heavy_modules():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'sachagrilla.cli', '--help'],
+                            capture_output=True, text=True, check=True)
+    assert 'usage' in result.stdout
+    # cada línea del informe de -X importtime termina en "| <módulo>", con sangría según la profundidad
+    imported = {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines()
+                if line.startswith('import time:')}
+    assert 'sachagrilla' in imported
+    assert {module for module in imported if module.split('.')[0] in HEAVY_MODULES} == set()
+
+
+@pytest.mark.parametrize('options', [['-c', '0'], ['-c', '-3'], ['-c', 'dos'], ['-c', '5', '-w', '0'],
+                                     ['-w', '2'], ['-b'], ['-c', '1', '-b']])
+def test_new_rejects_invalid_options(monkeypatch, capsys, options):
+    monkeypatch.setattr(sys, 'argv', ['sachagrilla', 'nueva', *options])
+    monkeypatch.setattr(cli, 'new_grid', lambda args: pytest.fail('no tendría que generar grillas'))
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main()
+    assert exit_info.value.code == 2
+    assert 'error:' in capsys.readouterr().err
@@ -0,0 +1,64 @@
+# test_connection.py
+
+""" Prueba los modos de ConnectionManager: solo lectura, espera por locks y procesos hijos. """
+
+import multiprocessing
+import os
+import sqlite3
+import time
+
+import pytest
+from peewee import OperationalError
+
+from sachagrilla.db.connection import BUSY_TIMEOUT, manager
+from sachagrilla.db.db_manager import DBManager
+from sachagrilla.db.models import Word
+
+
+@pytest.fixture
+def word_db(database):
+    DBManager().save_words([('árbol', 'Planta leñosa')])
+    return database
+
+
+def test_read_only_rejects_writes(word_db):
+    db = manager.configure(read_only=True)
+    assert db.execute_sql('PRAGMA query_only').fetchone()[0] == 1
+    assert Word.select().count() == 1
+    with pytest.raises(OperationalError, match='readonly'):
+        Word.update(normalized='arbol').execute()
+
+
+def test_busy_timeout(word_db):
+    assert word_db.execute_sql('PRAGMA busy_timeout').fetchone()[0] == BUSY_TIMEOUT * 1000
+    manager.configure(timeout=0.2)
+    other = sqlite3.connect(manager.path, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        start = time.perf_counter()
+        with pytest.raises(OperationalError, match='locked'):
+            Word.update(normalized='arbol').execute()
+        assert time.perf_counter() - start >= 0.2
+    finally:
+        other.execute('ROLLBACK')
+        other.close()
+
+
+def use_in_child(queue):
+    inherited = manager.db
+    db = manager.get_db()
+    queue.put((db is not inherited, manager.pid == os.getpid(), inherited.is_closed(), Word.select().count()))
+
+
+def test_fork_rebinds_without_closing_the_parent_connection(word_db):
+    parent_db = manager.connect()
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    child = context.Process(target=use_in_child, args=(queue,))
+    child.start()
+    result = queue.get(timeout=30)
+    child.join(timeout=30)
+    # el hijo arma su propia instancia y no cierra la conexión que heredó
+    assert result == (True, True, False, 1)
+    assert manager.db is parent_db and not parent_db.is_closed()
+    assert Word.select().count() == 1
@@ -0,0 +1,25 @@
+# test_data_collector.py
+
+""" Prueba que collect_data no dé por terminada la recolección si el scraper falla. """
+
+from argparse import Namespace
+
+import pytest
+
+from sachagrilla import data_collector
+from sachagrilla.db.db_manager import DBManager
+from sachagrilla.db.models import Word
+from sachagrilla.scrapers.scraper_clarin import ScraperClarin
+
+
+def test_scraper_error_is_raised_after_saving_what_was_scraped(database, tmp_path, monkeypatch):
+    def failing_scrape(self, nbr_pages, sink=None, save_files=True):
+        sink((18874, ('Frase', 'Autor'), [('palabra', 'Significado de palabra')]))
+        raise ConnectionError('se cortó la conexión')
+
+    monkeypatch.setattr(ScraperClarin, 'scrape_data', failing_scrape)
+    monkeypatch.setattr(data_collector.DataLoader, 'pending_files', lambda self: False)
+    with pytest.raises(ConnectionError, match='se cortó la conexión'):
+        data_collector.collect_data(Namespace(cantidad=2, descargas=1, csv=False))
+    assert [word.content for word in Word.select()] == ['palabra']
+    assert DBManager().grid_last_number == 18874
@@ -0,0 +1,66 @@
+# test_data_loader.py
+
+""" Prueba que DataLoader guarde los .csv scrapeados y los borre recién cuando su lote quedó guardado. """
+
+import csv
+from pathlib import Path
+
+import pytest
+
+from sachagrilla.data_loader import DataLoader
+from sachagrilla.db.db_manager import DBManager
+from sachagrilla.db.models import Clue, Quote, Word
+from sachagrilla.grid import Grid
+
+
+def write_csv(path: Path, columns, rows) -> Path:
+    with open(path, 'w', encoding='utf8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    return path
+
+
+@pytest.fixture
+def loader(database, tmp_path, monkeypatch):
+    monkeypatch.setattr(Grid, 'update_feasibility', staticmethod(lambda recheck=False: 0))
+    loader = DataLoader()
+    loader.scraped_data_path = tmp_path
+    return loader
+
+
+def test_load_words_saves_and_deletes_the_files(loader, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(DataLoader, 'BATCH_SIZE', 2)
+    write_csv(tmp_path / '1_words.csv', ('WORD', 'CLUE'), [('árbol', 'Planta leñosa'), ('camino', 'Vía')])
+    write_csv(tmp_path / '2_words.csv', ('WORD', 'CLUE'), [('árbol', 'Otra planta'), ('pan', 'Alimento')])
+    loader.load_words()
+    assert sorted(word.content for word in Word.select()) == ['camino', 'pan', 'árbol']
+    assert not loader.pending_files()
+    assert 'Se cargaron 3 palabras de 2 archivos. Se ignoraron 1' in capsys.readouterr().out
+
+
+def test_load_quotes_saves_and_deletes_the_files(loader, tmp_path):
+    write_csv(tmp_path / '1_quote.csv', ('QUOTE', 'AUTHOR'), [('Frase uno', 'Ana'), ('Frase uno', 'Ana')])
+    loader.load_quotes()
+    assert [quote.content for quote in Quote.select()] == ['Frase uno']
+    assert not loader.pending_files()
+
+
+def test_failed_batch_leaves_its_files(loader, tmp_path, monkeypatch):
+    monkeypatch.setattr(DataLoader, 'BATCH_SIZE', 1)
+    letter_rows = DBManager._letter_rows
+
+    def failing_letter_rows(word_id, normalized, now):
+        if normalized == 'fallo':
+            raise RuntimeError('se cortó la carga')
+        return letter_rows(word_id, normalized, now)
+
+    monkeypatch.setattr(DBManager, '_letter_rows', staticmethod(failing_letter_rows))
+    saved = write_csv(tmp_path / '1_words.csv', ('WORD', 'CLUE'), [('árbol', 'Planta leñosa')])
+    failed = write_csv(tmp_path / '2_words.csv', ('WORD', 'CLUE'), [('camino', 'Vía'), ('fallo', 'Error')])
+    with pytest.raises(RuntimeError, match='se cortó la carga'):
+        loader._load([saved, failed], ('WORD', 'CLUE'), loader.dbmanager.save_words)
+    assert not saved.exists() and failed.exists()
+    # el lote que falló se deshizo entero, así que el archivo se puede volver a cargar
+    assert [word.content for word in Word.select()] == ['árbol']
+    assert [clue.content for clue in Clue.select()] == ['Planta leñosa']
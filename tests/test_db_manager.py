@@ -0,0 +1,141 @@
+# test_db_manager.py
+
+""" Prueba las escrituras y consultas de DBManager sobre una BD temporal. """
+
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from sachagrilla.db.db_manager import DBManager
+from sachagrilla.db.models import Quote, Word, WordLetter
+from sachagrilla.grid import POSITIONS
+from sachagrilla.utils.normalize import normalize_many
+from sachagrilla.utils.word_index import WordIndex
+
+WORDS = [('Ñandú', 'Ave corredora'), ('camión', 'Vehículo de carga'), ('pingüino', 'Ave que no vuela'),
+         ('árbol', 'Planta leñosa'), ('paraguas', 'Sirve para la lluvia'), ('nandina', 'Arbusto ornamental'),
+         ('pan', 'Alimento horneado'), ('pulóver', 'Prenda de abrigo'), ('camino', 'Vía de tránsito')]
+
+
+@pytest.fixture
+def dbm(database):
+    dbm = DBManager()
+    dbm.save_words(WORDS)
+    return dbm
+
+
+def stored_letters() -> dict:
+    letters = {}
+    for word_id, position, letter in WordLetter.select(WordLetter.word_id, WordLetter.position, WordLetter.letter)\
+            .order_by(WordLetter.word_id, WordLetter.position).tuples():
+        letters.setdefault(word_id, []).append((position, letter))
+    return letters
+
+
+def expected_letters() -> dict:
+    words = list(Word.select(Word.id, Word.content).tuples())
+    return {word_id: list(enumerate(normalized))
+            for (word_id, _), normalized in zip(words, normalize_many((word for _, word in words), keep_length=True))}
+
+
+def test_saved_words_have_their_letters(dbm):
+    assert stored_letters() == expected_letters()
+
+
+def test_backfill_words_completes_and_renormalizes(dbm):
+    missing = Word.get(Word.content == 'Ñandú').id
+    stale = Word.get(Word.content == 'camión').id
+    Word.update(normalized=None).where(Word.id == missing).execute()
+    WordLetter.delete().where(WordLetter.word_id == missing).execute()
+    Word.update(normalized='xxxxxx').where(Word.id == stale).execute()
+    WordLetter.update(letter='x').where(WordLetter.word_id == stale).execute()
+
+    assert dbm.backfill_words() == 1
+    assert stored_letters()[missing] == expected_letters()[missing]
+    assert stored_letters()[stale] != expected_letters()[stale]
+    assert dbm.backfill_words(renormalize=True) == 1
+    assert stored_letters() == expected_letters()
+    assert dbm.backfill_words(renormalize=True) == 0
+
+
+def test_letter_queries_match_word_index(dbm):
+    index = WordIndex(DBManager.get_words(1), DBManager.get_normalized_words(1))
+    letters = sorted({letter for form in index.normalized.values() for letter in form})
+    rng = random.Random(0)
+    for _ in range(300):
+        position1, position2 = rng.choice(POSITIONS)
+        letter1, letter2 = rng.choice(letters), rng.choice([*letters, None])
+        max_length = rng.choice([None, position2 + 1]) if letter2 is None else None
+        query = (position1, position2, letter1, letter2, max_length)
+        expected = sorted(index.candidates(*query))
+        assert sorted(DBManager.candidates(*query)) == expected, query
+        assert DBManager.count(*query) == len(expected), query
+    rows = [('n', 'n', None), ('c', 'm', None), ('p', None, 4)]
+    assert [sorted(ids) for ids in DBManager.match_rows(0, 2, rows)] == \
+        [sorted(ids) for ids in index.match_rows(0, 2, rows)]
+
+
+@pytest.fixture
+def quotes(database):
+    """200 frases con ids 1 a 200: todas tienen solución para el par (0, 3) y las pares también para (0, 2)."""
+    dbm = DBManager()
+    dbm.save_quotes([(f'Frase número {idx}', 'Anónimo') for idx in range(1, 201)])
+    Quote.update(feasible_mask=2).execute()
+    Quote.update(feasible_mask=3).where(Quote.id.bin_and(1) == 0).execute()
+    return dbm
+
+
+def sampled_ids(quantity: int, **filters) -> list:
+    return [quote.id for quote in DBManager.sample_quotes(quantity, **filters)]
+
+
+def test_sample_quotes_is_uniform_across_id_gaps(quotes):
+    # quedan 1-10 y 191-200: la mayoría de los ids sorteados cae en el hueco
+    Quote.delete().where(Quote.id.between(11, 190)).execute()
+    random.seed(0)
+    draws = Counter(quote_id for _ in range(4000) for quote_id in sampled_ids(1))
+    assert set(draws) == {*range(1, 11), *range(191, 201)}
+    assert max(draws.values()) / min(draws.values()) < 1.5
+
+
+def test_sample_quotes_caps_at_the_matching_rows(quotes):
+    Quote.delete().where(Quote.id > 5).execute()
+    random.seed(0)
+    assert sorted(sampled_ids(10)) == [1, 2, 3, 4, 5]
+    assert sorted(sampled_ids(3, required_mask=1)) == [2, 4]
+
+
+def test_sample_quotes_applies_the_filters(quotes):
+    Quote.update(feasible_mask=0).where(Quote.id > 150).execute()
+    Quote.update(last_used=datetime.now()).where(Quote.id <= 20).execute()
+    random.seed(0)
+    for _ in range(20):
+        ids = sampled_ids(30, feasible=True, required_mask=1, unused_since=datetime.now() - timedelta(days=1))
+        assert len(ids) == len(set(ids)) == 30
+        assert all(quote_id % 2 == 0 and 20 < quote_id <= 150 for quote_id in ids)
+    ids = sampled_ids(100, feasible=True, required_mask=1, unused_since=datetime.now() - timedelta(days=1))
+    assert sorted(ids) == list(range(22, 151, 2))
+
+
+def test_sample_quotes_on_an_empty_table(database):
+    assert DBManager.sample_quotes(3) == []
+
+
+def test_save_words_skips_duplicates_in_the_batch_and_the_db(dbm):
+    rows = [('nuevo', 'Que acaba de hacerse'), ('nuevo', 'Recién hecho'), ('novel', 'Que acaba de hacerse'),
+            ('árbol', 'Otra planta'), ('roble', 'Planta leñosa'), ('final', 'Último')]
+    assert dbm.save_words(rows) == (2, 4)
+    clues = {word.content: [clue.content for clue in word.clues] for word in Word.select()}
+    assert clues['nuevo'] == ['Que acaba de hacerse'] and clues['final'] == ['Último']
+    assert clues['árbol'] == ['Planta leñosa']
+    assert 'novel' not in clues and 'roble' not in clues
+    assert stored_letters() == expected_letters()
+
+
+def test_save_quotes_skips_duplicates_in_the_batch_and_the_db(database):
+    dbm = DBManager()
+    assert dbm.save_quotes([('Frase uno', 'Ana'), ('Frase uno', 'Otro'), ('Frase dos', 'Beto')]) == (2, 1)
+    assert dbm.save_quotes([('Frase dos', 'Beto'), ('Frase tres', 'Ana')]) == (1, 1)
+    assert sorted(quote.content for quote in Quote.select()) == ['Frase dos', 'Frase tres', 'Frase uno']
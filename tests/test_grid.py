@@ -0,0 +1,166 @@
+# test_grid.py
+
+""" Prueba GridSolver sobre índices chicos, cómo `nueva` reintenta cuando falla una grilla y la generación de
+varias grillas en un pool de procesos sobre un corpus sintético. """
+
+import os
+import random
+import re
+import shutil
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+from benchmarks.corpus import use_database
+from sachagrilla import cli, grid
+from sachagrilla.db.db_manager import DBManager
+from sachagrilla.db.models import Grid as GridModel
+from sachagrilla.db.snapshot import Snapshot
+from sachagrilla.grid import Grid, GridSolver, NoFeasibleQuoteError
+from sachagrilla.utils.word_index import WordIndex
+
+# con las posiciones (0, 2): filas (a, c) y (b, d)
+WORDS = {1: 'arco', 2: 'ancla', 3: 'bode', 4: 'bidón', 5: 'sol'}
+
+
+def solver(words=None) -> GridSolver:
+    return GridSolver(WordIndex(words or WORDS))
+
+
+def test_is_feasible_counts_candidates_per_repeated_row():
+    rows = GridSolver.rows('aa', 'cc', 2)
+    assert solver().is_feasible(rows, 0, 2)
+    assert not solver().is_feasible(GridSolver.rows('aaa', 'ccc', 2), 0, 2)
+    assert not solver().is_feasible(GridSolver.rows('az', 'cd', 2), 0, 2)
+
+
+def test_is_feasible_with_odd_quote_needs_a_short_word():
+    rows = GridSolver.rows('as', 'c', 2)
+    assert rows[-1] == ('s', None, 3)
+    assert solver().is_feasible(rows, 0, 2)
+    assert not solver({**WORDS, 5: 'sopa'}).is_feasible(rows, 0, 2)
+
+
+def test_solve_uses_each_word_once():
+    words = {word_id: 'ab' + 'c' * word_id for word_id in range(1, 7)}
+    for seed in range(20):
+        random.seed(seed)
+        word_ids = solver(words).solve('aaaaaa', 'cccccc', 0, 2)
+        assert sorted(word_ids) == list(range(1, 7))
+
+
+def test_solve_returns_none_when_infeasible():
+    assert solver().solve('aaa', 'ccc', 0, 2) is None
+
+
+def test_solve_stops_after_max_steps(monkeypatch):
+    # sin retrocesos, cada fila lleva un paso
+    monkeypatch.setattr(GridSolver, 'MAX_STEPS', 2)
+    assert solver().solve('ab', 'cd', 0, 2) is not None
+    assert solver().solve('aab', 'ccd', 0, 2) is None
+    monkeypatch.setattr(GridSolver, 'MAX_STEPS', 3)
+    assert solver().solve('aab', 'ccd', 0, 2) is not None
+
+
+def test_backtrack_starts_with_most_constrained_rows(monkeypatch):
+    tried = []
+    grid_solver = solver()
+    random_order = grid_solver._random_order
+
+    def spy(candidates):
+        tried.append(len(candidates))
+        return random_order(candidates)
+
+    monkeypatch.setattr(grid_solver, '_random_order', spy)
+    candidates = [[1, 2, 3], [4], [5, 6], [1, 2, 3, 4, 5, 6, 7]]
+    word_ids = grid_solver._backtrack(candidates)
+    assert tried == [1, 2, 3, 7]
+    assert word_ids[1] == 4 and len(set(word_ids)) == 4
+
+
+def new_grid_args() -> Namespace:
+    return Namespace(memoria_baja=True, compacto=False, cantidad=1, workers=None, solucion=False, cuadernillo=False)
+
+
+def test_new_grid_exits_without_retrying_when_no_quote_is_feasible(database, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.new_grid(new_grid_args())
+    assert exit_info.value.code == 1
+    output = capsys.readouterr()
+    assert 'intento' not in output.out
+    assert output.err.count('No hay frases con solución') == 1
+
+
+def test_new_grid_retries_when_the_chosen_quote_fails(monkeypatch, capsys):
+    builds = []
+    monkeypatch.setattr(Grid, '__init__', lambda self, *args: None)
+    monkeypatch.setattr(Grid, 'build', lambda self: builds.append(1) or 0)
+    cli.new_grid(new_grid_args())
+    assert len(builds) == 10
+    assert 'muy difícil' in capsys.readouterr().err
+
+
+def test_build_raises_when_no_quote_is_feasible(database):
+    with pytest.raises(NoFeasibleQuoteError):
+        Grid(low_memory=True).build()
+
+
+def fake_print_grid(solution, include_solution) -> Path:
+    """Reemplaza a grid._print_grid en los workers (que lo heredan con fork) sin escribir el pdf."""
+    return Path(f'SachaGrilla-{solution[0]["id"]}.pdf')
+
+
+@pytest.fixture
+def batch(database, corpus, tmp_path, monkeypatch):
+    """Grid sobre una copia del corpus sintético, sin snapshot y sin escribir pdfs. Registra desde qué proceso se
+    guarda cada ronda."""
+    monkeypatch.setattr(Snapshot, 'load', classmethod(lambda cls, path=None: None))
+    monkeypatch.setattr(grid, '_print_grid', fake_print_grid)
+    shutil.copy(corpus, tmp_path / 'corpus.db')
+    use_database(tmp_path / 'corpus.db')
+    savers = []
+    save_grids = DBManager.save_grids
+
+    def spy(grids):
+        savers.append(os.getpid())
+        return save_grids(grids)
+
+    monkeypatch.setattr(DBManager, 'save_grids', staticmethod(spy))
+    random.seed(0)
+    g = Grid()
+    g.savers = savers
+    return g
+
+
+def test_build_batch_saves_from_the_parent_in_order(batch, capsys):
+    grid_ids = batch.build_batch(12, 2, False)
+    output = capsys.readouterr()
+    assert len(grid_ids) == 12
+    assert batch.savers and set(batch.savers) == {os.getpid()}
+    assert grid_ids == sorted(grid_ids)
+    assert grid_ids == [row.id for row in GridModel.select(GridModel.id).order_by(GridModel.id)]
+    # los pdfs vuelven del pool en el mismo orden que las grillas
+    assert [int(grid_id) for grid_id in re.findall(r'SachaGrilla-(\d+)\.pdf', output.out)] == grid_ids
+    assert 'WARNING' not in output.err
+    for grid_id, solution in DBManager.find_solutions(grid_ids).items():
+        assert {line['id'] for line in solution} == {grid_id}
+
+
+def test_build_batch_warns_when_quotes_run_out(batch, monkeypatch, capsys):
+    sample_quotes = Grid.sample_quotes
+    calls = []
+
+    def two_quotes(self, quantity, *positions):
+        calls.append(quantity)
+        return sample_quotes(self, 2, *positions) if len(calls) == 1 else []
+
+    monkeypatch.setattr(Grid, 'sample_quotes', two_quotes)
+    grid_ids = batch.build_batch(5, 1, False)
+    assert len(grid_ids) == 2
+    assert 'Faltaron 3 grillas: hay menos frases con solución que grillas pedidas' in capsys.readouterr().err
+
+
+def test_build_batch_raises_when_no_quote_is_feasible(database):
+    with pytest.raises(NoFeasibleQuoteError):
+        Grid(low_memory=True).build_batch(3, 1, False)
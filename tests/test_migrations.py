@@ -0,0 +1,98 @@
+# test_migrations.py
+
+""" Prueba las migraciones de la BD (db.migrations) y que las consultas frecuentes usen sus índices. """
+
+from typing import List
+import contextlib
+import io
+import re
+
+import pytest
+
+from sachagrilla.db.db_manager import DBManager
+from sachagrilla.db.models import Clue, Quote, Word
+
+
+def test_syllables_are_computed_before_opening_the_migration_transaction(database, monkeypatch):
+    dbm = DBManager()
+    dbm.save_words([('palabra', 'Definición de palabra'), ('extraordinario', 'Definición de extraordinario')])
+    Word.update(syllables=None).execute()
+    database.pragma('user_version', 2)
+
+    in_transaction = []
+    compute_syllables = DBManager.compute_syllables
+
+    def spy(words):
+        in_transaction.append(database.in_transaction())
+        return compute_syllables(words)
+
+    monkeypatch.setattr(DBManager, 'compute_syllables', staticmethod(spy))
+    # con umbral 0 se usa el pool de procesos, que es el caso que no puede quedar dentro de la transacción
+    monkeypatch.setattr(DBManager, 'PARALLEL_THRESHOLD', 0)
+    DBManager()
+    assert in_transaction == [False]
+    assert dict(Word.select(Word.content, Word.syllables).tuples()) == {'palabra': 'pa-la-bra',
+                                                                         'extraordinario': 'ex-tra-or-di-na-rio'}
+
+
+# índices que agrega la migración 5 (en una BD nueva, los crea peewee con las tablas)
+SECONDARY_INDEXES = ['word_length', 'word_last_used', 'word_times_used', 'clue_last_used', 'clue_times_used',
+                     'quote_feasible_mask', 'quote_last_used', 'quote_times_used']
+
+QUERIES = [
+    ('get_words', lambda: DBManager.get_words(1), {'word_length', 'clue_word_id'}),
+    ('candidates', lambda: DBManager.candidates(0, 2, 'p', 'l'), {'wordletter_position_letter_word_id',
+                                                                  'clue_word_id'}),
+    ('count', lambda: DBManager.count(0, 2, 'p', None, 5), {'wordletter_position_letter_word_id', 'clue_word_id'}),
+    ('find_clues', lambda: DBManager.find_clues([1, 2]), {'clue_word_id'}),
+    ('find_solutions', lambda: DBManager.find_solutions([1, 2]), {'gridline_grid_id'}),
+    ('get_quotes_to_check', lambda: DBManager.get_quotes_to_check(), {'quote_feasible_mask'}),
+    ('get_quotes_to_check_recheck', lambda: DBManager.get_quotes_to_check(1023), {'quote_feasible_mask'}),
+    ('get_usage_word', lambda: DBManager.get_usage(Word), {'word_times_used'}),
+    ('get_usage_clue', lambda: DBManager.get_usage(Clue), {'clue_times_used'}),
+    ('get_usage_quote', lambda: DBManager.get_usage(Quote), {'quote_times_used'}),
+]
+
+
+def query_plans(database, monkeypatch, func) -> List[str]:
+    """Corre func registrando las consultas que ejecuta y devuelve el EXPLAIN QUERY PLAN de cada SELECT."""
+    execute_sql = database.execute_sql
+    queries = []
+
+    def record(sql, params=None, *args, **kwargs):
+        queries.append((sql, params))
+        return execute_sql(sql, params, *args, **kwargs)
+
+    monkeypatch.setattr(database, 'execute_sql', record)
+    func()
+    monkeypatch.undo()
+    return ['\n'.join(row[-1] for row in execute_sql(f'EXPLAIN QUERY PLAN {sql}', params).fetchall())
+            for sql, params in queries if sql.lstrip().upper().startswith('SELECT')]
+
+
+@pytest.fixture(params=['nueva', 'migrada'])
+def indexed_database(request, database):
+    """BD con palabras y una grilla: recién creada o migrada desde la versión 4 (sin los índices secundarios)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        dbm = DBManager()
+        dbm.save_words([('palabra', 'Definición de palabra'), ('casa', 'Definición de casa')])
+        dbm.save_quotes([('Una frase', 'Autor')])
+        clue = Clue.get()
+        dbm.save_grid([{'word_id': clue.word_id, 'clue_id': clue.id}], Quote.get().id, 0, 2)
+        if request.param == 'migrada':
+            for name in SECONDARY_INDEXES:
+                database.execute_sql(f'DROP INDEX "{name}"')
+            database.pragma('user_version', 4)
+            DBManager()
+    assert set(SECONDARY_INDEXES) <= {index.name for table in ('word', 'clue', 'quote')
+                                       for index in database.get_indexes(table)}
+    return database
+
+
+@pytest.mark.parametrize('func, indexes', [pytest.param(func, indexes, id=name) for name, func, indexes in QUERIES])
+def test_queries_use_the_indexes(indexed_database, monkeypatch, func, indexes):
+    plans = query_plans(indexed_database, monkeypatch, func)
+    assert plans
+    used = {name for plan in plans for name in re.findall(r'USING (?:COVERING )?INDEX (\w+)', plan)}
+    assert indexes <= used, plans
+    assert not any(line.startswith('SCAN') for plan in plans for line in plan.splitlines()), plans
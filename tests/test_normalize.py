@@ -0,0 +1,52 @@
+# test_normalize.py
+
+""" Prueba la normalización de textos y palabras y la codificación de letras de utils.normalize. """
+
+import pytest
+
+from sachagrilla.utils.normalize import encode_letters, normalize, normalize_many
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Ñandú', 'ñandu'),
+    ('AÑO', 'año'),
+    ('ÁRBOL CAMIÓN pingüino Ü', 'arbol camion pinguino u'),
+    ('¡Hola! ¿Qué tal?', 'hola que tal'),
+    ('«Frase», dijo: (sí); - fin.', 'frase dijo si  fin'),
+    ('Çà', 'ca'),
+])
+def test_normalize(text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('Ñandú', 'ñandu'),
+    ('PINGÜINO', 'pinguino'),
+    ('¿Qué?', '¿que?'),
+    ('ǅemal', 'ǆemal'),
+    ('İstanbul', 'istanbul'),
+])
+def test_normalize_keep_length(word, expected):
+    folded = normalize(word, keep_length=True)
+    assert len(folded) == len(word)
+    assert folded == expected
+
+
+def test_normalize_many_matches_normalize():
+    texts = ['¡Ñandú!', 'ÁRBOL', '', 'dos\nlíneas', 'pingüino']
+    for keep_length in (False, True):
+        assert normalize_many(texts, keep_length) == [normalize(text, keep_length) for text in texts]
+    assert normalize_many([]) == []
+
+
+def test_encode_letters():
+    codes, width, packed = encode_letters(['ñandu', 'pan'])
+    assert codes == {letter: code for code, letter in enumerate('adnpuñ', start=1)}
+    assert width == 5
+    assert packed == bytes([6, 1, 3, 2, 5, 4, 1, 3, 0, 0])
+    assert encode_letters([]) == ({}, 0, b'')
+
+
+def test_encode_letters_rejects_more_than_255_letters():
+    with pytest.raises(ValueError):
+        encode_letters([''.join(chr(0x100 + idx) for idx in range(256))])
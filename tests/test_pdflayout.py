@@ -0,0 +1,38 @@
+# test_pdflayout.py
+
+""" Prueba que los subconjuntos de glifos cacheados embeban lo mismo que fpdf sin caché. """
+
+import re
+
+from fpdf import fpdf as fpdf_module
+from fpdf.ttfonts import TTFontFile
+
+from sachagrilla.layouts import pdflayout
+
+# fuera de SUBSET_CHARS, así cada texto arma su propio subconjunto
+TEXTS = ['Ñandú ç €', 'Pingüino ß Ç']
+
+
+def render(text: str) -> bytes:
+    pdf = pdflayout.get_renderer().new_pdf()
+    pdf.add_page()
+    for family in pdflayout.FONTS:
+        pdf.set_font(family, size=12)
+        pdf.cell(0, 10, txt=text, ln=1)
+    # lo único que cambia entre dos pdfs iguales es la fecha de creación
+    return re.sub(rb'/CreationDate \(D:\d+\)', b'', pdf.output(dest='S').encode('latin-1'))
+
+
+def test_cached_subsets_embed_the_same_glyphs(monkeypatch):
+    monkeypatch.setattr(fpdf_module, 'TTFontFile', TTFontFile)
+    expected = [render(text) for text in TEXTS]
+    monkeypatch.setattr(fpdf_module, 'TTFontFile', pdflayout._CachedTTFontFile)
+    monkeypatch.setattr(pdflayout._CachedTTFontFile, 'subsets', {})
+    assert [render(text) for text in TEXTS] == expected
+    assert len(pdflayout._CachedTTFontFile.subsets) == 2 * len(pdflayout.FONTS)
+    assert [render(text) for text in reversed(TEXTS)] == expected[::-1]
+    assert len(pdflayout._CachedTTFontFile.subsets) == 2 * len(pdflayout.FONTS)
+
+
+def test_patch_is_installed_on_import():
+    assert fpdf_module.TTFontFile is pdflayout._CachedTTFontFile
@@ -0,0 +1,100 @@
+# test_scraper_clarin.py
+
+""" Prueba la descarga concurrente de ScraperClarin contra un servidor HTTP local que sirve grillas armadas a mano. """
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+import pytest
+
+from sachagrilla.scrapers.scraper_clarin import ScraperClarin
+
+FIRST, PAGES, WORDS, CONCURRENCY = 100, 12, 3, 3
+
+
+def page(number: int) -> str:
+    """Arma una grilla con el formato de la página real: las palabras publicadas son las soluciones de la grilla
+    anterior y las definiciones, las de las palabras que se publican en la siguiente."""
+    clues = ''.join(f'<p class="definition-row">Definición de solucion{number}x{idx}.</p>' for idx in range(WORDS))
+    words = ', '.join(f'solucion{number - 1}x{idx}' for idx in range(WORDS))
+    return f'''<html><body>
+<div class="definiciones">{clues}</div>
+<div class="pull-right col-lg-9 col-md-8 col-sm-6 col-xs-12 words"><div>
+<div class="col2"><span>{words}.</span></div>
+<div class="col3"><span>"Frase de la grilla {number}" Autor {number}</span></div>
+</div></div>
+</body></html>'''
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Sirve page(n) en /n, contando los pedidos por página y cuántos hay en curso a la vez."""
+    lock = threading.Lock()
+    hits: Counter = Counter()
+    in_flight = 0
+    max_in_flight = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.hits[self.path] += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(0.02)
+            body = page(int(self.path.strip('/'))).encode('utf8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    StubHandler.hits = Counter()
+    StubHandler.in_flight = StubHandler.max_in_flight = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_pages_fetches_each_page_once_in_order(stub_url):
+    scraper = ScraperClarin(FIRST, concurrency=CONCURRENCY, base_url=stub_url)
+    numbers = list(range(FIRST, FIRST + PAGES))
+    fetched = list(scraper.fetch_pages(numbers))
+    assert [number for number, _ in fetched] == numbers
+    assert all(body == page(number) for number, body in fetched)
+    assert StubHandler.hits == Counter(f'/{number}' for number in numbers)
+    assert 1 < StubHandler.max_in_flight <= CONCURRENCY
+
+
+def test_fetch_pages_does_not_run_ahead_of_the_consumer(stub_url):
+    scraper = ScraperClarin(FIRST, concurrency=CONCURRENCY, base_url=stub_url)
+    pages = scraper.fetch_pages(range(FIRST, FIRST + PAGES))
+    next(pages)
+    time.sleep(0.2)
+    assert sum(StubHandler.hits.values()) <= 2 * CONCURRENCY
+    pages.close()
+
+
+def test_scrape_data_pairs_words_with_their_definitions(stub_url):
+    scraper = ScraperClarin(FIRST, concurrency=CONCURRENCY, base_url=stub_url)
+    grids = []
+    assert scraper.scrape_data(PAGES - 1, sink=grids.append, save_files=False) == FIRST + PAGES - 1
+    assert [number for number, _, _ in grids] == list(range(FIRST, FIRST + PAGES - 1))
+    for number, quote, word_clues in grids:
+        assert quote == (f'Frase de la grilla {number}', f'Autor {number}')
+        assert word_clues == [(f'solucion{number}x{idx}', f'Definición de solucion{number}x{idx}')
+                              for idx in range(WORDS)]
+    assert sum(StubHandler.hits.values()) == PAGES
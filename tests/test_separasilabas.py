@@ -0,0 +1,51 @@
+# test_separasilabas.py
+
+""" Compara el separador de sílabas con el algoritmo recursivo original, sobre las palabras de la BD y una muestra
+fija de palabras al azar. """
+
+from contextlib import closing
+import random
+import sqlite3
+
+import pytest
+
+from sachagrilla.db.connection import DB_PATH
+from sachagrilla.utils.separasilabas import silabizer, syllabify
+from tests.separasilabas_original import silabizer as original_silabizer
+
+# letras con las que se arman las palabras al azar: las del castellano, con tildes, diéresis y mayúsculas
+LETTERS = 'aáeéiíoóuúübcdfghjklmnñpqrstvwxyzAEIOUBCLMNRST'
+SAMPLE_SIZE, SAMPLE_SEED = 50000, 0
+
+
+def original(word: str) -> list:
+    return [str(part) for part in original_silabizer()(word)]
+
+
+def db_words() -> list:
+    """Devuelve las palabras de la BD incluida en el paquete, abierta en modo solo lectura (immutable, para no crear
+    los archivos del WAL al lado)."""
+    if not DB_PATH.exists():
+        return []
+    with closing(sqlite3.connect(f'file:{DB_PATH}?mode=ro&immutable=1', uri=True)) as conn:
+        return [word for word, in conn.execute('SELECT content FROM word')]
+
+
+def random_words() -> list:
+    rng = random.Random(SAMPLE_SEED)
+    return [''.join(rng.choice(LETTERS) for _ in range(rng.randint(1, 14))) for _ in range(SAMPLE_SIZE)]
+
+
+@pytest.mark.parametrize('words', [pytest.param(db_words, id='bd'), pytest.param(random_words, id='al_azar')])
+def test_matches_original_algorithm(words):
+    words = words()
+    if not words:
+        pytest.skip('no hay palabras en la BD')
+    differences = [(word, list(syllabify(word)), original(word)) for word in words
+                   if list(syllabify(word)) != original(word)]
+    assert differences == []
+
+
+def test_silabizer_keeps_its_interface():
+    assert silabizer()('palabra') == ['pa', 'la', 'bra'] == original('palabra')
+    assert ''.join(silabizer()('extraordinario')) == 'extraordinario'
@@ -0,0 +1,142 @@
+# test_server.py
+
+""" Prueba el servicio HTTP (server.GridService) sobre un corpus sintético, con los workers en hilos del mismo
+proceso en lugar del pool de procesos. """
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextlib
+import io
+import json
+import re
+import shutil
+
+import pytest
+
+from benchmarks.corpus import use_database
+from sachagrilla import server
+from sachagrilla.db.snapshot import Snapshot
+from sachagrilla.grid import POSITIONS
+
+
+@pytest.fixture
+def service(database, corpus, tmp_path, monkeypatch):
+    monkeypatch.setattr(Snapshot, 'load', classmethod(lambda cls, path=None: None))
+    monkeypatch.setattr(server, '_worker_solver', None)
+    monkeypatch.setattr(server, '_worker_seen', 0)
+    shutil.copy(corpus, tmp_path / 'corpus.db')
+    use_database(tmp_path / 'corpus.db')
+    with contextlib.redirect_stdout(io.StringIO()):
+        service = server.GridService(workers=1)
+        service.grid = service._load()
+    server._init_worker(service.grid.solver.index, dict(service.grid.solver.usage))
+    service.pool = ThreadPoolExecutor(max_workers=1)
+    yield service
+    service.close()
+
+
+def request(service: server.GridService, method: str, target: str, body: bytes = b''):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(service.dispatch(method, target, body))
+
+
+@pytest.mark.parametrize('position1, position2', POSITIONS)
+def test_post_grid_with_positions(service, position1, position2):
+    body = json.dumps(dict(position1=position1, position2=position2)).encode()
+    status, _, payload = request(service, 'POST', '/grillas', body)
+    assert status == 201, payload
+    grid = json.loads(payload)
+    assert (grid['position1'], grid['position2']) == (position1, position2)
+
+
+def test_workers_receive_the_usage_of_saved_grids(service):
+    status, _, payload = request(service, 'POST', '/grillas')
+    assert status == 201
+    first = service.usage_log[0]
+    assert not any(server._worker_solver.usage[word_id] for word_id in first)
+    request(service, 'POST', '/grillas')
+    assert all(server._worker_solver.usage[word_id] for word_id in first)
+    # el único worker ya vio la primera grilla, así que se descarta del registro
+    assert service.usage_delta()[0] >= 1
+
+
+@pytest.mark.parametrize('value, included', [('1', True), ('true', True), ('Sí', True), ('0', False),
+                                             ('no', False), ('false', False), ('', False)])
+def test_pdf_solution_only_with_explicit_true_values(service, monkeypatch, value, included):
+    monkeypatch.setattr(server, '_render', lambda solution, include_solution: str(include_solution).encode())
+    status, _, payload = request(service, 'POST', '/grillas')
+    grid_id = json.loads(payload)['id']
+    status, headers, payload = request(service, 'GET', f'/grillas/{grid_id}/pdf?solucion={value}')
+    assert status == 200
+    assert payload == str(included).encode()
+
+
+class FakeWriter:
+    """Junta lo que handle escribe en la conexión."""
+
+    def __init__(self):
+        self.data = b''
+        self.closed = False
+
+    def write(self, data: bytes):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+def exchange(service: server.GridService, data: bytes) -> FakeWriter:
+    """Pasa data por handle como si llegara por una conexión y devuelve lo que se respondió."""
+    async def run():
+        reader = asyncio.StreamReader(limit=service.MAX_HEADER_SIZE)
+        reader.feed_data(data)
+        reader.feed_eof()
+        writer = FakeWriter()
+        await service.handle(reader, writer)
+        return writer
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(run())
+
+
+def statuses(writer: FakeWriter) -> list:
+    # cada respuesta empieza justo después del cuerpo de la anterior
+    return [int(status) for status in re.findall(rb'HTTP/1\.1 (\d{3}) ', writer.data)]
+
+
+def test_keep_alive_answers_every_request(service):
+    writer = exchange(service, b'GET /estado HTTP/1.1\r\n\r\n' * 2)
+    assert statuses(writer) == [200, 200]
+
+
+def test_chunked_body_is_rejected_and_closes_the_connection(service):
+    chunked = b'POST /grillas HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n2\r\n{}\r\n0\r\n\r\n'
+    writer = exchange(service, chunked + b'GET /estado HTTP/1.1\r\n\r\n')
+    assert statuses(writer) == [501]
+    assert b'Connection: close' in writer.data and writer.closed
+    assert service.built == 0
+
+
+@pytest.mark.parametrize('headers, status', [
+    (b''.join(b'X-%d: 1\r\n' % idx for idx in range(server.GridService.MAX_HEADERS + 1)), 431),
+    (b'X-Largo: ' + b'a' * server.GridService.MAX_HEADER_SIZE + b'\r\n', 431),
+    (b''.join(b'X-%d: %s\r\n' % (idx, b'a' * 1000) for idx in range(20)), 431),
+])
+def test_header_limits(headers, status):
+    service = server.GridService(workers=1)
+    writer = exchange(service, b'GET /estado HTTP/1.1\r\n' + headers + b'\r\nGET /estado HTTP/1.1\r\n\r\n')
+    assert statuses(writer) == [status]
+    service.close()
+
+
+def test_long_request_line_is_rejected():
+    service = server.GridService(workers=1)
+    writer = exchange(service, b'GET /' + b'a' * server.GridService.MAX_HEADER_SIZE + b' HTTP/1.1\r\n\r\n')
+    assert statuses(writer) == [414]
+    service.close()
@@ -0,0 +1,69 @@
+# test_weighted.py
+
+""" Prueba con semillas fijas que los sorteos ponderados por uso sigan los pesos esperados. """
+
+import random
+from collections import Counter
+
+import pytest
+
+from sachagrilla import grid
+from sachagrilla.grid import GridSolver
+from sachagrilla.utils.weighted import usage_weight, weighted_sample
+from sachagrilla.utils.word_index import WordIndex
+
+DRAWS = 20000
+
+
+def test_usage_weight():
+    assert [usage_weight(times) for times in (0, 1, 3)] == [1, 0.5, 0.25]
+
+
+def test_weighted_sample_returns_distinct_items():
+    random.seed(0)
+    items = list('abcdef')
+    assert sorted(weighted_sample(items, [1] * 6, 6)) == items
+    assert sorted(weighted_sample(items, [1] * 6, 10)) == items
+    assert len(set(weighted_sample(items, [1, 0.5, 0.25, 1, 1, 1], 4))) == 4
+
+
+def test_weighted_sample_follows_the_weights():
+    random.seed(0)
+    weights = [1, 1, 0.5, 0.25]
+    draws = Counter(weighted_sample('abcd', weights, 1)[0] for _ in range(DRAWS))
+    for item, weight in zip('abcd', weights):
+        assert draws[item] / DRAWS == pytest.approx(weight / sum(weights), abs=0.01)
+
+
+def test_random_order_prefers_less_used_words():
+    random.seed(0)
+    solver = GridSolver(WordIndex({}), {2: 1, 3: 3})
+    weights = [usage_weight(solver.usage[word_id]) for word_id in range(4)]
+    draws = Counter(next(solver._random_order(range(4))) for _ in range(DRAWS))
+    for word_id, weight in enumerate(weights):
+        assert draws[word_id] / DRAWS == pytest.approx(weight / sum(weights), abs=0.01)
+
+
+def test_random_order_yields_every_candidate_once():
+    random.seed(0)
+    solver = GridSolver(WordIndex({}), {word_id: 100 for word_id in range(50)})
+    assert sorted(solver._random_order(range(60))) == list(range(60))
+
+
+def test_compose_many_adds_usage_deltas_once(monkeypatch):
+    solver = GridSolver(WordIndex({}), {1: 1})
+    seen = []
+
+    def compose(quote_id, content, feasible_mask):
+        seen.append(dict(solver.usage))
+        return quote_id, 0, 2, [10 + quote_id]
+
+    monkeypatch.setattr(solver, 'compose', compose)
+    monkeypatch.setattr(grid, '_worker_solver', solver)
+    monkeypatch.setattr(grid, '_worker_seen', 0)
+    grid._compose_many((0, [[1, 2]]), [(1, 'ab', None), (2, 'ab', None)])
+    # la segunda grilla del lote ya cuenta las palabras de la primera
+    assert seen == [{1: 2, 2: 1}, {1: 2, 2: 1, 11: 1}]
+    assert solver.usage == {1: 2, 2: 1}
+    grid._compose_many((0, [[1, 2], [11]]), [(3, 'ab', None)])
+    assert solver.usage == {1: 2, 2: 1, 11: 1}
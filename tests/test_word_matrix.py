@@ -0,0 +1,52 @@
+# test_word_matrix.py
+
+""" Compara WordMatrix con WordIndex sobre un corpus sintético. """
+
+import random
+
+import pytest
+
+from benchmarks.corpus import generate_words
+from sachagrilla.grid import POSITIONS
+from sachagrilla.utils.word_index import WordIndex
+
+# WordMatrix necesita numpy (extra fast)
+WordMatrix = pytest.importorskip('sachagrilla.utils.word_matrix').WordMatrix
+
+# letras del corpus y una que no aparece, para las filas sin candidatos
+LETTERS = 'abcdefghijlmnopqrstuvzñ@'
+
+
+@pytest.fixture(scope='module')
+def words():
+    words = {word_id: word for word_id, (word, _) in enumerate(generate_words(3000), start=1)}
+    words.update({5000: 'Ñandú', 5001: 'a', 5002: 'pingüino'})
+    return words
+
+
+def queries(quantity: int):
+    rng = random.Random(0)
+    for _ in range(quantity):
+        position1, position2 = rng.choice(POSITIONS)
+        letter2 = rng.choice([*LETTERS, None])
+        max_length = rng.choice([None, position2 + 1, 3]) if letter2 is None else None
+        yield position1, position2, rng.choice(LETTERS), letter2, max_length
+
+
+@pytest.mark.parametrize('max_pairs', [None, 2])
+def test_matches_word_index(words, max_pairs):
+    index, matrix = WordIndex(words), WordMatrix(words, max_pairs=max_pairs)
+    for query in queries(3000):
+        expected = sorted(index.candidates(*query))
+        assert sorted(matrix.candidates(*query).tolist()) == expected, query
+        assert matrix.count(*query) == len(expected), query
+    if max_pairs is not None:
+        assert len(matrix.pairs) == max_pairs
+
+
+def test_match_rows_and_contents(words):
+    index, matrix = WordIndex(words), WordMatrix(words)
+    rows = [('n', 'd', None), ('p', 'n', None), ('a', None, 3), ('@', 'a', None), ('n', None, None)]
+    assert [sorted(ids.tolist()) for ids in matrix.match_rows(0, 2, rows)] == \
+        [sorted(ids) for ids in index.match_rows(0, 2, rows)]
+    assert matrix.get_contents([5000, 5002]) == {5000: 'Ñandú', 5002: 'pingüino'}